@@ -27,13 +27,112 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "supersecretkey123" 
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30 * 24 * 60 
+    ADMIN_EMAILS: str = ""  # comma-separated; allowed to use /admin/*
 
     # Database
-    DATABASE_URL: str
+    STORAGE_BACKEND: str = "mongo"  # "mongo" or "memory" (no database; see app/storage)
+    DATABASE_URL: str = ""  # required by the mongo backend
     DB_NAME: str = "rupeeriser"
 
+    # MongoDB connection pool
+    MONGO_MAX_POOL_SIZE: int = 50
+    MONGO_MIN_POOL_SIZE: int = 5
+    MONGO_MAX_IDLE_TIME_MS: int = 60_000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5_000
+    MONGO_CONNECT_TIMEOUT_MS: int = 5_000
+    MONGO_SOCKET_TIMEOUT_MS: int = 20_000
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 5_000
+    MONGO_COMPRESSORS: str = "zstd,snappy,zlib"  # wire compression, first mutually supported wins
+    MONGO_READ_PREFERENCE: str = "primary"  # used by read-only routes, e.g. "secondaryPreferred"
+    MONGO_WARMUP_CONNECTIONS: int = 5  # connections opened before the app accepts traffic
+
+    # Transaction change feed (/transactions/changes)
+    SYNC_TOMBSTONE_TTL_DAYS: int = 90  # older sync tokens must do a full resync
+    SYNC_SETTLE_MS: int = 1000  # writes younger than this are held back for the next poll
+
+    # Write path: retried POSTs and bursts of inserts
+    IDEMPOTENCY_TTL_HOURS: int = 24  # how long a completed Idempotency-Key is replayed
+    IDEMPOTENCY_LEASE_SECONDS: int = 60  # a pending key older than this was abandoned by a crashed request
+    WRITE_COALESCE_WINDOW_MS: float = 5  # concurrent inserts within this window share one insert_many; 0 disables
+    WRITE_COALESCE_MAX_BATCH: int = 100
+
+    # Archival tier: whole months older than this move to per-user monthly buckets
+    ARCHIVE_AFTER_DAYS: int = 365
+    ARCHIVE_COMPRESS_ITEMS: bool = True
+    ARCHIVE_DELETE_BATCH: int = 500
+    ARCHIVE_INTERVAL_HOURS: int = 24
+
+    # Per-user learned categorizer answering /ai/parse without the LLM
+    CATEGORIZER_MIN_CONFIDENCE: float = 0.8  # share of token evidence behind the winning category
+    CATEGORIZER_MIN_SUPPORT: int = 2  # past transactions backing the winning category
+    CATEGORIZER_MIN_COVERAGE: float = 0.5  # share of the text's tokens the model must have seen
+    CATEGORIZER_MAX_TOKENS: int = 1500  # tokens kept per user when a model is rebuilt
+    CATEGORIZER_HISTORY_ROWS: int = 1000  # most recent transactions a rebuild learns from
+    CATEGORIZER_REBUILD_EVERY: int = 200  # incremental updates between rebuilds (prunes stale tokens)
+
+    # Goal projection (Monte Carlo over resampled past months)
+    GOAL_SIM_PATHS: int = 4000
+    GOAL_SIM_HORIZON_MONTHS: int = 120
+    GOAL_SIM_HISTORY_MONTHS: int = 24
+    GOAL_SIM_MIN_MONTHS: int = 3  # below this, the budget's salary minus fixed costs is used instead
+
+    # Month-end category forecast
+    FORECAST_HISTORY_MONTHS: int = 6  # past months whose daily spending curves shape the projection
+    FORECAST_ALERT_RATIO: float = 1.0  # alert when forecast > budget share x this
+
+    # Transaction-list wire formats (see app/wire.py)
+    WIRE_COMPRESS_MIN_BYTES: int = 1024  # smaller bodies are sent uncompressed
+    WIRE_GZIP_LEVEL: int = 6
+    WIRE_BROTLI_QUALITY: int = 5
+
+    # Realtime push over /ws
+    WS_QUEUE_SIZE: int = 100  # pending messages per connection before it is told to resync
+    WS_HEARTBEAT_SECONDS: float = 20  # idle time before the server sends a ping
+    WS_HEARTBEAT_TIMEOUT_SECONDS: float = 60  # close connections silent for this long
+    WS_MAX_CONNECTIONS_PER_USER: int = 10
+    WS_FANOUT: str = "local"  # "mongo" to fan out across workers through a capped collection
+    WS_FANOUT_COLLECTION_BYTES: int = 8 * 1024 * 1024
+
+    # Recurring-payment detection batch: users processed concurrently per chunk
+    RECURRING_BATCH_CHUNK: int = 20
+
+    # Background jobs
+    JOBS_ENABLED: bool = True
+    JOB_WORKERS: int = 2
+    JOB_TICK_SECONDS: float = 30
+    JOB_TIMEOUT_SECONDS: float = 900
+    AGGREGATES_INTERVAL_MINUTES: int = 60
+    AGGREGATES_BATCH_CHUNK: int = 20  # users rebuilt concurrently
+    RECURRING_INTERVAL_HOURS: int = 24
+    AI_TIPS_INTERVAL_HOURS: int = 24
+    CACHE_EXPIRY_INTERVAL_HOURS: int = 6
+    CACHE_MAX_AGE_DAYS: int = 7
+
     # Google Gemini (Free)
     GOOGLE_API_KEY: str
+    AI_PREWARM: bool = True  # load the LangChain/Gemini stack in the background after startup
+    AI_PREWARM_DELAY_SECONDS: float = 2.0
+
+    # Gemini quota admission control (token buckets in front of /ai/*)
+    AI_USER_RATE_PER_MIN: float = 6
+    AI_USER_BURST: int = 3
+    AI_GLOBAL_RATE_PER_MIN: float = 60
+    AI_GLOBAL_BURST: int = 10
+    AI_QUEUE_MAX_WAIT_SECONDS: float = 1.5  # how long an over-budget call may wait before falling back
+    AI_QUEUE_MAX_DEPTH: int = 100
+    AI_QUEUE_MAX_PER_USER: int = 3  # one user's burst cannot take the whole queue
+
+    # Chat memory (/ai/chat): recent turns verbatim + a rolling summary of older ones.
+    # Token counts are estimates (~4 characters per token).
+    CHAT_PROMPT_TOKEN_BUDGET: int = 1500  # hard cap for everything sent to the model
+    CHAT_RECENT_TURNS: int = 6  # messages (user + assistant) kept verbatim
+    CHAT_SUMMARIZE_AFTER_TURNS: int = 4  # fold once this many turns are past the recent window
+    CHAT_SUMMARY_MAX_TOKENS: int = 300
+    CHAT_MESSAGE_MAX_TOKENS: int = 400  # per message (current and stored)
+    CHAT_CONTEXT_MAX_TOKENS: int = 300
+    CHAT_MAX_STORED_TURNS: int = 40  # backstop if summarization keeps failing
+    CHAT_CONVERSATION_TTL_DAYS: int = 30
+    CHAT_SUMMARY_LEASE_SECONDS: int = 120  # a fold claimed longer ago than this was lost with its worker
 
     class Config:
         env_file = ".env"
@@ -1,6 +1,6 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT
 from app.config import settings
-import certifi
+from app.storage import create_engine
 import logging
 import os
 
@@ -12,8 +12,13 @@ logger = logging.getLogger(__name__)
 MONGO_URL = os.getenv("DATABASE_URL") or settings.DATABASE_URL
 
 # 2. Define Global Variables (Initialize as None)
-client = None
+# These are populated by connect_to_mongo() from the app lifespan, so always
+# access them through the module (database.transactions_collection), never
+# via `from app.database import ...`, which would capture the None.
+engine = None  # app.storage engine chosen by STORAGE_BACKEND
+client = None  # Motor client (mongo backend only)
 db = None
+read_db = None  # same database, with MONGO_READ_PREFERENCE for read-only routes
 users_collection = None
 transactions_collection = None
 budgets_collection = None
@@ -21,35 +26,122 @@ accounts_collection = None
 goals_collection = None
 habits_collection = None
 budget_settings_collection = None
+recurring_collection = None
+jobs_collection = None
+aggregates_collection = None
+ai_tips_collection = None
+tombstones_collection = None
+archive_collection = None
+categorizer_collection = None
+goal_projections_collection = None
+forecasts_collection = None
+idempotency_collection = None
+conversations_collection = None
 
-# 3. Attempt Connection
-if not MONGO_URL:
-    logger.error("❌ CRITICAL: DATABASE_URL is missing in Environment Variables!")
-else:
-    try:
-        logger.info("⏳ Connecting to MongoDB...")
-        
-        # Connect
-        client = AsyncIOMotorClient(
-            MONGO_URL,
-            tlsCAFile=certifi.where(),
-            serverSelectionTimeoutMS=5000,
-            tlsAllowInvalidCertificates=True
-        )
-        
-        # Check connection immediately
-        client.admin.command('ping')
-        logger.info("✅ MongoDB Connected Successfully!")
-
-        # Assign DB and Collections
-        db = client[settings.DB_NAME]
-        users_collection = db.get_collection("users")
-        transactions_collection = db.get_collection("transactions")
-        budgets_collection = db.get_collection("budgets")
-        accounts_collection = db.get_collection("accounts")
-        goals_collection = db.get_collection("goals")
-        habits_collection = db.get_collection("habits")
-        budget_settings_collection = db.get_collection("budget_settings")
 
+def _index_specs() -> list:
+    """(collection, keys, options); every per-user query path has an index that starts with user_id."""
+    return [
+        (transactions_collection, [("user_id", ASCENDING), ("date", DESCENDING)], {}),
+        (transactions_collection, [("user_id", ASCENDING), ("category", ASCENDING), ("date", DESCENDING)], {}),
+        (transactions_collection, [("user_id", ASCENDING), ("account", ASCENDING), ("date", DESCENDING)], {}),
+        # Compound text index: $text queries with a user_id equality only scan that user's postings
+        (transactions_collection, [("user_id", ASCENDING), ("note", TEXT)],
+         {"name": "user_note_text", "default_language": "none"}),
+        (transactions_collection, [("user_id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)], {}),
+        # Creates sent with an Idempotency-Key store it on the row: one row per key even if two requests insert
+        (transactions_collection, [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+         {"unique": True, "partialFilterExpression": {"idempotency_key": {"$exists": True}}}),
+        (tombstones_collection, [("user_id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)], {}),
+        (tombstones_collection, "updated_at", {"expireAfterSeconds": settings.SYNC_TOMBSTONE_TTL_DAYS * 24 * 3600}),
+        (idempotency_collection, "created_at", {"expireAfterSeconds": settings.IDEMPOTENCY_TTL_HOURS * 3600}),
+        (conversations_collection, "updated_at",
+         {"expireAfterSeconds": settings.CHAT_CONVERSATION_TTL_DAYS * 24 * 3600}),
+        (archive_collection, [("user_id", ASCENDING), ("month", DESCENDING)], {}),
+        (archive_collection, [("user_id", ASCENDING), ("ids", ASCENDING)], {}),
+        (archive_collection, [("user_id", ASCENDING), ("terms", ASCENDING)], {}),
+        (recurring_collection, "user_id", {"unique": True}),
+        (aggregates_collection, [("user_id", ASCENDING), ("month", DESCENDING)], {}),
+        (ai_tips_collection, "user_id", {"unique": True}),
+        (goal_projections_collection, "user_id", {"unique": True}),
+        (forecasts_collection, "user_id", {"unique": True}),
+        # Unique so that two devices racing to create settings can't both insert (see PATCH /budget/config)
+        (budget_settings_collection, "user_id", {"unique": True}),
+    ]
+
+
+async def ensure_indexes() -> int:
+    """
+    Idempotent. Each index is created on its own, so one that fails (options
+    changed, duplicates blocking a unique index, ...) is logged and the rest
+    still get built. Returns the number of failures.
+    """
+    failures = 0
+    for collection, keys, options in _index_specs():
+        try:
+            await collection.create_index(keys, **options)
+        except Exception as e:
+            failures += 1
+            logger.error(f"❌ Could not create index {keys} {options} on {collection.name}: {e}")
+    return failures
+
+
+async def connect_to_mongo():
+    """Create the storage engine, bind collections and warm the pool. Called once from the lifespan."""
+    global engine, client, db, read_db
+    global users_collection, transactions_collection, budgets_collection, accounts_collection
+    global goals_collection, habits_collection, budget_settings_collection, recurring_collection
+    global jobs_collection, aggregates_collection, ai_tips_collection, tombstones_collection
+    global archive_collection, categorizer_collection, goal_projections_collection, forecasts_collection
+    global idempotency_collection, conversations_collection
+
+    # 3. Attempt Connection (a mongo backend without DATABASE_URL refuses to start
+    # instead of serving every request with None collections)
+    engine = create_engine(settings.STORAGE_BACKEND, url=MONGO_URL)
+    logger.info(f"⏳ Connecting to storage ({engine.name})...")
+    await engine.connect()
+
+    # Assign DB and Collections
+    client = engine.client
+    db = engine.db
+    read_db = engine.read_db
+    users_collection = db.get_collection("users")
+    transactions_collection = db.get_collection("transactions")
+    budgets_collection = db.get_collection("budgets")
+    accounts_collection = db.get_collection("accounts")
+    goals_collection = db.get_collection("goals")
+    habits_collection = db.get_collection("habits")
+    budget_settings_collection = db.get_collection("budget_settings")
+    recurring_collection = db.get_collection("recurring_payments")
+    jobs_collection = db.get_collection("jobs")
+    aggregates_collection = db.get_collection("user_aggregates")
+    ai_tips_collection = db.get_collection("ai_tips")
+    tombstones_collection = db.get_collection("transaction_tombstones")
+    archive_collection = db.get_collection("transaction_archive")
+    categorizer_collection = db.get_collection("category_models")
+    goal_projections_collection = db.get_collection("goal_projections")
+    forecasts_collection = db.get_collection("category_forecasts")
+    idempotency_collection = db.get_collection("idempotency_keys")
+    conversations_collection = db.get_collection("chat_conversations")
+
+    try:
+        await engine.ping()
     except Exception as e:
         logger.error(f"❌ Failed to connect to MongoDB: {e}")
+        logger.error("👉 TIP: If you are on Office/College WiFi, switch to Mobile Hotspot. Port 27017 might be blocked.")
+        return
+
+    failures = await ensure_indexes()
+    if failures:
+        logger.warning(f"⚠️ Storage ready ({engine.name}), but {failures} index(es) are missing; see errors above")
+    else:
+        logger.info(f"✅ Storage ready ({engine.name})!")
+
+
+async def close_mongo_connection():
+    """Close pooled sockets once in-flight requests have finished (lifespan shutdown)."""
+    global client
+    if engine is not None:
+        await engine.close()
+        client = None
+        logger.info(f"👋 Storage closed ({engine.name})")
@@ -1,7 +1,15 @@
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, transactions, ai, accounts, goals, budget, habits  
-from app.database import client 
+from app.routers import auth, transactions, ai, accounts, goals, budget, habits, insights, admin, realtime
+from app import database
+from app.config import settings
+from app.services import events
+from app.services.ai_agent import prewarm_llm
+from app.services.jobs import job_runner
+from app.services.realtime import hub
+from app.metrics import prometheus_middleware, metrics_endpoint, monitor_event_loop_lag
+import asyncio
 import logging
 import uvicorn
 
@@ -9,7 +17,31 @@ import uvicorn
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="RupeeRiser API")
+
+# --- App Lifespan: DB pool + background monitors ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: the pool is connected and warmed before uvicorn accepts traffic
+    await database.connect_to_mongo()
+    background = [asyncio.create_task(monitor_event_loop_lag())]
+    if settings.AI_PREWARM:
+        # AI imports are lazy; warm them off the request path once we're serving
+        background.append(asyncio.create_task(prewarm_llm(settings.AI_PREWARM_DELAY_SECONDS)))
+    if settings.JOBS_ENABLED:
+        await job_runner.start()
+    await hub.start()
+
+    yield
+
+    # Shutdown: uvicorn has already drained in-flight requests at this point
+    await hub.stop()
+    await job_runner.stop()
+    for task in background:
+        task.cancel()
+    await database.close_mongo_connection()
+# ------------------------------------------
+
+app = FastAPI(title="RupeeRiser API", lifespan=lifespan)
 
 # ✅ FIXED CORS CONFIGURATION
 app.add_middleware(
@@ -29,17 +61,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- Test DB Connection on Startup ---
-@app.on_event("startup")
-async def startup_db_client():
-    try:
-        logger.info("⏳ Attempting to connect to MongoDB Atlas...")
-        await client.admin.command('ping')
-        logger.info("✅ SUCCESS: Connected to MongoDB Atlas!")
-    except Exception as e:
-        logger.error(f"❌ FAILURE: Could not connect to MongoDB. Error: {e}")
-        logger.error("👉 TIP: If you are on Office/College WiFi, switch to Mobile Hotspot. Port 27017 might be blocked.")
-# ------------------------------------------
+# ✅ Prometheus: per-route latency + status counts, scraped from /metrics
+app.middleware("http")(prometheus_middleware)
+# ✅ Writes carry the sending device (X-Device-Id) so realtime pushes skip it
+app.middleware("http")(events.origin_middleware)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
 app.include_router(auth.router)
 app.include_router(transactions.router)
@@ -47,7 +73,10 @@ app.include_router(ai.router)
 app.include_router(accounts.router)
 app.include_router(goals.router)
 app.include_router(budget.router)
-app.include_router(habits.router) 
+app.include_router(habits.router)
+app.include_router(insights.router)
+app.include_router(admin.router)
+app.include_router(realtime.router)
 
 @app.get("/")
 def read_root():
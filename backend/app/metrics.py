@@ -0,0 +1,225 @@
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from pymongo import monitoring
+from starlette.requests import Request
+from starlette.responses import Response
+from contextlib import contextmanager
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------- ✅ METRIC DEFINITIONS ----------------
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"],
+)
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "route", "status"],
+)
+
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency by collection and operation",
+    ["collection", "operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+MONGO_FAILURES = Counter(
+    "mongo_command_failures_total",
+    "Failed MongoDB commands by collection and operation",
+    ["collection", "operation"],
+)
+
+GEMINI_LATENCY = Histogram(
+    "gemini_request_duration_seconds",
+    "Gemini call latency by operation",
+    ["operation"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+GEMINI_REQUESTS = Counter(
+    "gemini_requests_total",
+    "Gemini calls by operation and outcome (success, fallback, error)",
+    ["operation", "outcome"],
+)
+
+AI_ADMISSIONS = Counter(
+    "ai_admissions_total",
+    "AI route admission decisions (admitted, admitted_after_wait, rejected_queue_full, rejected_user_queue_full, rejected_deadline)",
+    ["route", "outcome"],
+)
+AI_QUEUE_DEPTH = Gauge(
+    "ai_admission_queue_depth",
+    "AI requests currently waiting for a rate-limit token",
+)
+
+WIRE_PAYLOAD_BYTES = Histogram(
+    "wire_payload_bytes",
+    "Encoded transaction-list body size by format and content encoding",
+    ["format", "encoding"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+WIRE_ENCODE_SECONDS = Histogram(
+    "wire_encode_duration_seconds",
+    "Time to serialize (and compress) a transaction-list body",
+    ["format"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+WRITE_BATCH_SIZE = Histogram(
+    "write_coalesce_batch_size",
+    "Documents per coalesced insert_many",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Writes carrying an Idempotency-Key by outcome (new, taken_over, replayed, in_progress, mismatch)",
+    ["outcome"],
+)
+
+WS_CONNECTIONS = Gauge(
+    "websocket_connections",
+    "Open /ws connections in this process",
+)
+WS_MESSAGES = Counter(
+    "websocket_messages_total",
+    "Realtime messages offered to connections (overflow = queue full, client told to resync)",
+    ["outcome"],
+)
+
+CHAT_PROMPT_TOKENS = Histogram(
+    "chat_prompt_tokens",
+    "Prompt size of /ai/chat calls (estimate = our count before sending, reported = model usage)",
+    ["source"],
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000),
+)
+CHAT_SUMMARIES = Counter(
+    "chat_summaries_total",
+    "Background chat summarizations by outcome (folded, skipped_claimed, skipped_busy, error, conflict)",
+    ["outcome"],
+)
+
+CATEGORIZER_LOOKUPS = Counter(
+    "categorizer_lookups_total",
+    "Learned-categorizer lookups on /ai/parse by outcome (hit answers without the LLM)",
+    ["outcome"],
+)
+
+JOB_RUNS = Counter(
+    "background_job_runs_total",
+    "Background job runs by job and outcome (succeeded, failed, timeout)",
+    ["job", "outcome"],
+)
+JOB_DURATION = Histogram(
+    "background_job_duration_seconds",
+    "Background job run time",
+    ["job"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800),
+)
+
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Latency of named in-process stages (bcrypt, auth lookup, ...)",
+    ["stage"],
+)
+
+EVENT_LOOP_LAG = Gauge(
+    "event_loop_lag_seconds",
+    "Most recent event-loop scheduling delay",
+)
+EVENT_LOOP_LAG_HIST = Histogram(
+    "event_loop_lag_distribution_seconds",
+    "Event-loop scheduling delay distribution",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+# ---------------- ✅ HELPERS ----------------
+
+@contextmanager
+def track_stage(stage: str):
+    """Time a block of work and record it under `stage_duration_seconds`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def record_gemini_call(operation: str, outcome: str, started: float):
+    GEMINI_LATENCY.labels(operation=operation).observe(time.perf_counter() - started)
+    GEMINI_REQUESTS.labels(operation=operation, outcome=outcome).inc()
+
+
+# ---------------- ✅ HTTP MIDDLEWARE ----------------
+
+async def prometheus_middleware(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Use the route template (e.g. /transactions/{tx_id}) to keep label cardinality bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        HTTP_LATENCY.labels(method=request.method, route=path).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(method=request.method, route=path, status=str(status)).inc()
+
+
+async def metrics_endpoint(request: Request):
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+# ---------------- ✅ MONGO COMMAND LISTENER ----------------
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    Records every driver command by collection and operation.
+    The collection name is only present on the started event, so it is
+    remembered by request id until the matching succeeded/failed event.
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "admin"
+        self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _collection(self, event):
+        return self._pending.pop((event.connection_id, event.request_id), "unknown")
+
+    def succeeded(self, event):
+        MONGO_LATENCY.labels(
+            collection=self._collection(event), operation=event.command_name
+        ).observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        collection = self._collection(event)
+        MONGO_LATENCY.labels(collection=collection, operation=event.command_name).observe(
+            event.duration_micros / 1_000_000
+        )
+        MONGO_FAILURES.labels(collection=collection, operation=event.command_name).inc()
+
+
+mongo_listener = MongoCommandMetrics()
+
+
+# ---------------- ✅ EVENT LOOP LAG MONITOR ----------------
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Sleep for `interval` and report how late the loop woke us up."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HIST.observe(lag)
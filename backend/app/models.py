@@ -1,5 +1,5 @@
 # # models.py
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Literal
 
 # --- Auth Schemas ---
@@ -33,6 +33,54 @@ class TransactionResponse(TransactionBase):
     id: str
     user_id: str
 
+class TransactionChanges(BaseModel):
+    upserts: List[TransactionResponse]
+    deletes: List[str]
+    next_token: str
+    has_more: bool
+
+class TransactionSearchResponse(BaseModel):
+    items: List[TransactionResponse]
+    page: int
+    page_size: int
+    has_more: bool
+
+# --- Recurring Payment Schemas ---
+class RecurringSeries(BaseModel):
+    note: str
+    category: str
+    account: str
+    type: Literal["income", "expense"]
+    period: Literal["weekly", "monthly", "yearly"]
+    average_amount: float
+    occurrences: int
+    interval_days: float
+    regularity: float
+    last_date: str
+    next_expected_date: str
+    active: bool
+
+class RecurringPaymentsResponse(BaseModel):
+    series: List[RecurringSeries]
+    computed_at: str
+
+class CategoryForecast(BaseModel):
+    category: str
+    spent: float
+    forecast: float
+    budget: Optional[float] = None
+    over_by: float
+    alert: bool
+
+class SpendingForecast(BaseModel):
+    month: str
+    day: int
+    days_in_month: int
+    total_spent: float
+    total_forecast: float
+    categories: List[CategoryForecast]
+    alerts: List[str]
+
 # --- Budget & Goals Schemas ---
 class FixedCosts(BaseModel):
     rent: float = 0
@@ -45,12 +93,39 @@ class BudgetSettings(BaseModel):
     fixed_costs: FixedCosts
     config: str = ""
 
+# YYYY-MM or YYYY-MM-DD, for goal target dates (body and query)
+TARGET_DATE_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])(-(0[1-9]|[12]\d|3[01]))?$"
+
 class GoalCreate(BaseModel):
     name: str
     amount: float
+    saved: float = 0  # already put aside towards the goal
+    target_date: Optional[str] = Field(None, pattern=TARGET_DATE_PATTERN)
 
 class GoalResponse(GoalCreate):
     id: str
+    target_date: Optional[str] = None  # as stored; goals saved before validation may hold anything
+
+class GoalCompletion(BaseModel):
+    p10: Optional[str] = None  # YYYY-MM; None = not reached within the simulated horizon
+    p50: Optional[str] = None
+    p90: Optional[str] = None
+
+class GoalProjection(BaseModel):
+    goal_id: str
+    name: str
+    amount: float
+    saved: float
+    remaining: float
+    basis: Literal["history", "budget", "none"]
+    history_months: int
+    mean_monthly_savings: float
+    probability_within_horizon: float
+    completion_month: GoalCompletion
+    target_date: Optional[str] = None
+    probability_by_target_date: Optional[float] = None
+    monthly_savings_needed: Optional[float] = None
+    monthly_savings_needed_p90: Optional[float] = None
 
 # --- Habits Schemas ---
 class HabitCreate(BaseModel):
@@ -75,6 +150,8 @@ class BudgetProfile(BaseModel):
 
 class ChatInput(BaseModel):
     message: str
+    context: Optional[str] = None
+    conversation_id: str = Field("default", min_length=1, max_length=64)
 
 # --- Habit Schemas ---
 class HabitCreate(BaseModel):
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List
-from app.database import db
+from app import database
 from pydantic import BaseModel
 from app.auth import get_current_user
+from app.services import events
 from bson import ObjectId
 
 router = APIRouter(prefix="/accounts", tags=["Accounts"])
@@ -18,7 +19,7 @@ class AccountResponse(AccountCreate):
 @router.get("/", response_model=List[AccountResponse])
 async def get_accounts(current_user: dict = Depends(get_current_user)):
     # Fetch accounts belonging to the logged-in user
-    cursor = db.accounts.find({"user_id": str(current_user["_id"])})
+    cursor = database.read_db.accounts.find({"user_id": str(current_user["_id"])})
     accounts = []
     async for acc in cursor:
         acc["id"] = str(acc["_id"])
@@ -30,8 +31,9 @@ async def create_account(account: AccountCreate, current_user: dict = Depends(ge
     acc_data = account.dict()
     acc_data["user_id"] = str(current_user["_id"])
     
-    new_acc = await db.accounts.insert_one(acc_data)
-    created_acc = await db.accounts.find_one({"_id": new_acc.inserted_id})
+    new_acc = await database.accounts_collection.insert_one(acc_data)
+    created_acc = await database.accounts_collection.find_one({"_id": new_acc.inserted_id})
+    await events.emit("account", acc_data["user_id"], "create", created_acc)
     
     # Convert ObjectId to string for response
     created_acc["id"] = str(created_acc["_id"])
@@ -39,12 +41,13 @@ async def create_account(account: AccountCreate, current_user: dict = Depends(ge
 
 @router.delete("/{account_id}")
 async def delete_account(account_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.accounts.delete_one({
+    result = await database.accounts_collection.delete_one({
         "_id": ObjectId(account_id),
         "user_id": str(current_user["_id"])
     })
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Account not found")
+    await events.emit("account", str(current_user["_id"]), "delete", previous={"_id": ObjectId(account_id)})
         
     return {"message": "Account deleted"}
\ No newline at end of file
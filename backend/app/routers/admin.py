@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.auth import get_admin_user
+from app.services.jobs import job_runner
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+@router.get("/jobs")
+async def list_jobs(admin: dict = Depends(get_admin_user)):
+    """Persisted state of every background job: status, last run, next run, errors."""
+    return await job_runner.states()
+
+@router.post("/jobs/{name}/run")
+async def run_job(name: str, admin: dict = Depends(get_admin_user)):
+    if name not in job_runner.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not await job_runner.trigger(name):
+        raise HTTPException(status_code=409, detail="Job is already running")
+    return {"message": f"Job '{name}' queued"}
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from app.services.ai_agent import (
     parse_expense_text,
-    chat_with_finance_bot,
-    generate_budget_plan
+    generate_budget_plan,
+    manual_parse
 )
+from app.services import chat_memory
+from app.services.categorizer import parse_from_history
+from app.services.rate_limiter import ai_admission
 from app.models import NaturalLanguageInput, ChatInput, BudgetProfile
 from app.auth import get_current_user
+from app import database
 from datetime import datetime
 import logging
 
@@ -26,11 +30,18 @@ async def parse_natural_language(
     Works with:
     - AI result
     - Manual fallback
-    - Rate-limit safe
+    - Rate-limit safe (over-budget users get the manual parser)
+    - Text the user's own history already explains skips the LLM entirely
     """
 
     try:
-        result = await parse_expense_text(input.text)
+        user_id = str(current_user["_id"])
+        result = await parse_from_history(user_id, input.text)
+        if result is None:
+            if await ai_admission.admit(user_id, "parse"):
+                result = await parse_expense_text(input.text)
+            else:
+                result = manual_parse(input.text)
 
         # ✅ HARD SAFETY GUARANTEES (FRONTEND MUST NEVER CRASH)
         return {
@@ -66,16 +77,25 @@ async def chat(
     """
     Safe chat endpoint with AI fallback.
     Never crashes frontend.
+    Follow-ups keep context: the conversation is remembered per
+    conversation_id (recent turns + a rolling summary).
     """
 
+    user_id = str(current_user["_id"])
+    if not await ai_admission.admit(user_id, "chat"):
+        return {"response": "AI is busy. Try again shortly."}
+
     try:
-        response = await chat_with_finance_bot(
+        response = await chat_memory.reply(
+            user_id,
+            input.conversation_id,
             input.message,
             input.context or ""
         )
 
         return {
-            "response": response or "AI is busy. Try again shortly."
+            "response": response or "AI is busy. Try again shortly.",
+            "conversation_id": input.conversation_id
         }
 
     except Exception as e:
@@ -85,6 +105,23 @@ async def chat(
         }
 
 
+@router.get("/chat/history")
+async def chat_history(
+    conversation_id: str = Query("default", min_length=1, max_length=64),
+    current_user: dict = Depends(get_current_user)
+):
+    """What the bot currently remembers: the summary plus the turns not yet folded into it."""
+    return await chat_memory.history(str(current_user["_id"]), conversation_id)
+
+
+@router.delete("/chat/history")
+async def clear_chat_history(
+    conversation_id: str = Query("default", min_length=1, max_length=64),
+    current_user: dict = Depends(get_current_user)
+):
+    return {"deleted": await chat_memory.forget(str(current_user["_id"]), conversation_id)}
+
+
 # ✅ ---------------- GENERATE BUDGET PLAN ----------------
 
 @router.post("/plan")
@@ -98,6 +135,9 @@ async def create_plan(
     """
 
     try:
+        if not await ai_admission.admit(str(current_user["_id"]), "plan"):
+            raise Exception("AI budget exhausted")
+
         plan = await generate_budget_plan(
             profile.salary or 0,
             profile.fixed_costs or {},
@@ -131,3 +171,22 @@ async def create_plan(
             ],
             "alternatives": []
         }
+
+
+# ✅ ---------------- PRECOMPUTED BUDGET TIPS ----------------
+
+@router.get("/tips")
+async def get_budget_tips(current_user: dict = Depends(get_current_user)):
+    """
+    Tips refreshed in the background by the ai_budget_tips job.
+    Never calls the LLM on the request path.
+    """
+    tips = await database.read_db.ai_tips.find_one({"user_id": str(current_user["_id"])}, {"_id": 0})
+    if not tips:
+        return {
+            "summary": "",
+            "tips": ["Track your expenses regularly."],
+            "computed_at": None
+        }
+    return tips
+
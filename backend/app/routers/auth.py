@@ -5,7 +5,8 @@ from passlib.context import CryptContext
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from app.config import settings
-from app.database import users_collection # ✅ Import specific collection
+from app.metrics import track_stage
+from app import database
 from app.models import UserCreate, UserLogin, Token
 from pydantic import BaseModel, EmailStr
 from bson import ObjectId
@@ -17,10 +18,12 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with track_stage("bcrypt_verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password[:72])
+    with track_stage("bcrypt_hash"):
+        return pwd_context.hash(password[:72])
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -38,17 +41,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        with track_stage("jwt_decode"):
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    if users_collection is None:
+    if database.users_collection is None:
         raise HTTPException(status_code=500, detail="Database error")
 
-    user = await users_collection.find_one({"email": email})
+    with track_stage("auth_user_lookup"):
+        user = await database.users_collection.find_one({"email": email})
     if user is None:
         raise credentials_exception
     
@@ -72,10 +77,10 @@ class PasswordUpdate(BaseModel):
 
 @router.post("/signup", response_model=Token)
 async def signup(user: UserCreate):
-    if users_collection is None:
+    if database.users_collection is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
 
-    existing = await users_collection.find_one({"email": user.email})
+    existing = await database.users_collection.find_one({"email": user.email})
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -87,16 +92,16 @@ async def signup(user: UserCreate):
         "password_text": user.password, 
         "phone": "", "dob": "", "gender": "", "address": "", "city": "", "state": "", "pincode": ""
     }
-    await users_collection.insert_one(user_doc)
+    await database.users_collection.insert_one(user_doc)
     access_token = create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer", "user_name": user.name}
 
 @router.post("/login", response_model=Token)
 async def login(user_data: UserLogin):
-    if users_collection is None:
+    if database.users_collection is None:
         raise HTTPException(status_code=500, detail="Database connection failed")
 
-    user = await users_collection.find_one({"email": user_data.email})
+    user = await database.users_collection.find_one({"email": user_data.email})
     if not user or not verify_password(user_data.password, user["hashed_password"]):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     
@@ -105,7 +110,7 @@ async def login(user_data: UserLogin):
 
 @router.get("/me")
 async def get_me(current_user: dict = Depends(get_current_user)):
-    user = await users_collection.find_one({"_id": ObjectId(current_user["id"])})
+    user = await database.users_collection.find_one({"_id": ObjectId(current_user["id"])})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user["id"] = str(user["_id"])
@@ -115,7 +120,7 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 
 @router.put("/profile")
 async def update_profile(data: UserUpdate, current_user: dict = Depends(get_current_user)):
-    await users_collection.update_one(
+    await database.users_collection.update_one(
         {"_id": ObjectId(current_user["id"])},
         {"$set": data.dict()}
     )
@@ -123,11 +128,11 @@ async def update_profile(data: UserUpdate, current_user: dict = Depends(get_curr
 
 @router.put("/password")
 async def change_password(data: PasswordUpdate, current_user: dict = Depends(get_current_user)):
-    user = await users_collection.find_one({"_id": ObjectId(current_user["id"])})
+    user = await database.users_collection.find_one({"_id": ObjectId(current_user["id"])})
     if not verify_password(data.current_password, user["hashed_password"]):
         raise HTTPException(status_code=400, detail="Incorrect current password")
     new_hashed = get_password_hash(data.new_password)
-    await users_collection.update_one(
+    await database.users_collection.update_one(
         {"_id": ObjectId(current_user["id"])},
         {"$set": {"hashed_password": new_hashed, "password_text": data.plain_text_password}}
     )
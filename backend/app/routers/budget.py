@@ -1,8 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from app.database import db
+from app import database
 from app.auth import get_current_user
-from pydantic import BaseModel
-from typing import Optional
+from app.services import events
+from pydantic import BaseModel, Field
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import Any, List, Literal, Optional
+import json
+import jsonpatch
 
 router = APIRouter(prefix="/budget", tags=["Budget"])
 
@@ -19,16 +24,45 @@ class BudgetSettings(BaseModel):
     fixed_costs: FixedCosts
     # ✅ CRITICAL: This field stores the JSON string for Mobile/Laptop sync
     config: Optional[str] = "" 
+    # Optimistic concurrency: bumped on every write. Send it back on PUT to
+    # reject the write if another device saved in between.
+    revision: Optional[int] = None
+
+class PatchOperation(BaseModel):
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    path: str
+    value: Optional[Any] = None
+    from_: Optional[str] = Field(None, alias="from")
+
+class BudgetConfigPatch(BaseModel):
+    base_revision: int
+    ops: List[PatchOperation]
 
 # ---------------------------------------------------------
 
+def revision_filter(user_id: str, revision: int) -> dict:
+    # Documents written before revisions existed have no field; treat them as revision 0
+    if revision == 0:
+        return {"user_id": user_id, "revision": {"$in": [0, None]}}
+    return {"user_id": user_id, "revision": revision}
+
+def revision_conflict(current: Optional[dict]):
+    # Ship the server's state so the client can rebase without another round trip
+    return HTTPException(status_code=409, detail={
+        "message": "Budget settings were changed on another device",
+        "revision": (current or {}).get("revision", 0),
+        "config": (current or {}).get("config", "")
+    })
+
 @router.get("/", response_model=BudgetSettings)
 async def get_budget_settings(current_user: dict = Depends(get_current_user)):
     """
     Fetch the user's budget settings.
     If no settings exist, return default values to prevent app crash.
     """
-    settings = await db.budget_settings.find_one({"user_id": str(current_user["_id"])})
+    # Primary, not read_db: the revision returned here is the base of the next
+    # PUT/PATCH, and a lagging secondary would hand out one that 409s
+    settings = await database.budget_settings_collection.find_one({"user_id": str(current_user["_id"])})
     
     if not settings:
         # Return defaults if user is new
@@ -40,9 +74,11 @@ async def get_budget_settings(current_user: dict = Depends(get_current_user)):
                 "phone": 0, 
                 "subscriptions": 0
             },
-            "config": ""
+            "config": "",
+            "revision": 0
         }
     
+    settings.setdefault("revision", 0)
     return settings
 
 @router.put("/")
@@ -50,15 +86,77 @@ async def update_budget_settings(settings: BudgetSettings, current_user: dict =
     """
     Update budget settings.
     This saves Salary, Fixed Costs, and the 'config' string (for sync).
+    If `revision` is sent, the write only succeeds when it still matches.
     """
-    data = settings.dict()
-    data["user_id"] = str(current_user["_id"])
-    
-    # Upsert: Update if exists, Insert if not
-    result = await db.budget_settings.update_one(
-        {"user_id": str(current_user["_id"])},
-        {"$set": data},
-        upsert=True
-    )
-    
-    return {"message": "Budget settings updated successfully"}
\ No newline at end of file
+    user_id = str(current_user["_id"])
+    data = settings.dict(exclude={"revision"})
+    data["user_id"] = user_id
+
+    if settings.revision is None:
+        # Legacy clients: unconditional upsert (Update if exists, Insert if not)
+        result = await database.budget_settings_collection.find_one_and_update(
+            {"user_id": user_id},
+            {"$set": data, "$inc": {"revision": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        await events.emit("budget", user_id, "update", result)
+        return {"message": "Budget settings updated successfully", "revision": result["revision"]}
+
+    try:
+        result = await database.budget_settings_collection.update_one(
+            revision_filter(user_id, settings.revision),
+            {"$set": {**data, "revision": settings.revision + 1}},
+            upsert=settings.revision == 0
+        )
+    except DuplicateKeyError:
+        result = None
+    if result is None or (result.matched_count == 0 and result.upserted_id is None):
+        raise revision_conflict(await database.budget_settings_collection.find_one({"user_id": user_id}))
+
+    await events.emit("budget", user_id, "update", {**data, "revision": settings.revision + 1})
+    return {"message": "Budget settings updated successfully", "revision": settings.revision + 1}
+
+@router.patch("/config")
+async def patch_budget_config(patch: BudgetConfigPatch, current_user: dict = Depends(get_current_user)):
+    """
+    Apply a JSON Patch (RFC 6902) to the `config` blob instead of re-uploading it.
+    Rejected with 409 when `base_revision` is not the current revision.
+    """
+    user_id = str(current_user["_id"])
+    current = await database.budget_settings_collection.find_one({"user_id": user_id})
+    revision = (current or {}).get("revision", 0)
+    if patch.base_revision != revision:
+        raise revision_conflict(current)
+
+    try:
+        config = json.loads((current or {}).get("config") or "{}")
+        ops = [op.dict(by_alias=True, exclude_unset=True) for op in patch.ops]
+        config = jsonpatch.apply_patch(config, ops)
+    except (ValueError, jsonpatch.JsonPatchException, jsonpatch.JsonPointerException) as e:
+        raise HTTPException(status_code=422, detail=f"Patch could not be applied: {e}")
+
+    update = {"config": json.dumps(config, separators=(",", ":")), "revision": revision + 1}
+    if current is None:
+        try:
+            await database.budget_settings_collection.insert_one({
+                "user_id": user_id,
+                "salary": 0,
+                "fixed_costs": {"rent": 0, "travel": 0, "phone": 0, "subscriptions": 0},
+                **update
+            })
+            written = True
+        except DuplicateKeyError:
+            written = False
+    else:
+        result = await database.budget_settings_collection.update_one(
+            revision_filter(user_id, revision), {"$set": update}
+        )
+        written = result.matched_count == 1
+
+    if not written:
+        # Another device won the race between our read and write
+        raise revision_conflict(await database.budget_settings_collection.find_one({"user_id": user_id}))
+
+    await events.emit("budget", user_id, "update", {**(current or {}), **update}, previous=current)
+    return {"revision": revision + 1}
@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from app.database import db
-from app.models import GoalCreate, GoalResponse
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from app import database
+from app.models import GoalCreate, GoalResponse, GoalProjection, TARGET_DATE_PATTERN
 from app.auth import get_current_user
+from app.services import events
+from app.services.goal_projection import describe_goal, get_projections
 from bson import ObjectId
+from bson.errors import InvalidId
 
 router = APIRouter(prefix="/goals", tags=["Goals"])
 
 @router.get("/", response_model=List[GoalResponse])
 async def get_goals(current_user: dict = Depends(get_current_user)):
-    cursor = db.goals.find({"user_id": str(current_user["_id"])})
+    cursor = database.read_db.goals.find({"user_id": str(current_user["_id"])})
     goals = []
     async for g in cursor:
         g["id"] = str(g["_id"])
@@ -20,13 +23,48 @@ async def get_goals(current_user: dict = Depends(get_current_user)):
 async def create_goal(goal: GoalCreate, current_user: dict = Depends(get_current_user)):
     data = goal.dict()
     data["user_id"] = str(current_user["_id"])
-    res = await db.goals.insert_one(data)
+    res = await database.goals_collection.insert_one(data)
+    await events.emit("goal", data["user_id"], "create", data)
     data["id"] = str(res.inserted_id)
     return data
 
+@router.get("/projections", response_model=List[GoalProjection])
+async def get_goal_projections(current_user: dict = Depends(get_current_user)):
+    """Projections for every goal, from one simulation run (or the cached result)."""
+    user_id = str(current_user["_id"])
+    projections = await get_projections(user_id)
+    return [
+        describe_goal(g, projections, g.get("target_date"))
+        async for g in database.read_db.goals.find({"user_id": user_id})
+    ]
+
+@router.get("/{goal_id}/projection", response_model=GoalProjection)
+async def get_goal_projection(
+    goal_id: str,
+    target_date: Optional[str] = Query(None, pattern=TARGET_DATE_PATTERN),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    When the goal is likely to be reached (p10/p50/p90 month), simulated from
+    the user's past monthly income and expenses. With a target date (query
+    or the goal's own), also the monthly savings needed to hit it.
+    Cached until the next transaction, budget or goal write.
+    """
+    user_id = str(current_user["_id"])
+    try:
+        goal = await database.read_db.goals.find_one({"_id": ObjectId(goal_id), "user_id": user_id})
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    if not goal:
+        raise HTTPException(status_code=404, detail="Goal not found")
+
+    projections = await get_projections(user_id)
+    return describe_goal(goal, projections, target_date or goal.get("target_date"))
+
 @router.delete("/{goal_id}")
 async def delete_goal(goal_id: str, current_user: dict = Depends(get_current_user)):
-    res = await db.goals.delete_one({"_id": ObjectId(goal_id), "user_id": str(current_user["_id"])})
+    res = await database.goals_collection.delete_one({"_id": ObjectId(goal_id), "user_id": str(current_user["_id"])})
     if res.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Goal not found")
+    await events.emit("goal", str(current_user["_id"]), "delete", previous={"_id": ObjectId(goal_id)})
     return {"message": "Deleted"}
\ No newline at end of file
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends
+from app.models import RecurringPaymentsResponse, SpendingForecast
+from app.auth import get_current_user
+from app import database
+from app.services.forecast import get_forecast
+from app.services.recurring import get_user_recurring
+
+router = APIRouter(prefix="/insights", tags=["Insights"])
+
+@router.get("/recurring", response_model=RecurringPaymentsResponse)
+async def get_recurring_payments(refresh: bool = False, current_user: dict = Depends(get_current_user)):
+    """
+    Subscriptions, rent, salary etc. detected from the user's own history.
+    Served from the stored result; pass refresh=true to recompute now.
+    """
+    return await get_user_recurring(str(current_user["_id"]), refresh=refresh)
+
+@router.get("/monthly")
+async def get_monthly_summary(months: int = 6, current_user: dict = Depends(get_current_user)):
+    """Per-month totals by category and type, precomputed by the user_aggregates job."""
+    cursor = database.read_db.user_aggregates.find(
+        {"user_id": str(current_user["_id"])},
+        {"_id": 0, "user_id": 0, "updated_at": 0}
+    ).sort("month", -1)
+
+    summary = {}
+    async for row in cursor:
+        if row["month"] not in summary:
+            if len(summary) >= months:
+                break
+            summary[row["month"]] = {"month": row["month"], "income": 0, "expense": 0, "categories": []}
+        entry = summary[row["month"]]
+        entry[row["type"]] = entry.get(row["type"], 0) + row["total"]
+        entry["categories"].append(row)
+    return list(summary.values())
+
+
+
+@router.get("/forecast", response_model=SpendingForecast)
+async def get_spending_forecast(current_user: dict = Depends(get_current_user)):
+    """
+    Projected month-end spend per category, with alerts for categories on
+    track to exceed their budget share. Kept current by transaction writes;
+    history is only re-read once a day.
+    """
+    return await get_forecast(str(current_user["_id"]))
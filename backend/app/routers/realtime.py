@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Query, WebSocket
+from typing import Optional
+from app.auth import user_from_token
+from app.config import settings
+from app.services.realtime import hub
+
+router = APIRouter(tags=["Realtime"])
+
+@router.websocket("/ws")
+async def realtime_updates(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    device_id: Optional[str] = Query(None, max_length=128)
+):
+    """
+    Push channel for changes made on the user's other devices.
+    Browsers can't set headers on a WebSocket, so the access token may come
+    as ?token=...; other clients can send the usual Authorization header.
+    Pass the `device_id` this client sends as X-Device-Id on its writes to
+    not be sent its own changes back.
+    """
+    if not token:
+        auth_header = websocket.headers.get("authorization", "")
+        token = auth_header[7:] if auth_header.lower().startswith("bearer ") else None
+    user = await user_from_token(token) if token else None
+    if user is None:
+        await websocket.close(code=1008)
+        return
+
+    user_id = str(user["_id"])
+    if hub.connection_count(user_id) >= settings.WS_MAX_CONNECTIONS_PER_USER:
+        await websocket.close(code=1013)
+        return
+
+    await websocket.accept()
+    await hub.serve(websocket, user_id, device_id)
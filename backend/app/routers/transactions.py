@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from typing import List, Optional
-from app.database import transactions_collection
-from app.models import TransactionCreate, TransactionResponse
+from app import database
+from app.config import settings
+from app.models import TransactionCreate, TransactionResponse, TransactionSearchResponse, TransactionChanges
 from app.auth import get_current_user
+from app.services import archive, events, idempotency
+from app.services.write_batcher import transaction_inserts
+from app.wire import transaction_list_response
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
 @router.get("/", response_model=List[TransactionResponse])
 async def get_transactions(
+    request: Request,
     current_user: dict = Depends(get_current_user),
     limit: int = 50,
     type: Optional[str] = None
@@ -17,21 +26,290 @@ async def get_transactions(
     if type:
         query["type"] = type
         
-    cursor = transactions_collection.find(query).sort("date", -1).limit(limit)
-    transactions = []
-    async for tx in cursor:
+    cursor = database.read_db.transactions.find(query).sort("date", -1).limit(limit)
+    transactions = [tx async for tx in cursor]
+
+    # Fill from the archive tier. With a full hot page only buckets from the
+    # page's oldest month onwards can still contribute (backdated stragglers).
+    newer_than = transactions[-1]["date"][:7] if len(transactions) >= limit else None
+    archived = await archive.archived_page(query["user_id"], limit, {"type": type}, newer_than)
+    if archived:
+        seen = {tx["_id"] for tx in transactions}
+        transactions += [tx for tx in archived if tx["_id"] not in seen]
+        transactions.sort(key=lambda tx: tx.get("date", ""), reverse=True)
+        transactions = transactions[:limit]
+
+    for tx in transactions:
         tx["id"] = str(tx["_id"])
-        transactions.append(tx)
-    return transactions
+    return transaction_list_response(request, transactions)
+
+@router.get("/search", response_model=TransactionSearchResponse)
+async def search_transactions(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    q: Optional[str] = None,
+    category: Optional[List[str]] = Query(None),
+    account: Optional[List[str]] = Query(None),
+    type: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    start_date: Optional[str] = None,  # YYYY-MM-DD, inclusive
+    end_date: Optional[str] = None,    # YYYY-MM-DD, inclusive
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200)
+):
+    """
+    Full-text search on `note` combined with indexed filters.
+    With `q`, results are ranked by text relevance then newest first;
+    without it, newest first. Every query is anchored on user_id, so it
+    only walks this user's index entries. Archived months follow the hot
+    results once those are exhausted.
+    """
+    query = {"user_id": str(current_user["_id"])}
+    if q and q.strip():
+        query["$text"] = {"$search": q.strip()}
+    if category:
+        query["category"] = {"$in": category}
+    if account:
+        query["account"] = {"$in": account}
+    if type:
+        query["type"] = type
+    if min_amount is not None or max_amount is not None:
+        query["amount"] = {}
+        if min_amount is not None:
+            query["amount"]["$gte"] = min_amount
+        if max_amount is not None:
+            query["amount"]["$lte"] = max_amount
+    if start_date or end_date:
+        query["date"] = {}
+        if start_date:
+            query["date"]["$gte"] = start_date
+        if end_date:
+            query["date"]["$lte"] = end_date
+
+    if "$text" in query:
+        cursor = database.read_db.transactions.find(query, {"score": {"$meta": "textScore"}})
+        cursor = cursor.sort([("score", {"$meta": "textScore"}), ("date", -1)])
+    else:
+        cursor = database.read_db.transactions.find(query).sort([("date", -1), ("_id", -1)])
+
+    # Fetch one extra row to know whether another page exists without a count()
+    skip = (page - 1) * page_size
+    items = [tx async for tx in cursor.skip(skip).limit(page_size + 1)]
+
+    if len(items) <= page_size:
+        # Hot results are exhausted: continue into the archive tier
+        hot_total = skip + len(items) if items else await database.read_db.transactions.count_documents(query)
+        filters = {
+            "category": category, "account": account, "type": type,
+            "min_amount": min_amount, "max_amount": max_amount,
+            "start_date": start_date, "end_date": end_date,
+        }
+        q_terms = archive.note_terms(q) if q else set()
+        offset = max(0, skip - hot_total)
+        # Enough ranked rows for this page even if some are still in the hot tier too
+        wanted = offset + page_size + 1
+        archived = await archive.search_archived(query["user_id"], q_terms, filters, limit=wanted)
+        seen = {tx["_id"] for tx in items}
+        archived = [tx for tx in archived if tx["_id"] not in seen]
+        items += archived[offset:offset + page_size + 1 - len(items)]
+
+    for tx in items:
+        tx["id"] = str(tx["_id"])
+
+    envelope = {"page": page, "page_size": page_size, "has_more": len(items) > page_size}
+    return transaction_list_response(request, items[:page_size], envelope, "items")
+
+# ---------------- ✅ INCREMENTAL CHANGE FEED ----------------
+# Every write stamps updated_at; deletes leave a tombstone. A sync token is
+# "<updated_at ms>_<last _id>_<valid_from ms>": a position in (updated_at, _id)
+# order, so pages never skip or repeat rows that share a timestamp, plus the
+# moment from which the client needs tombstones. A full sync needs them from
+# its first page on, however old the rows it is paging through; a caught-up
+# token needs them from its cutoff. Documents written before updated_at
+# existed sort first and are addressed as timestamp 0 (backfill_updated_at.py
+# stamps them with exactly that).
+#
+# A full sync also serves the archive tier once the hot rows run out. Its
+# tokens carry a fourth part: "a" while the archive is still to come, then
+# "a<YYYY-MM>.<last id>" while paging through the buckets in (month, id)
+# order; the position part then holds the hot cutoff the sync continues
+# from. Archiving is not an edit, so incremental syncs stay hot-only: an
+# archived row only comes back into the feed when it is restored to be
+# edited or deleted.
+
+EPOCH = datetime(1970, 1, 1)
+ARCHIVE_PENDING = "a"
+
+def _ms(at: datetime) -> int:
+    return int((at - EPOCH).total_seconds() * 1000)
+
+def encode_sync_token(updated_at: Optional[datetime], doc_id: ObjectId, valid_from: datetime, archive_pos: str = None) -> str:
+    token = f"{_ms(updated_at or EPOCH)}_{doc_id}_{_ms(valid_from)}"
+    return f"{token}_{archive_pos}" if archive_pos else token
+
+def decode_sync_token(token: str):
+    """(position timestamp, position _id, valid_from, archive position or None)"""
+    try:
+        ms, doc_id, *rest = token.split("_")
+        position = EPOCH + timedelta(milliseconds=int(ms))
+        if rest:
+            valid_from = EPOCH + timedelta(milliseconds=int(rest[0]))
+        elif position == EPOCH:
+            # Two-part token from mid full sync over pre-updated_at rows: the
+            # client holds no row whose delete it could have missed
+            valid_from = datetime.utcnow()
+        else:
+            valid_from = position
+        archive_pos = rest[1] if len(rest) > 1 else None
+        if archive_pos is not None and not archive_pos.startswith(ARCHIVE_PENDING):
+            raise ValueError(archive_pos)
+        return position, ObjectId(doc_id), valid_from, archive_pos
+    except (ValueError, InvalidId, IndexError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+def archive_after(archive_pos: str) -> Optional[tuple]:
+    """(month, last id) from an archive position; None when the archive phase has not started."""
+    if archive_pos == ARCHIVE_PENDING:
+        return None
+    month, _, last_id = archive_pos[1:].partition(".")
+    if len(month) != 7 or not last_id:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    return month, last_id
+
+def after_position(user_id: str, updated_at: datetime, doc_id: ObjectId) -> dict:
+    if updated_at == EPOCH:
+        tie = {"updated_at": {"$in": [None, EPOCH]}, "_id": {"$gt": doc_id}}
+    else:
+        tie = {"updated_at": updated_at, "_id": {"$gt": doc_id}}
+    return {"user_id": user_id, "$or": [{"updated_at": {"$gt": updated_at}}, tie]}
+
+@router.get("/changes", response_model=TransactionChanges)
+async def get_transaction_changes(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=2000)
+):
+    """
+    Inserts/updates and deletes after `since`. Omit `since` for a full sync,
+    which includes archived months. Keep calling with `next_token` while
+    `has_more` is true. Apply upserts before deletes. 410 means the token
+    predates tombstone retention and the client must do a full sync.
+    """
+    user_id = str(current_user["_id"])
+    # Only serve settled writes, so one that committed late with an older
+    # timestamp can't land behind a token we've already handed out
+    cutoff = datetime.utcnow() - timedelta(milliseconds=settings.SYNC_SETTLE_MS)
+    settled = {"updated_at": {"$lte": cutoff}}
+
+    if since:
+        since_at, since_id, valid_from, archive_pos = decode_sync_token(since)
+        if valid_from < datetime.utcnow() - timedelta(days=settings.SYNC_TOMBSTONE_TTL_DAYS):
+            raise HTTPException(status_code=410, detail="Sync token expired, full sync required")
+        query = after_position(user_id, since_at, since_id)
+    else:
+        # Full sync: rows deleted from now on leave tombstones the later pages will serve
+        valid_from = datetime.utcnow()
+        query = {"user_id": user_id}
+        archive_pos = ARCHIVE_PENDING
+
+    page, has_more = [], False
+    if archive_pos is None or archive_pos == ARCHIVE_PENDING:
+        order = [("updated_at", 1), ("_id", 1)]
+        live = database.transactions_collection.find(
+            {"$and": [query, {"$or": [settled, {"updated_at": None}]}]}
+        ).sort(order).limit(limit + 1)
+        rows = [tx async for tx in live]
+        if since:
+            dead = database.tombstones_collection.find({"$and": [query, settled]}).sort(order).limit(limit + 1)
+            rows += [{**t, "deleted": True} async for t in dead]
+
+        rows.sort(key=lambda r: (r.get("updated_at") or EPOCH, r["_id"]))
+        page = rows[:limit]
+        has_more = len(rows) > limit
+        if has_more:
+            next_token = encode_sync_token(page[-1].get("updated_at"), page[-1]["_id"], valid_from, archive_pos)
+        # Hot rows served up to the cutoff; an archive phase continues from here afterwards
+        resume_at, resume_id = cutoff, ObjectId("f" * 24)
+    else:
+        resume_at, resume_id = since_at, since_id
+
+    if archive_pos and not has_more:
+        room = limit - len(page)
+        archived = await archive.archived_after(user_id, archive_after(archive_pos), room + 1)
+        page += [tx for _, tx in archived[:room]]
+        has_more = len(archived) > room
+        if has_more:
+            if room:
+                month, last = archived[room - 1]
+                archive_pos = f"{ARCHIVE_PENDING}{month}.{last['_id']}"
+            next_token = encode_sync_token(resume_at, resume_id, valid_from, archive_pos)
+
+    if not has_more:
+        # Caught up: everything up to the cutoff has been served
+        next_token = encode_sync_token(resume_at, resume_id, resume_at)
+
+    upserts, deletes = [], []
+    for row in page:
+        if row.get("deleted"):
+            deletes.append(str(row["_id"]))
+        else:
+            row["id"] = str(row["_id"])
+            upserts.append(row)
+
+    envelope = {"deletes": deletes, "next_token": next_token, "has_more": has_more}
+    return transaction_list_response(request, upserts, envelope, "upserts")
+
+def _idempotent_response(tx: dict) -> dict:
+    """What an Idempotency-Key replays for a created transaction."""
+    return {**{k: v for k, v in tx.items() if k not in ("_id", "idempotency_key")}, "id": str(tx["_id"])}
 
 @router.post("/", response_model=TransactionResponse)
-async def create_transaction(tx: TransactionCreate, current_user: dict = Depends(get_current_user)):
-    tx_data = tx.dict()
-    tx_data["user_id"] = str(current_user["_id"])
-    
-    new_tx = await transactions_collection.insert_one(tx_data)
-    created_tx = await transactions_collection.find_one({"_id": new_tx.inserted_id})
+async def create_transaction(
+    tx: TransactionCreate,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=128)
+):
+    """
+    Send an `Idempotency-Key` header to make retries safe: repeating the
+    request with the same key and body returns the original transaction
+    instead of creating a duplicate.
+    """
+    user_id = str(current_user["_id"])
+    payload = tx.dict()
+
+    async def written_with_key():
+        existing = await database.transactions_collection.find_one(
+            {"user_id": user_id, "idempotency_key": idempotency_key}
+        )
+        return _idempotent_response(existing) if existing is not None else None
+
+    if idempotency_key:
+        stored = await idempotency.begin(user_id, idempotency_key, "POST /transactions/", payload, written_with_key)
+        if stored is not None:
+            return stored
+
+    tx_data = {**payload, "user_id": user_id, "updated_at": datetime.utcnow()}
+    if idempotency_key:
+        tx_data["idempotency_key"] = idempotency_key
+    try:
+        # Concurrent creates are coalesced into one insert_many
+        created_tx = await transaction_inserts.insert(tx_data)
+    except Exception as e:
+        if idempotency_key:
+            # A request whose lease we took over may still have got its row in first
+            stored = await written_with_key() if isinstance(e, DuplicateKeyError) else None
+            if stored is not None:
+                await idempotency.complete(user_id, idempotency_key, stored)
+                return stored
+            await idempotency.abandon(user_id, idempotency_key)
+        raise
     created_tx["id"] = str(created_tx["_id"])
+
+    if idempotency_key:
+        await idempotency.complete(user_id, idempotency_key, _idempotent_response(created_tx))
+    await events.emit("transaction", user_id, "create", created_tx)
     return created_tx
 
 # ADD THIS PUT ENDPOINT
@@ -45,24 +323,48 @@ async def update_transaction(tx_id: str, tx: TransactionCreate, current_user: di
 
     tx_data = tx.dict()
     tx_data["user_id"] = str(current_user["_id"])
+    tx_data["updated_at"] = datetime.utcnow()
 
-    # Perform update
-    result = await transactions_collection.update_one(
-        {"_id": obj_id, "user_id": str(current_user["_id"])},
-        {"$set": tx_data}
+    # Perform update; the pre-image lets write subscribers undo the old values
+    user_id = tx_data["user_id"]
+    previous = await database.transactions_collection.find_one_and_update(
+        {"_id": obj_id, "user_id": user_id},
+        {"$set": tx_data},
+        return_document=ReturnDocument.BEFORE
     )
+    if previous is None and await archive.restore_transaction(user_id, obj_id):
+        previous = await database.transactions_collection.find_one_and_update(
+            {"_id": obj_id, "user_id": user_id},
+            {"$set": tx_data},
+            return_document=ReturnDocument.BEFORE
+        )
 
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    # Return updated document
-    updated_tx = await transactions_collection.find_one({"_id": obj_id})
+    updated_tx = {**previous, **tx_data}
+    await events.emit("transaction", user_id, "update", updated_tx, previous)
     updated_tx["id"] = str(updated_tx["_id"])
     return updated_tx
 
 @router.delete("/{tx_id}")
 async def delete_transaction(tx_id: str, current_user: dict = Depends(get_current_user)):
-    result = await transactions_collection.delete_one({"_id": ObjectId(tx_id), "user_id": str(current_user["_id"])})
-    if result.deleted_count == 0:
+    user_id = str(current_user["_id"])
+    deleted = await database.transactions_collection.find_one_and_delete(
+        {"_id": ObjectId(tx_id), "user_id": user_id}
+    )
+    if deleted is None and await archive.restore_transaction(user_id, ObjectId(tx_id)):
+        deleted = await database.transactions_collection.find_one_and_delete(
+            {"_id": ObjectId(tx_id), "user_id": user_id}
+        )
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
+
+    # Tombstone so other devices learn about the delete from /changes
+    await database.tombstones_collection.replace_one(
+        {"_id": deleted["_id"]},
+        {"user_id": user_id, "updated_at": datetime.utcnow()},
+        upsert=True
+    )
+    await events.emit("transaction", user_id, "delete", previous=deleted)
     return {"message": "Deleted successfully"}
\ No newline at end of file
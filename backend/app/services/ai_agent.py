@@ -1,23 +1,60 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
 from app.config import settings
+from app.metrics import CHAT_PROMPT_TOKENS, record_gemini_call
 from datetime import datetime, timedelta
+import asyncio
 import logging
 import re
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# ---------------- ✅ AI INIT (MODEL UPGRADED) ----------------
+# ---------------- ✅ AI INIT (LAZY, LOADED ON FIRST USE) ----------------
+# langchain_google_genai + langchain_core cost ~2s to import, so they are only
+# pulled in when an AI route actually runs (or by prewarm_llm after startup).
 
-llm = ChatGoogleGenerativeAI(
-    model="models/gemini-2.5-flash",   # ✅ HIGH QUOTA + STABLE
-    google_api_key=settings.GOOGLE_API_KEY,
-    temperature=0.0,
-    max_retries=0,
-    convert_system_message_to_human=True
-)
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                started = time.perf_counter()
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                _llm = ChatGoogleGenerativeAI(
+                    model="models/gemini-2.5-flash",   # ✅ HIGH QUOTA + STABLE
+                    google_api_key=settings.GOOGLE_API_KEY,
+                    temperature=0.0,
+                    max_retries=0,
+                    convert_system_message_to_human=True
+                )
+                logger.info(f"🤖 Gemini stack loaded in {time.perf_counter() - started:.2f}s")
+    return _llm
+
+
+def _prompt(system: str, human: str):
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([("system", system), ("human", human)])
+
+
+def _json_parser():
+    from langchain_core.output_parsers import JsonOutputParser
+    return JsonOutputParser()
+
+
+async def prewarm_llm(delay: float = 0.0):
+    """Import and build the LLM client in a worker thread once the app is serving."""
+    if delay:
+        await asyncio.sleep(delay)
+    try:
+        await asyncio.to_thread(get_llm)
+    except Exception as e:
+        logger.error(f"❌ Gemini pre-warm failed: {e}")
 
 # ---------------- ✅ SAFE MATCHER (NO FUZZY BUGS) ----------------
 
@@ -159,47 +196,86 @@ def manual_parse(text: str):
 
 async def parse_expense_text(text: str):
     today = datetime.now().strftime("%Y-%m-%d")
+    started = time.perf_counter()
 
     try:
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "Extract JSON: amount, category, note, date (YYYY-MM-DD), type (expense/income), account."),
-            ("human", f"Current Date: {today}. Text: {text}")
-        ])
-        
-        chain = prompt | llm | JsonOutputParser()
+        prompt = _prompt(
+            "Extract JSON: amount, category, note, date (YYYY-MM-DD), type (expense/income), account.",
+            f"Current Date: {today}. Text: {text}"
+        )
+        chain = prompt | get_llm() | _json_parser()
         result = await chain.ainvoke({})
 
-        if not result or result.get('amount') == 0:
-            raise ValueError("Empty AI result")
-
-        return result
-
     except Exception:
+        record_gemini_call("parse", "error", started)
+        return manual_parse(text)
+
+    if not result or result.get('amount') == 0:
+        record_gemini_call("parse", "fallback", started)
         return manual_parse(text)
 
+    record_gemini_call("parse", "success", started)
+    return result
+
 # ---------------- ✅ BUDGET PLAN (UNCHANGED) ----------------
 
 async def generate_budget_plan(salary, fixed, goals, spending_summary="", user_context=""):
+    started = time.perf_counter()
     try:
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "Financial advisor. Return JSON."),
-            ("human", f"Salary: {salary}, Fixed: {fixed}, Goals: {goals}")
-        ])
-        chain = prompt | llm | JsonOutputParser()
-        return await chain.ainvoke({})
+        prompt = _prompt(
+            "Financial advisor. Return JSON.",
+            f"Salary: {salary}, Fixed: {fixed}, Goals: {goals}"
+        )
+        chain = prompt | get_llm() | _json_parser()
+        plan = await chain.ainvoke({})
     except Exception:
+        record_gemini_call("plan", "error", started)
         return None
 
-# ---------------- ✅ CHAT BOT (UNCHANGED) ----------------
+    record_gemini_call("plan", "success" if plan else "fallback", started)
+    return plan
+
+# ---------------- ✅ CHAT BOT (WITH MEMORY) ----------------
+# Prompts are built by app/services/chat_memory.py, which keeps them within
+# CHAT_PROMPT_TOKEN_BUDGET; this module only talks to the model.
+
+def _messages(messages: list):
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+    types = {"system": SystemMessage, "user": HumanMessage, "assistant": AIMessage}
+    return [types[role](content=text) for role, text in messages]
 
-async def chat_with_finance_bot(message: str, context_data: str = ""):
+
+async def chat_with_finance_bot(messages: list):
+    """`messages` is [(role, text)] with role system/user/assistant. Returns None when the model fails."""
+    started = time.perf_counter()
     try:
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are RupeeRiser AI."),
-            ("human", f"Context: {context_data}. User: {message}")
-        ])
-        chain = prompt | llm
-        res = await chain.ainvoke({})
-        return res.content
+        res = await get_llm().ainvoke(_messages(messages))
     except Exception:
-        return "AI busy. Try again later."
+        record_gemini_call("chat", "error", started)
+        return None
+
+    usage = getattr(res, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        CHAT_PROMPT_TOKENS.labels(source="reported").observe(usage["input_tokens"])
+    record_gemini_call("chat", "success" if res.content else "fallback", started)
+    return res.content
+
+
+async def summarize_conversation(summary: str, turns: list, max_tokens: int):
+    """Fold `turns` into the running `summary`; None when the model fails."""
+    started = time.perf_counter()
+    transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    try:
+        res = await get_llm().ainvoke(_messages([
+            ("system",
+             "Update the running summary of a personal finance chat. Keep facts the user shared "
+             "(amounts, income, goals, preferences) and anything still unresolved. Drop small talk. "
+             f"Plain text, at most {max_tokens * 3 // 4} words."),
+            ("user", f"Current summary:\n{summary or '(none yet)'}\n\nNew messages:\n{transcript}"),
+        ]))
+    except Exception:
+        record_gemini_call("chat_summary", "error", started)
+        return None
+
+    record_gemini_call("chat_summary", "success" if res.content else "fallback", started)
+    return res.content or None
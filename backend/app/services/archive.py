@@ -0,0 +1,365 @@
+from app import database
+from app.config import settings
+from app.services import events
+from bson import Binary, ObjectId
+from datetime import datetime, timedelta
+import heapq
+import json
+import logging
+import re
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# ---------------- ✅ ARCHIVAL TIER ----------------
+# Transactions from whole months older than ARCHIVE_AFTER_DAYS are compacted
+# into one document per (user, month) in transaction_archive:
+#
+#   {_id: "<user_id>|YYYY-MM", user_id, month, count, ids, terms, categories,
+#    accounts, min_amount, max_amount, totals, by_category, items | items_z}
+#
+# `ids`, `terms`, `categories` and the amount range are kept uncompressed so
+# restores and searches can pick candidate buckets from indexes; `items` holds
+# the rows themselves, zlib-compressed JSON when ARCHIVE_COMPRESS_ITEMS is on.
+
+ITEM_FIELDS = ("amount", "category", "note", "date", "type", "account")
+TERM_RE = re.compile(r"[a-z0-9]+")
+
+
+def note_terms(note: str) -> set:
+    return set(TERM_RE.findall((note or "").lower()))
+
+
+def archive_cutoff_month() -> str:
+    """Months strictly before this YYYY-MM are archived; whole months only, so buckets are complete."""
+    return (datetime.utcnow() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)).strftime("%Y-%m")
+
+
+def _pack(tx: dict) -> dict:
+    item = {k: tx.get(k) for k in ITEM_FIELDS}
+    item["id"] = str(tx["_id"])
+    if tx.get("updated_at"):
+        item["updated_at"] = tx["updated_at"].isoformat()
+    return item
+
+
+def _unpack(item: dict, user_id: str) -> dict:
+    tx = dict(item)
+    tx["_id"] = ObjectId(item["id"])
+    tx["user_id"] = user_id
+    if item.get("updated_at"):
+        tx["updated_at"] = datetime.fromisoformat(item["updated_at"])
+    return tx
+
+
+def bucket_items(bucket: dict) -> list:
+    if "items_z" in bucket:
+        return json.loads(zlib.decompress(bucket["items_z"]))
+    return bucket.get("items", [])
+
+
+def _build_bucket(user_id: str, month: str, items: list) -> dict:
+    items.sort(key=lambda i: (i["date"], i["id"]), reverse=True)
+    totals = {"income": 0.0, "expense": 0.0}
+    by_category = {"income": {}, "expense": {}}
+    terms, categories, accounts = set(), set(), set()
+    for item in items:
+        kind = item.get("type") or "expense"
+        amount = float(item.get("amount") or 0)
+        totals[kind] = totals.get(kind, 0.0) + amount
+        entry = by_category.setdefault(kind, {}).setdefault(item.get("category") or "Other", {"total": 0.0, "count": 0})
+        entry["total"] += amount
+        entry["count"] += 1
+        terms |= note_terms(item.get("note"))
+        categories.add(item.get("category") or "Other")
+        accounts.add(item.get("account") or "wallet")
+
+    amounts = [float(i.get("amount") or 0) for i in items]
+    bucket = {
+        "user_id": user_id,
+        "month": month,
+        "count": len(items),
+        "ids": [ObjectId(i["id"]) for i in items],
+        "terms": sorted(terms),
+        "categories": sorted(categories),
+        "accounts": sorted(accounts),
+        "min_amount": min(amounts),
+        "max_amount": max(amounts),
+        "totals": totals,
+        "by_category": by_category,
+        "archived_at": datetime.utcnow(),
+    }
+    if settings.ARCHIVE_COMPRESS_ITEMS:
+        bucket["items_z"] = Binary(zlib.compress(json.dumps(items, separators=(",", ":")).encode(), 6))
+    else:
+        bucket["items"] = items
+    return bucket
+
+
+async def _write_month_aggregates(user_id: str, month: str, bucket: dict = None):
+    # Keep /insights/monthly complete for months that no longer live in the hot collection
+    await database.aggregates_collection.delete_many({"user_id": user_id, "month": month})
+    rows = [
+        {
+            "_id": f"{user_id}|{month}|{category}|{kind}",
+            "user_id": user_id, "month": month, "category": category, "type": kind,
+            "total": entry["total"], "count": entry["count"], "updated_at": datetime.utcnow(),
+        }
+        for kind, cats in (bucket or {}).get("by_category", {}).items()
+        for category, entry in cats.items()
+    ]
+    if rows:
+        await database.aggregates_collection.insert_many(rows)
+
+
+async def archive_user(user_id: str, cutoff_month: str = None) -> int:
+    """Move one user's transactions dated before `cutoff_month` into monthly buckets."""
+    cutoff_month = cutoff_month or archive_cutoff_month()
+    by_month = {}
+    cursor = database.transactions_collection.find(
+        {"user_id": user_id, "date": {"$lt": cutoff_month}}
+    ).batch_size(1000)
+    async for tx in cursor:
+        month = (tx.get("date") or "")[:7]
+        if len(month) == 7:
+            by_month.setdefault(month, []).append(_pack(tx))
+
+    moved = 0
+    for month, new_items in by_month.items():
+        bucket_id = f"{user_id}|{month}"
+        existing = await database.archive_collection.find_one({"_id": bucket_id})
+        items = {i["id"]: i for i in (bucket_items(existing) if existing else [])}
+        items.update({i["id"]: i for i in new_items})
+
+        bucket = _build_bucket(user_id, month, list(items.values()))
+        # Bucket first, originals second: a crash in between leaves a row in
+        # both places, which readers de-duplicate by id and the next run cleans up
+        await database.archive_collection.replace_one({"_id": bucket_id}, bucket, upsert=True)
+        await _write_month_aggregates(user_id, month, bucket)
+
+        ids = [ObjectId(i["id"]) for i in new_items]
+        for start in range(0, len(ids), settings.ARCHIVE_DELETE_BATCH):
+            batch = ids[start:start + settings.ARCHIVE_DELETE_BATCH]
+            await database.transactions_collection.delete_many({"_id": {"$in": batch}, "user_id": user_id})
+        moved += len(ids)
+    return moved
+
+
+async def archive_all_users() -> dict:
+    cutoff_month = archive_cutoff_month()
+    users = moved = 0
+    async for user in database.users_collection.find({}, {"_id": 1}).batch_size(100):
+        try:
+            count = await archive_user(str(user["_id"]), cutoff_month)
+        except Exception as e:
+            logger.error(f"❌ Archiving failed for {user['_id']}: {e}")
+            continue
+        users += 1 if count else 0
+        moved += count
+    logger.info(f"📦 Archived {moved} transactions for {users} users (before {cutoff_month})")
+    return {"cutoff_month": cutoff_month, "users": users, "transactions": moved}
+
+
+# ---------------- ✅ READ PATHS ----------------
+
+async def iter_archived(user_id: str, start_month: str = None, end_month: str = None, extra: dict = None):
+    """Yield archived rows (shaped like hot documents), newest month first."""
+    query = {"user_id": user_id}
+    if start_month or end_month:
+        query["month"] = {}
+        if start_month:
+            query["month"]["$gte"] = start_month
+        if end_month:
+            query["month"]["$lte"] = end_month
+    query.update(extra or {})
+
+    projection = {"ids": 0, "terms": 0}
+    async for bucket in database.archive_collection.find(query, projection).sort("month", -1):
+        for item in bucket_items(bucket):
+            yield _unpack(item, user_id)
+
+
+async def archived_after(user_id: str, after: tuple = None, limit: int = 500) -> list:
+    """
+    Up to `limit` archived rows as (month, row) in (month, id) order, after
+    `after` = (month, id) when given. Full syncs page through the archive
+    with this once the hot rows are served.
+    """
+    query = {"user_id": user_id}
+    if after:
+        query["month"] = {"$gte": after[0]}
+    rows = []
+    async for bucket in database.archive_collection.find(query, {"ids": 0, "terms": 0}).sort("month", 1):
+        for item in sorted(bucket_items(bucket), key=lambda i: i["id"]):
+            if after and (bucket["month"], item["id"]) <= after:
+                continue
+            rows.append((bucket["month"], _unpack(item, user_id)))
+            if len(rows) >= limit:
+                return rows
+    return rows
+
+
+def matches(tx: dict, filters: dict) -> bool:
+    """In-process equivalent of the hot-collection filters used by list/search."""
+    if filters.get("type") and tx.get("type") != filters["type"]:
+        return False
+    if filters.get("category") and tx.get("category") not in filters["category"]:
+        return False
+    if filters.get("account") and tx.get("account") not in filters["account"]:
+        return False
+    if filters.get("min_amount") is not None and (tx.get("amount") or 0) < filters["min_amount"]:
+        return False
+    if filters.get("max_amount") is not None and (tx.get("amount") or 0) > filters["max_amount"]:
+        return False
+    if filters.get("start_date") and tx.get("date", "") < filters["start_date"]:
+        return False
+    if filters.get("end_date") and tx.get("date", "") > filters["end_date"]:
+        return False
+    return True
+
+
+def bucket_prefilter(filters: dict, terms: set = None) -> dict:
+    """Bucket-level conditions that skip whole months before decompressing anything."""
+    query = {}
+    if filters.get("category"):
+        query["categories"] = {"$in": filters["category"]}
+    if filters.get("account"):
+        query["accounts"] = {"$in": filters["account"]}
+    if filters.get("min_amount") is not None:
+        query["max_amount"] = {"$gte": filters["min_amount"]}
+    if filters.get("max_amount") is not None:
+        query["min_amount"] = {"$lte": filters["max_amount"]}
+    if terms:
+        query["terms"] = {"$in": sorted(terms)}
+    return query
+
+
+async def archived_page(user_id: str, limit: int, filters: dict = None, newer_than_month: str = None) -> list:
+    """Newest `limit` archived rows matching `filters` (for the plain listing)."""
+    filters = filters or {}
+    rows = []
+    async for tx in iter_archived(
+        user_id,
+        start_month=newer_than_month or (filters.get("start_date") or "")[:7] or None,
+        end_month=(filters.get("end_date") or "")[:7] or None,
+        extra=bucket_prefilter(filters),
+    ):
+        if matches(tx, filters):
+            rows.append(tx)
+            if len(rows) >= limit:
+                break
+    return rows
+
+
+async def search_archived(user_id: str, q_terms: set, filters: dict, limit: int = None) -> list:
+    """
+    Archived matches ranked like the hot search: rows sharing more query
+    terms first, then newest. Returns at most `limit` rows (all when None).
+
+    Candidate buckets come from the indexes (month range, `terms`, the
+    prefilter) without their items. A bucket cannot score above the number
+    of query terms in its `terms` array, so buckets are opened best bound
+    first, newest first within a bound, and the scan stops as soon as no
+    unopened bucket can beat the worst of the `limit` rows kept.
+    """
+    query = {"user_id": user_id, **bucket_prefilter(filters, q_terms)}
+    start_month = (filters.get("start_date") or "")[:7]
+    end_month = (filters.get("end_date") or "")[:7]
+    if start_month or end_month:
+        query["month"] = {}
+        if start_month:
+            query["month"]["$gte"] = start_month
+        if end_month:
+            query["month"]["$lte"] = end_month
+
+    candidates = [
+        (len(q_terms & set(b.get("terms", []))), b["month"], b["_id"])
+        async for b in database.archive_collection.find(query, {"month": 1, "terms": 1})
+    ]
+    candidates.sort(reverse=True)
+
+    kept = []  # min-heap of (score, date, id, tx): kept[0] is the worst row kept
+    for bound, month, bucket_id in candidates:
+        if limit is not None and len(kept) >= limit:
+            worst_score, worst_date = kept[0][0], kept[0][1]
+            if bound < worst_score or (bound == worst_score and month < worst_date[:7]):
+                break
+        bucket = await database.archive_collection.find_one({"_id": bucket_id}, {"ids": 0, "terms": 0})
+        for item in bucket_items(bucket or {}):
+            tx = _unpack(item, user_id)
+            if not matches(tx, filters):
+                continue
+            score = len(q_terms & note_terms(tx.get("note"))) if q_terms else 0
+            if q_terms and not score:
+                continue
+            entry = (score, tx["date"], item["id"], tx)
+            if limit is None or len(kept) < limit:
+                heapq.heappush(kept, entry)
+            elif entry[:3] > kept[0][:3]:
+                heapq.heapreplace(kept, entry)
+
+    kept.sort(key=lambda e: e[:3], reverse=True)
+    return [tx for _, _, _, tx in kept]
+
+
+async def restore_transaction(user_id: str, tx_id: ObjectId):
+    """
+    Move one archived row back to the hot collection so it can be edited or
+    deleted. Returns the restored row, or None when no bucket holds it.
+    """
+    bucket = await database.archive_collection.find_one({"user_id": user_id, "ids": tx_id})
+    if not bucket:
+        return None
+
+    items = bucket_items(bucket)
+    item = next((i for i in items if i["id"] == str(tx_id)), None)
+    if item is None:
+        logger.warning(f"⚠️ Archive bucket {bucket['_id']} lists {tx_id} in ids but not in items")
+        return None
+    remaining = [i for i in items if i["id"] != str(tx_id)]
+
+    tx = _unpack(item, user_id)
+    tx.pop("id", None)
+    await database.transactions_collection.replace_one({"_id": tx_id}, tx, upsert=True)
+    if remaining:
+        await database.archive_collection.replace_one(
+            {"_id": bucket["_id"]}, _build_bucket(user_id, bucket["month"], remaining)
+        )
+    else:
+        await database.archive_collection.delete_one({"_id": bucket["_id"]})
+    # The month's aggregates keep counting the row: it is still in that month,
+    # just hot. The edit or delete that follows adjusts them (see below).
+    return tx
+
+
+async def _adjust_archived_aggregates(kind, user_id, op, doc, previous):
+    # Months before the cutoff are only re-summarised when an archive run
+    # re-buckets them, so writes to them keep their totals exact in between
+    cutoff = archive_cutoff_month()
+    changes = []
+    if previous and op in ("update", "delete"):
+        changes.append((previous, -1))
+    if doc and op in ("create", "update"):
+        changes.append((doc, 1))
+
+    for tx, sign in changes:
+        month = (tx.get("date") or "")[:7]
+        if len(month) != 7 or month >= cutoff:
+            continue
+        category = tx.get("category") or "Other"
+        tx_type = tx.get("type") or "expense"
+        row_id = f"{user_id}|{month}|{category}|{tx_type}"
+        await database.aggregates_collection.update_one(
+            {"_id": row_id},
+            {
+                "$inc": {"total": sign * float(tx.get("amount") or 0), "count": sign},
+                "$set": {"updated_at": datetime.utcnow()},
+                "$setOnInsert": {"user_id": user_id, "month": month, "category": category, "type": tx_type},
+            },
+            upsert=True,
+        )
+        if sign < 0:
+            await database.aggregates_collection.delete_one({"_id": row_id, "count": {"$lte": 0}})
+
+
+events.subscribe("transaction", _adjust_archived_aggregates)
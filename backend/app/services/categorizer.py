@@ -0,0 +1,227 @@
+from app import database
+from app.config import settings
+from app.metrics import CATEGORIZER_LOOKUPS
+from app.services import events
+from app.services.ai_agent import manual_parse
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from urllib.parse import unquote
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# ---------------- ✅ PER-USER LEARNED CATEGORIZER ----------------
+# Each user gets one document in category_models:
+#
+#   {_id: user_id, tokens: {token: {"c": {category: n}, "a": {account: n}, "t": {type: n}}},
+#    updates, built_at}
+#
+# Counts are bumped with $inc on every saved transaction (and taken back on
+# edits and deletes), so the model follows the user's own labels ("annas" ->
+# Food, "rapido" -> Transport) without a rebuild. Every
+# CATEGORIZER_REBUILD_EVERY updates the model is rebuilt from recent history
+# and pruned to the strongest CATEGORIZER_MAX_TOKENS tokens.
+
+REBUILD_ATTEMPTS = 3
+TOKEN_RE = re.compile(r"[a-z]+")
+STOPWORDS = {
+    "rs", "rupees", "for", "on", "in", "at", "to", "the", "and", "of", "from", "with",
+    "paid", "pay", "spent", "bought", "got", "my", "a", "an", "k",
+    "tdy", "today", "ystd", "yesterday", "tmrw", "tomorrow",
+}
+
+
+def tokenize(text: str) -> list:
+    seen = []
+    for token in TOKEN_RE.findall((text or "").lower()):
+        if len(token) > 1 and token not in STOPWORDS and token not in seen:
+            seen.append(token)
+    return seen
+
+
+def field_key(label: str) -> str:
+    # Categories/accounts are free text; '.' and a leading '$' are not allowed in Mongo field names
+    return label.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _vote(stats: list, field: str):
+    """Each token casts one vote split across its labels; returns (label, confidence, support)."""
+    scores, support = {}, {}
+    for entry in stats:
+        # Unlearning a row the last rebuild never saw can leave counts at or below 0
+        counts = {label: n for label, n in (entry.get(field) or {}).items() if n > 0}
+        total = sum(counts.values())
+        for label, n in counts.items():
+            scores[label] = scores.get(label, 0.0) + n / total
+            support[label] = support.get(label, 0) + n
+    if not scores:
+        return None, 0.0, 0
+    best = max(scores, key=scores.get)
+    return unquote(best), scores[best] / len(stats), support[best]
+
+
+# ---------------- ✅ TRAINING ----------------
+
+async def build_model(user_id: str) -> dict:
+    """
+    Rebuild a user's model from their most recent transactions. The write is
+    conditional on `updates` being unchanged since the rebuild started, so a
+    learn() landing mid-rebuild is never overwritten; the rebuild starts over
+    instead and its history scan then includes that write.
+    """
+    for _ in range(REBUILD_ATTEMPTS):
+        current = await database.categorizer_collection.find_one({"_id": user_id}, {"updates": 1})
+        tokens = await _count_history(user_id)
+        model = {"_id": user_id, "tokens": tokens, "updates": 0, "built_at": datetime.utcnow()}
+        try:
+            if current is None:
+                await database.categorizer_collection.insert_one(model)
+                return model
+            result = await database.categorizer_collection.replace_one(
+                {"_id": user_id, "updates": current.get("updates", 0)}, model
+            )
+            if result.matched_count:
+                return model
+        except DuplicateKeyError:
+            pass  # another rebuild created the model first
+
+    # Still being written to: keep the incrementally updated model, unpruned until next time
+    logger.warning(f"⚠️ Categorizer rebuild for {user_id} kept losing to concurrent updates")
+    return await database.categorizer_collection.find_one({"_id": user_id}) or model
+
+
+async def _count_history(user_id: str) -> dict:
+    tokens = {}
+    cursor = database.transactions_collection.find(
+        {"user_id": user_id}, {"note": 1, "category": 1, "account": 1, "type": 1}
+    ).sort("date", -1).limit(settings.CATEGORIZER_HISTORY_ROWS)
+    async for tx in cursor:
+        labels = {
+            "c": field_key(tx.get("category") or "Other"),
+            "a": field_key(tx.get("account") or "wallet"),
+            "t": tx.get("type") or "expense",
+        }
+        for token in tokenize(tx.get("note")):
+            entry = tokens.setdefault(token, {"c": {}, "a": {}, "t": {}})
+            for field, label in labels.items():
+                entry[field][label] = entry[field].get(label, 0) + 1
+
+    if len(tokens) > settings.CATEGORIZER_MAX_TOKENS:
+        strongest = sorted(tokens, key=lambda t: sum(tokens[t]["c"].values()), reverse=True)
+        tokens = {t: tokens[t] for t in strongest[:settings.CATEGORIZER_MAX_TOKENS]}
+    return tokens
+
+
+def _count_labels(tx: dict, weight: int, inc: dict):
+    category = field_key(tx.get("category") or "Other")
+    account = field_key(tx.get("account") or "wallet")
+    tx_type = tx.get("type") or "expense"
+    for token in tokenize(tx.get("note")):
+        for path in (f"tokens.{token}.c.{category}", f"tokens.{token}.a.{account}", f"tokens.{token}.t.{tx_type}"):
+            inc[path] = inc.get(path, 0) + weight
+
+
+async def learn(user_id: str, tx: dict = None, previous: dict = None):
+    """
+    Fold one saved transaction into the user's model, taking back what
+    `previous` (the row it replaced, or the deleted row when `tx` is None)
+    taught it. Never fails the write that called it.
+    """
+    inc = {}
+    if previous:
+        _count_labels(previous, -1, inc)
+    if tx:
+        _count_labels(tx, 1, inc)
+    # One $inc per path: an edit that kept a label cancels out instead of conflicting
+    inc = {path: n for path, n in inc.items() if n}
+    if not inc:
+        return
+    inc["updates"] = 1
+    try:
+        model = await database.categorizer_collection.find_one_and_update(
+            {"_id": user_id}, {"$inc": inc}, projection={"updates": 1}
+        )
+        # No model yet: the first lookup builds it from history, which includes this row
+        if model and (model.get("updates", 0) + 1) % settings.CATEGORIZER_REBUILD_EVERY == 0:
+            await build_model(user_id)
+    except Exception as e:
+        logger.error(f"❌ Categorizer update failed for {user_id}: {e}")
+
+
+async def _on_transaction_write(kind, user_id, op, doc, previous):
+    # An edit is usually a correction of the category: the old labels are
+    # taken back so the correction wins instead of tying with the mistake
+    if op == "create":
+        await learn(user_id, doc)
+    elif op == "update":
+        await learn(user_id, doc, previous)
+    elif op == "delete":
+        await learn(user_id, previous=previous)
+
+
+events.subscribe("transaction", _on_transaction_write)
+
+
+# ---------------- ✅ LOOKUP ----------------
+
+async def predict(user_id: str, text: str):
+    """
+    Labels for `text` learned from this user's history, or None with the
+    reason when the model is not sure enough to skip the LLM.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None, "unfamiliar"
+
+    projection = {f"tokens.{token}": 1 for token in tokens}
+    model = await database.categorizer_collection.find_one({"_id": user_id}, projection)
+    if model is None:
+        model = await build_model(user_id)
+
+    learned = model.get("tokens", {})
+    known = [learned[t] for t in tokens if any(n > 0 for n in learned.get(t, {}).get("c", {}).values())]
+    if not known or len(known) / len(tokens) < settings.CATEGORIZER_MIN_COVERAGE:
+        return None, "unfamiliar"
+
+    category, confidence, support = _vote(known, "c")
+    if confidence < settings.CATEGORIZER_MIN_CONFIDENCE or support < settings.CATEGORIZER_MIN_SUPPORT:
+        return None, "low_confidence"
+
+    account, account_confidence, _ = _vote(known, "a")
+    tx_type, _, _ = _vote(known, "t")
+    return {
+        "category": category,
+        "account": account if account_confidence >= settings.CATEGORIZER_MIN_CONFIDENCE else None,
+        "type": tx_type or "expense",
+        "confidence": round(confidence, 3),
+    }, "hit"
+
+
+async def parse_from_history(user_id: str, text: str):
+    """
+    Answer /ai/parse without the LLM: amount, date and note come from the
+    rule-based parser, category/account/type from the user's model.
+    Returns None when the LLM is still needed.
+    """
+    try:
+        learned, outcome = await predict(user_id, text)
+    except Exception as e:
+        logger.error(f"❌ Categorizer lookup failed for {user_id}: {e}")
+        learned, outcome = None, "error"
+
+    result = None
+    if learned:
+        base = manual_parse(text)
+        if base["amount"] > 0:
+            result = {
+                **base,
+                "category": learned["category"],
+                "type": learned["type"],
+                "account": learned["account"] or base["account"],
+            }
+        else:
+            outcome = "no_amount"  # amounts in words still need the LLM
+
+    CATEGORIZER_LOOKUPS.labels(outcome=outcome).inc()
+    return result
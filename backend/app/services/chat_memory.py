@@ -0,0 +1,197 @@
+from app import database
+from app.config import settings
+from app.metrics import CHAT_PROMPT_TOKENS, CHAT_SUMMARIES
+from app.services.ai_agent import chat_with_finance_bot, summarize_conversation
+from app.services.rate_limiter import ai_admission
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+import asyncio
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# ---------------- ✅ CHAT MEMORY ----------------
+# One document per (user, conversation_id) in chat_conversations:
+#
+#   {_id: "<user_id>|<conversation_id>", user_id, conversation_id,
+#    summary: "...", summary_version: 3, turns: [{id, role, content, at}, ...]}
+#
+# `turns` only holds messages not yet folded into `summary`. Each prompt is
+# system + summary + context, the newest CHAT_RECENT_TURNS turns verbatim and
+# the new message, trimmed to CHAT_PROMPT_TOKEN_BUDGET. Once enough turns
+# fall out of the recent window, a background task asks the model to fold
+# them into the summary and pulls them from the document, so neither the
+# prompt nor the stored conversation grows with its length. The fold is
+# claimed on the document (`summarizing_until`), so only one worker across
+# all processes calls the model for a conversation at a time.
+
+SYSTEM_PROMPT = (
+    "You are RupeeRiser AI, a personal finance assistant for Indian users. "
+    "Answer briefly and use the conversation so far."
+)
+
+_tasks = set()
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; only used for budgeting, not billing
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def clip(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max(max_tokens * 4 - 1, 0)].rstrip() + "…"
+
+
+def _key(user_id: str, conversation_id: str) -> str:
+    return f"{user_id}|{conversation_id}"
+
+
+async def load(user_id: str, conversation_id: str) -> dict:
+    doc = await database.conversations_collection.find_one({"_id": _key(user_id, conversation_id)})
+    return doc or {"summary": "", "turns": []}
+
+
+def build_prompt(conversation: dict, message: str, context: str = "") -> tuple:
+    """[(role, text)] for the model and its estimated size, never above CHAT_PROMPT_TOKEN_BUDGET."""
+    budget = settings.CHAT_PROMPT_TOKEN_BUDGET
+    system = SYSTEM_PROMPT
+    if conversation.get("summary"):
+        system += "\n\nEarlier in this conversation: " + clip(conversation["summary"], settings.CHAT_SUMMARY_MAX_TOKENS)
+    if context:
+        system += "\n\nContext: " + clip(context, settings.CHAT_CONTEXT_MAX_TOKENS)
+    current = clip(message, settings.CHAT_MESSAGE_MAX_TOKENS)
+    if estimate_tokens(system) + estimate_tokens(current) > budget:
+        system = clip(system, budget - estimate_tokens(current))
+    used = estimate_tokens(system) + estimate_tokens(current)
+
+    # Newest turns first, so a tight budget drops the oldest ones
+    history = []
+    for turn in reversed(conversation.get("turns", [])[-settings.CHAT_RECENT_TURNS:]):
+        text = clip(turn["content"], settings.CHAT_MESSAGE_MAX_TOKENS)
+        if used + estimate_tokens(text) > budget:
+            break
+        history.append((turn["role"], text))
+        used += estimate_tokens(text)
+    history.reverse()
+
+    CHAT_PROMPT_TOKENS.labels(source="estimate").observe(used)
+    return [("system", system), *history, ("user", current)], used
+
+
+async def record_exchange(user_id: str, conversation_id: str, message: str, reply: str) -> dict:
+    now = datetime.utcnow()
+    turns = [
+        {"id": str(ObjectId()), "role": role, "content": clip(text, settings.CHAT_MESSAGE_MAX_TOKENS), "at": now}
+        for role, text in (("user", message), ("assistant", reply))
+    ]
+    doc = await database.conversations_collection.find_one_and_update(
+        {"_id": _key(user_id, conversation_id)},
+        {
+            # $slice is only a backstop for when summarization keeps failing
+            "$push": {"turns": {"$each": turns, "$slice": -settings.CHAT_MAX_STORED_TURNS}},
+            "$set": {"updated_at": now},
+            "$setOnInsert": {
+                "user_id": user_id, "conversation_id": conversation_id,
+                "summary": "", "summary_version": 0, "created_at": now,
+            },
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    if len(doc["turns"]) >= settings.CHAT_RECENT_TURNS + settings.CHAT_SUMMARIZE_AFTER_TURNS:
+        _spawn(summarize(user_id, conversation_id))
+    return doc
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _tasks.add(task)  # keep a reference until done
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+async def summarize(user_id: str, conversation_id: str):
+    """Fold the turns older than the recent window into the summary (runs after the reply was sent)."""
+    key = _key(user_id, conversation_id)
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=settings.CHAT_SUMMARY_LEASE_SECONDS)
+    try:
+        # Claim the fold; a claim older than the lease belongs to a worker that died
+        doc = await database.conversations_collection.find_one_and_update(
+            {"_id": key, "$or": [{"summarizing_until": None}, {"summarizing_until": {"$lt": now}}]},
+            {"$set": {"summarizing_until": lease}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            CHAT_SUMMARIES.labels(outcome="skipped_claimed").inc()
+            return
+    except Exception as e:
+        CHAT_SUMMARIES.labels(outcome="error").inc()
+        logger.error(f"❌ Chat summarization failed for {key}: {e}")
+        return
+
+    try:
+        older = doc.get("turns", [])[:-settings.CHAT_RECENT_TURNS]
+        if len(older) < settings.CHAT_SUMMARIZE_AFTER_TURNS:
+            return
+        # Same Gemini quota as interactive calls; if busy, the next reply retries
+        if not await ai_admission.admit(user_id, "chat_summary"):
+            CHAT_SUMMARIES.labels(outcome="skipped_busy").inc()
+            return
+        summary = await summarize_conversation(doc.get("summary", ""), older, settings.CHAT_SUMMARY_MAX_TOKENS)
+        if not summary:
+            CHAT_SUMMARIES.labels(outcome="error").inc()
+            return
+
+        # Versioned so a fold computed from a stale summary (a worker whose lease ran out) is dropped
+        result = await database.conversations_collection.update_one(
+            {"_id": key, "summary_version": doc.get("summary_version", 0)},
+            {
+                "$set": {"summary": clip(summary, settings.CHAT_SUMMARY_MAX_TOKENS), "summarized_at": datetime.utcnow()},
+                "$inc": {"summary_version": 1},
+                "$pull": {"turns": {"id": {"$in": [t["id"] for t in older]}}},
+            },
+        )
+        CHAT_SUMMARIES.labels(outcome="folded" if result.matched_count else "conflict").inc()
+    except Exception as e:
+        CHAT_SUMMARIES.labels(outcome="error").inc()
+        logger.error(f"❌ Chat summarization failed for {key}: {e}")
+    finally:
+        # Release only our own claim, so the next reply can fold again right away
+        try:
+            await database.conversations_collection.update_one(
+                {"_id": key, "summarizing_until": lease}, {"$unset": {"summarizing_until": ""}}
+            )
+        except Exception as e:
+            logger.error(f"❌ Could not release the chat summary claim for {key}: {e}")
+
+
+async def reply(user_id: str, conversation_id: str, message: str, context: str = ""):
+    """Answer `message` with the conversation's memory; None when the model failed."""
+    conversation = await load(user_id, conversation_id)
+    messages, _ = build_prompt(conversation, message, context)
+    response = await chat_with_finance_bot(messages)
+    if response:
+        await record_exchange(user_id, conversation_id, message, response)
+    return response
+
+
+async def history(user_id: str, conversation_id: str) -> dict:
+    doc = await database.read_db.chat_conversations.find_one(
+        {"_id": _key(user_id, conversation_id)}, {"summary": 1, "turns": 1}
+    )
+    doc = doc or {}
+    return {
+        "conversation_id": conversation_id,
+        "summary": doc.get("summary", ""),
+        "turns": [{"role": t["role"], "content": t["content"], "at": t["at"]} for t in doc.get("turns", [])],
+    }
+
+
+async def forget(user_id: str, conversation_id: str) -> bool:
+    result = await database.conversations_collection.delete_one({"_id": _key(user_id, conversation_id)})
+    return result.deleted_count > 0
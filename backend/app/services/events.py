@@ -0,0 +1,45 @@
+from fastapi import Request
+import contextvars
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ---------------- ✅ WRITE EVENTS ----------------
+# Routers call `emit` after every successful write; derived data (learned
+# categorizer, cached projections, ...) subscribes here instead of being
+# wired into each router.
+#
+#   kind:     "transaction", "budget", "goal", ...
+#   op:       "create", "update" or "delete"
+#   doc:      the document as written (None for deletes)
+#   previous: the document before the write, when the router has it
+#
+# The device that made the write travels with it as `write_origin`: clients
+# send `X-Device-Id` on writes and origin_middleware sets it for the request,
+# so subscribers (the realtime push) can tell the writer's device apart.
+
+_handlers = {}
+write_origin = contextvars.ContextVar("write_origin", default=None)
+
+
+async def origin_middleware(request: Request, call_next):
+    token = write_origin.set(request.headers.get("x-device-id", "")[:128] or None)
+    try:
+        return await call_next(request)
+    finally:
+        write_origin.reset(token)
+
+
+def subscribe(kinds, handler):
+    """Register `async handler(kind, user_id, op, doc, previous)` for one or more kinds."""
+    for kind in ([kinds] if isinstance(kinds, str) else kinds):
+        _handlers.setdefault(kind, []).append(handler)
+
+
+async def emit(kind: str, user_id: str, op: str, doc: dict = None, previous: dict = None):
+    # Handlers run in order and never fail the write that triggered them
+    for handler in _handlers.get(kind, []):
+        try:
+            await handler(kind, user_id, op, doc, previous)
+        except Exception as e:
+            logger.error(f"❌ {kind} {op} handler {handler.__qualname__} failed for {user_id}: {e}")
@@ -0,0 +1,225 @@
+from app import database
+from app.config import settings
+from app.services import events
+from app.services.categorizer import field_key
+from calendar import monthrange
+from datetime import date
+from pymongo.errors import DuplicateKeyError
+from urllib.parse import unquote
+import asyncio
+import json
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ---------------- ✅ MONTH-END CATEGORY FORECAST ----------------
+# One state document per user in category_forecasts, rebuilt at most once a
+# day (or after a budget change / backdated write):
+#
+#   {user_id, month, built_on, version, mtd: {category: spent},
+#    baseline: {category: {"cum": [31 mean cumulative spend by day],
+#    "total": mean month total}}, budgets: {category: amount}}
+#
+# Transaction writes in the current month only $inc `mtd`, so serving the
+# forecast is a handful of array operations over the stored state. Every
+# increment and invalidation also bumps `version`, which a rebuild checks
+# before it stores its result.
+
+REBUILD_ATTEMPTS = 3
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _shift_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def build_baseline(rows: list, start: date, months: int) -> dict:
+    """
+    Mean cumulative daily spend curve and mean month total per category,
+    from (category, YYYY-MM-DD, amount) rows of the past `months` months.
+    Months before the user's first expense are not counted.
+    """
+    if not rows:
+        return {}
+    categories = sorted({r[0] for r in rows})
+    cat_index = {c: i for i, c in enumerate(categories)}
+    month_of = np.array([(int(r[1][:4]) - start.year) * 12 + int(r[1][5:7]) - start.month for r in rows])
+    day_of = np.array([int(r[1][8:10]) - 1 for r in rows])
+    cat_of = np.array([cat_index[r[0]] for r in rows])
+
+    spend = np.zeros((len(categories), months, 31))
+    np.add.at(spend, (cat_of, month_of, day_of), np.array([r[2] for r in rows], dtype=np.float64))
+    active = spend[:, month_of.min():, :]
+    cum = np.cumsum(active, axis=2).mean(axis=1)   # (categories, 31)
+    return {
+        c: {"cum": cum[i].round(2).tolist(), "total": round(float(cum[i, -1]), 2)}
+        for i, c in enumerate(categories)
+    }
+
+
+def category_budgets(budget: dict, baseline: dict) -> dict:
+    """Explicit `categoryBudgets` in the config blob win; otherwise each category's historical share of discretionary money."""
+    try:
+        explicit = json.loads(budget.get("config") or "{}").get("categoryBudgets") or {}
+    except (ValueError, AttributeError):
+        explicit = {}
+    totals = {c: b["total"] for c, b in baseline.items() if b["total"] > 0}
+    discretionary = (budget.get("salary") or 0) - sum((budget.get("fixed_costs") or {}).values())
+    budgets = {}
+    for category, total in totals.items():
+        # Without a salary, a "typical month" is the yardstick
+        budgets[category] = discretionary * total / sum(totals.values()) if discretionary > 0 else total
+    budgets.update({c: float(v) for c, v in explicit.items() if isinstance(v, (int, float))})
+    return {field_key(c): round(v, 2) for c, v in budgets.items()}
+
+
+async def _read_spend(user_id: str, history_start: date, current: str) -> tuple:
+    """(history rows for build_baseline, month-to-date spend by category key)"""
+    pipeline = [
+        {"$match": {"user_id": user_id, "type": "expense", "date": {"$gte": history_start.isoformat()}}},
+        {"$group": {
+            "_id": {"category": {"$ifNull": ["$category", "Other"]}, "date": {"$substrBytes": ["$date", 0, 10]}},
+            "total": {"$sum": "$amount"},
+        }},
+    ]
+    history, mtd = [], {}
+    async for row in database.transactions_collection.aggregate(pipeline):
+        category, day = row["_id"]["category"], row["_id"]["date"]
+        if day[:7] == current:
+            mtd[field_key(category)] = mtd.get(field_key(category), 0) + row["total"]
+        elif day < current and len(day) == 10:
+            history.append((category, day, row["total"]))
+    return history, mtd
+
+
+async def rebuild_state(user_id: str, today: date = None) -> dict:
+    """
+    Rebuild the state from scratch. It is only stored if `version` (bumped by
+    every increment and invalidation) is unchanged since the rebuild started;
+    otherwise a write landed mid-rebuild and the rebuild starts over, so the
+    stored state never loses an increment.
+    """
+    today = today or date.today()
+    month_start = _month_start(today)
+    history_start = _shift_months(month_start, -settings.FORECAST_HISTORY_MONTHS)
+    current = month_start.isoformat()[:7]
+
+    for _ in range(REBUILD_ATTEMPTS):
+        stored = await database.forecasts_collection.find_one({"user_id": user_id}, {"version": 1})
+        version = stored.get("version") if stored else None
+        history, mtd = await _read_spend(user_id, history_start, current)
+        baseline = await asyncio.to_thread(build_baseline, history, history_start, settings.FORECAST_HISTORY_MONTHS)
+        budget = await database.budget_settings_collection.find_one({"user_id": user_id}) or {}
+        state = {
+            "user_id": user_id,
+            "month": current,
+            "built_on": today.isoformat(),
+            "version": version or 0,
+            "mtd": mtd,
+            "baseline": {field_key(c): b for c, b in baseline.items()},
+            "budgets": category_budgets(budget, baseline),
+        }
+        try:
+            # A changed version misses the filter, and the upsert then hits the unique user_id index
+            await database.forecasts_collection.replace_one({"user_id": user_id, "version": version}, state, upsert=True)
+            return state
+        except DuplicateKeyError:
+            continue
+
+    logger.warning(f"⚠️ Forecast rebuild for {user_id} kept losing to concurrent writes; serving it uncached")
+    return state
+
+
+def project(state: dict, today: date) -> dict:
+    """Month-end projection for every category at once."""
+    categories = sorted(set(state["mtd"]) | set(state["baseline"]) | set(state["budgets"]))
+    day = today.day
+    days_in_month = monthrange(today.year, today.month)[1]
+    spent = np.array([state["mtd"].get(c, 0.0) for c in categories])
+    has_history = np.array([c in state["baseline"] for c in categories])
+    curve = np.array([state["baseline"].get(c, {}).get("cum", [0.0] * 31) for c in categories]).reshape(-1, 31)
+    budgets = np.array([state["budgets"].get(c, 0.0) for c in categories])
+
+    # Usual spend so far and still to come at this point of the month
+    usual_so_far = curve[:, day - 1]
+    usual_rest = curve[:, days_in_month - 1] - usual_so_far
+    # Running hotter or colder than usual scales what is still to come
+    pace = np.clip(np.divide(spent, usual_so_far, out=np.ones_like(spent), where=usual_so_far > 0), 0.5, 2.0)
+    forecast = np.where(has_history, spent + pace * usual_rest, spent * days_in_month / day)
+
+    over = (budgets > 0) & (forecast > budgets * settings.FORECAST_ALERT_RATIO)
+    rows = []
+    for i, category in enumerate(categories):
+        rows.append({
+            "category": unquote(category),
+            "spent": round(float(spent[i]), 2),
+            "forecast": round(float(forecast[i]), 2),
+            "budget": round(float(budgets[i]), 2) if budgets[i] > 0 else None,
+            "over_by": round(float(forecast[i] - budgets[i]), 2) if over[i] else 0.0,
+            "alert": bool(over[i]),
+        })
+    rows.sort(key=lambda r: (not r["alert"], -r["forecast"]))
+    return {
+        "month": state["month"],
+        "day": day,
+        "days_in_month": days_in_month,
+        "total_spent": round(float(spent.sum()), 2),
+        "total_forecast": round(float(forecast.sum()), 2),
+        "categories": rows,
+        "alerts": [r["category"] for r in rows if r["alert"]],
+    }
+
+
+async def get_forecast(user_id: str) -> dict:
+    today = date.today()
+    state = await database.forecasts_collection.find_one({"user_id": user_id})
+    # Daily rebuild: picks up month rollover and bounds any drift from missed increments
+    if not state or state.get("built_on") != today.isoformat():
+        state = await rebuild_state(user_id, today)
+    return project(state, today)
+
+
+# ---------------- ✅ INCREMENTAL UPDATES ----------------
+
+async def _on_transaction_write(kind, user_id, op, doc, previous):
+    current = date.today().isoformat()[:7]
+    history_start = _shift_months(_month_start(date.today()), -settings.FORECAST_HISTORY_MONTHS).isoformat()
+    inc, stale = {}, False
+    for tx, sign in ((previous, -1), (doc, 1)):
+        if not tx or tx.get("type") != "expense":
+            continue
+        tx_date = tx.get("date") or ""
+        if tx_date[:7] == current:
+            key = f"mtd.{field_key(tx.get('category') or 'Other')}"
+            inc[key] = inc.get(key, 0) + sign * float(tx.get("amount") or 0)
+        elif history_start <= tx_date < current:
+            stale = True  # backdated write changes the daily curves
+
+    if stale:
+        await _invalidate(user_id)
+    elif inc:
+        inc["version"] = 1
+        result = await database.forecasts_collection.update_one({"user_id": user_id, "month": current}, {"$inc": inc})
+        if not result.matched_count:
+            # No state for this month: a rebuild may be reading history right now
+            await _invalidate(user_id)
+
+
+async def _on_budget_write(kind, user_id, op, doc, previous):
+    await _invalidate(user_id)
+
+
+async def _invalidate(user_id: str):
+    # Marks the state for a rebuild and bumps its version, so a rebuild already running can't store it
+    await database.forecasts_collection.update_one(
+        {"user_id": user_id}, {"$set": {"built_on": None}, "$inc": {"version": 1}}, upsert=True
+    )
+
+
+events.subscribe("transaction", _on_transaction_write)
+events.subscribe("budget", _on_budget_write)
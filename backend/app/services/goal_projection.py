@@ -0,0 +1,219 @@
+from app import database
+from app.config import settings
+from app.models import TARGET_DATE_PATTERN
+from app.services import events
+from app.services.archive import archive_cutoff_month
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from typing import Optional
+from zlib import crc32
+import asyncio
+import logging
+import numpy as np
+import re
+
+logger = logging.getLogger(__name__)
+
+# ---------------- ✅ GOAL FEASIBILITY SIMULATION ----------------
+# Future monthly savings are simulated by resampling the user's completed
+# months (income and expense drawn together, so their correlation is kept).
+# One (paths x horizon) matrix of cumulative savings serves all of a user's
+# goals at once. The stored result is compact and target-date independent:
+#
+#   cdf[g][k]  share of paths that have reached goal g by the end of month k+1
+#   cum_p10[k] 10th percentile of cumulative savings after month k+1
+#
+# It lives in goal_projections until a transaction, budget or goal write
+# marks it stale. Those writes also bump the document's `generation`; a
+# simulation only stores its result if the generation it started from is
+# still current, so one that raced a write never overwrites the invalidation.
+
+STORE_ATTEMPTS = 3  # simulations per request before serving an uncached result
+
+
+def month_index(month: str) -> int:
+    year, mon = month[:7].split("-")
+    return int(year) * 12 + int(mon) - 1
+
+
+def target_month_index(target_date) -> Optional[int]:
+    """month_index of a goal's target date, or None when it is not a YYYY-MM[-DD] date."""
+    if not isinstance(target_date, str) or not re.match(TARGET_DATE_PATTERN, target_date):
+        return None
+    return month_index(target_date)
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+async def monthly_history(user_id: str, months: int) -> np.ndarray:
+    """(income, expense) per completed month over the last `months`, oldest first; gaps count as zero."""
+    current = month_index(datetime.now().strftime("%Y-%m"))
+    since = month_label(current - months)
+    until = month_label(current)
+    totals = {}
+
+    pipeline = [
+        {"$match": {"user_id": user_id, "date": {"$gte": since, "$lt": until}}},
+        {"$group": {
+            "_id": {"month": {"$substrBytes": ["$date", 0, 7]}, "type": {"$ifNull": ["$type", "expense"]}},
+            "total": {"$sum": "$amount"},
+        }},
+    ]
+    async for row in database.transactions_collection.aggregate(pipeline):
+        totals.setdefault(row["_id"]["month"], {})[row["_id"]["type"]] = row["total"]
+
+    # Archived months are no longer in the hot collection; their totals are in user_aggregates
+    cutoff = archive_cutoff_month()
+    if since < cutoff:
+        cursor = database.aggregates_collection.find(
+            {"user_id": user_id, "month": {"$gte": since, "$lt": min(cutoff, until)}},
+            {"month": 1, "type": 1, "total": 1},
+        )
+        async for row in cursor:
+            month = totals.setdefault(row["month"], {})
+            month[row["type"]] = month.get(row["type"], 0) + row["total"]
+
+    if not totals:
+        return np.zeros((0, 2))
+    first = month_index(min(totals))
+    rows = np.zeros((current - first, 2))
+    for month, by_type in totals.items():
+        rows[month_index(month) - first] = (by_type.get("income", 0), by_type.get("expense", 0))
+    return rows
+
+
+def simulate(net: np.ndarray, remaining: np.ndarray, paths: int, horizon: int, seed: int) -> dict:
+    """Bootstrap `paths` savings trajectories and measure every goal against them."""
+    rng = np.random.default_rng(seed)
+    draws = net[rng.integers(0, len(net), size=(paths, horizon))]
+    cumulative = np.cumsum(draws, axis=1)
+    best_so_far = np.maximum.accumulate(cumulative, axis=1)
+
+    # reached[g, p, k]: path p has saved goal g's remaining amount by month k
+    reached = best_so_far[None, :, :] >= remaining[:, None, None]
+    return {
+        "cdf": reached.mean(axis=1).round(4),
+        "cum_p10": np.percentile(cumulative, 10, axis=0).round(2),
+    }
+
+
+async def compute_projections(user_id: str, generation: int = None) -> dict:
+    """Simulate from current data; stored only while `generation` is still the cache's generation."""
+    goals = [g async for g in database.goals_collection.find({"user_id": user_id})]
+    history = await monthly_history(user_id, settings.GOAL_SIM_HISTORY_MONTHS)
+    net = history[:, 0] - history[:, 1]
+    basis = "history"
+
+    if len(net) < settings.GOAL_SIM_MIN_MONTHS:
+        # Not enough history yet: fall back to the planned budget as a single scenario
+        budget = await database.budget_settings_collection.find_one({"user_id": user_id}) or {}
+        planned = (budget.get("salary") or 0) - sum((budget.get("fixed_costs") or {}).values())
+        net, basis = (np.array([planned], dtype=np.float64), "budget") if planned else (net, "none")
+
+    doc = {
+        "user_id": user_id,
+        "basis": basis,
+        "history_months": int(len(history)),
+        "start_month": month_label(month_index(datetime.now().strftime("%Y-%m")) + 1),
+        "mean_monthly_savings": round(float(net.mean()), 2) if len(net) else 0.0,
+        "computed_at": datetime.utcnow().isoformat(),
+        "goals": {},
+    }
+    if len(net) and goals:
+        remaining = np.array([max(0.0, g.get("amount", 0) - g.get("saved", 0)) for g in goals])
+        result = await asyncio.to_thread(
+            simulate, net, remaining,
+            settings.GOAL_SIM_PATHS, settings.GOAL_SIM_HORIZON_MONTHS,
+            crc32(user_id.encode()),
+        )
+        doc["cum_p10"] = result["cum_p10"].tolist()
+        for goal, cdf in zip(goals, result["cdf"]):
+            doc["goals"][str(goal["_id"])] = cdf.tolist()
+
+    doc["generation"] = generation or 0
+    try:
+        # No match (a write bumped the generation) falls through to the upsert and its duplicate key
+        await database.goal_projections_collection.replace_one(
+            {"user_id": user_id, "generation": generation}, doc, upsert=True
+        )
+        doc["stored"] = True
+    except DuplicateKeyError:
+        doc["stored"] = False
+    return doc
+
+
+async def get_projections(user_id: str) -> dict:
+    cached = await database.goal_projections_collection.find_one({"user_id": user_id}, {"_id": 0})
+    if cached and not cached.get("stale"):
+        return cached
+    for _ in range(STORE_ATTEMPTS):
+        doc = await compute_projections(user_id, cached.get("generation") if cached else None)
+        if doc.pop("stored"):
+            return doc
+        # Data changed while simulating: start again from the new generation
+        cached = await database.goal_projections_collection.find_one({"user_id": user_id}, {"generation": 1})
+    return doc  # still changing under us; serve the latest result without caching it
+
+
+def describe_goal(goal: dict, projections: dict, target_date: str = None) -> dict:
+    """Turn the stored CDF into completion dates and savings targets for one goal."""
+    remaining = max(0.0, goal.get("amount", 0) - goal.get("saved", 0))
+    cdf = np.array(projections["goals"].get(str(goal["_id"]), []))
+    start = month_index(projections["start_month"])
+
+    def completion(p: float):
+        if remaining == 0:
+            return month_label(start - 1)
+        hits = np.flatnonzero(cdf >= p)
+        return month_label(start + int(hits[0])) if len(hits) else None
+
+    result = {
+        "goal_id": str(goal["_id"]),
+        "name": goal.get("name", ""),
+        "amount": goal.get("amount", 0),
+        "saved": goal.get("saved", 0),
+        "remaining": round(remaining, 2),
+        "basis": projections["basis"],
+        "history_months": projections["history_months"],
+        "mean_monthly_savings": projections["mean_monthly_savings"],
+        "probability_within_horizon": float(cdf[-1]) if len(cdf) else (1.0 if remaining == 0 else 0.0),
+        "completion_month": {"p10": completion(0.1), "p50": completion(0.5), "p90": completion(0.9)},
+        "target_date": None,
+        "probability_by_target_date": None,
+        "monthly_savings_needed": None,
+        "monthly_savings_needed_p90": None,
+    }
+
+    # Goals stored before target dates were validated may hold free text; treat it as no target
+    target = target_month_index(target_date)
+    if target is not None:
+        result["target_date"] = target_date
+        months_left = max(1, target - start + 1)
+        result["monthly_savings_needed"] = round(remaining / months_left, 2)
+        if len(cdf):
+            k = min(months_left, len(cdf)) - 1
+            result["probability_by_target_date"] = float(cdf[k])
+            # Saving this much on top of the usual pattern reaches the goal in 90% of scenarios
+            shortfall = remaining - projections["cum_p10"][k]
+            result["monthly_savings_needed_p90"] = round(max(0.0, shortfall) / (k + 1), 2)
+    return result
+
+
+# ---------------- ✅ INVALIDATION ----------------
+
+async def invalidate(kind, user_id, op, doc, previous):
+    # Upsert, so a first simulation still running when this write lands can't store its result either
+    await database.goal_projections_collection.update_one(
+        {"user_id": user_id},
+        {
+            "$set": {"stale": True},
+            "$inc": {"generation": 1},
+            "$setOnInsert": {"computed_at": datetime.utcnow().isoformat()},  # lets expire_stale_caches drop it
+        },
+        upsert=True,
+    )
+
+
+events.subscribe(("transaction", "budget", "goal"), invalidate)
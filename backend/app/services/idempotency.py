@@ -0,0 +1,103 @@
+from app import database
+from app.config import settings
+from app.metrics import IDEMPOTENCY_REQUESTS
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+import hashlib
+import orjson
+
+# ---------------- ✅ IDEMPOTENCY KEYS ----------------
+# A client that may retry a write sends `Idempotency-Key: <uuid>`. The first
+# request claims the key in idempotency_keys (unique per user) as "pending",
+# and stores its response once done. A retry with the same key and body gets
+# the stored response instead of writing again. Keys expire via a TTL index
+# after IDEMPOTENCY_TTL_HOURS.
+#
+# A pending claim is a lease until `pending_until`: if the request that made
+# it died before complete() or abandon(), a retry after
+# IDEMPOTENCY_LEASE_SECONDS takes the key over instead of getting 409 until
+# the TTL removes it. The request that died may still have written before
+# it did, so begin() takes a `recover` lookup for that write and completes
+# the key with it instead of letting the retry write again; routes also store
+# the key on what they write under a unique index, so two writers can't both
+# succeed.
+
+
+def _key_id(user_id: str, key: str) -> str:
+    return f"{user_id}|{key}"
+
+
+def request_fingerprint(payload: dict) -> str:
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+async def begin(user_id: str, key: str, route: str, payload: dict, recover=None):
+    """
+    Claim `key` for this request. Returns the stored response when the key
+    was already completed with the same body; raises 409 while the original
+    is still in flight (its lease has not run out) and 422 when the key was
+    used for a different body.
+
+    `recover` is an async callable returning the response of a write the key
+    already made (or None); it is asked when taking over an expired lease.
+    """
+    fingerprint = request_fingerprint(payload)
+    now = datetime.utcnow()
+    claim = {
+        "user_id": user_id,
+        "route": route,
+        "fingerprint": fingerprint,
+        "status": "pending",
+        "pending_until": now + timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS),
+        "created_at": now,
+    }
+    try:
+        await database.idempotency_collection.insert_one({"_id": _key_id(user_id, key), **claim})
+        IDEMPOTENCY_REQUESTS.labels(outcome="new").inc()
+        return None
+    except DuplicateKeyError:
+        pass
+
+    # Atomic, so only one of several concurrent retries takes over an expired
+    # lease; and only a retry of the same request (a different body is a 422 below)
+    taken = await database.idempotency_collection.find_one_and_update(
+        {
+            "_id": _key_id(user_id, key), "status": "pending", "pending_until": {"$lt": now},
+            "fingerprint": fingerprint, "route": route,
+        },
+        {"$set": claim},
+    )
+    if taken is not None:
+        IDEMPOTENCY_REQUESTS.labels(outcome="taken_over").inc()
+        response = await recover() if recover is not None else None
+        if response is not None:
+            # The previous holder wrote before it died: finish the key with that
+            await complete(user_id, key, response)
+        return response
+    existing = await database.idempotency_collection.find_one({"_id": _key_id(user_id, key)})
+
+    if existing is None:
+        # Expired between our insert and read; treat as a fresh request
+        return await begin(user_id, key, route, payload)
+    if existing["fingerprint"] != fingerprint or existing["route"] != route:
+        IDEMPOTENCY_REQUESTS.labels(outcome="mismatch").inc()
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if existing["status"] != "done":
+        IDEMPOTENCY_REQUESTS.labels(outcome="in_progress").inc()
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+    IDEMPOTENCY_REQUESTS.labels(outcome="replayed").inc()
+    return existing["response"]
+
+
+async def complete(user_id: str, key: str, response: dict):
+    await database.idempotency_collection.update_one(
+        {"_id": _key_id(user_id, key)},
+        {"$set": {"status": "done", "response": response}, "$unset": {"pending_until": ""}},
+    )
+
+
+async def abandon(user_id: str, key: str):
+    # The write failed: free the key so the client's retry can go through
+    await database.idempotency_collection.delete_one({"_id": _key_id(user_id, key), "status": "pending"})
@@ -0,0 +1,193 @@
+from app import database
+from app.config import settings
+from app.metrics import JOB_DURATION, JOB_RUNS
+from app.services import archive, maintenance, recurring
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+import asyncio
+import logging
+import os
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------- ✅ JOB RUNNER ----------------
+
+class Job:
+    def __init__(self, name: str, func, interval: timedelta, timeout: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.timeout = timeout
+
+
+class JobRunner:
+    """
+    Asyncio job runner started from the app lifespan.
+
+    A scheduler task wakes every `tick` seconds and claims due jobs in the
+    `jobs` collection with an atomic find_one_and_update (status + lease), so
+    with several API workers each run happens exactly once. Claimed jobs go on
+    a queue drained by a fixed pool of worker tasks, each run bounded by the
+    job's timeout. next_run_at lives in Mongo, so schedules survive restarts,
+    and a run whose worker died is picked up again once its lease expires.
+    """
+
+    def __init__(self, workers: int, tick: float):
+        self.workers = workers
+        self.tick = tick
+        self.jobs = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._queue = asyncio.Queue()
+        self._tasks = []
+
+    def register(self, name: str, func, interval: timedelta, timeout: float = None):
+        self.jobs[name] = Job(name, func, interval, timeout or settings.JOB_TIMEOUT_SECONDS)
+
+    async def _init_states(self):
+        now = datetime.utcnow()
+        for name in self.jobs:
+            await database.jobs_collection.update_one(
+                {"_id": name},
+                {"$setOnInsert": {"status": "idle", "next_run_at": now, "runs": 0, "failures": 0}},
+                upsert=True,
+            )
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._scheduler())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"🗓️ Job runner started with {self.workers} workers, {len(self.jobs)} jobs")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _claim(self, job: Job, force: bool = False) -> bool:
+        now = datetime.utcnow()
+        query = {
+            "_id": job.name,
+            "$or": [{"status": {"$ne": "running"}}, {"lease_until": {"$lt": now}}],
+        }
+        if not force:
+            query["next_run_at"] = {"$lte": now}
+        claimed = await database.jobs_collection.find_one_and_update(
+            query,
+            {"$set": {
+                "status": "running",
+                "owner": self.owner,
+                "last_started_at": now,
+                "lease_until": now + timedelta(seconds=job.timeout + 60),
+            }},
+            return_document=ReturnDocument.AFTER,
+        )
+        return claimed is not None
+
+    async def _scheduler(self):
+        # Keep retrying until Mongo is reachable; job documents must exist before they can be claimed
+        while True:
+            try:
+                await self._init_states()
+                break
+            except Exception as e:
+                logger.error(f"❌ Could not initialise job state: {e}")
+                await asyncio.sleep(self.tick)
+
+        while True:
+            for job in self.jobs.values():
+                try:
+                    if await self._claim(job):
+                        await self._queue.put(job)
+                except Exception as e:
+                    logger.error(f"❌ Job scheduler could not claim {job.name}: {e}")
+            await asyncio.sleep(self.tick)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error(f"❌ Could not record result of job {job.name}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        started = time.perf_counter()
+        result, error, outcome = None, None, "succeeded"
+        try:
+            result = await asyncio.wait_for(job.func(), timeout=job.timeout)
+        except asyncio.TimeoutError:
+            error, outcome = f"Timed out after {job.timeout}s", "timeout"
+        except Exception as e:
+            error, outcome = str(e), "failed"
+
+        duration = time.perf_counter() - started
+        JOB_RUNS.labels(job=job.name, outcome=outcome).inc()
+        JOB_DURATION.labels(job=job.name).observe(duration)
+        if error:
+            logger.error(f"❌ Job {job.name} {outcome}: {error}")
+        else:
+            logger.info(f"✅ Job {job.name} finished in {duration:.1f}s")
+
+        finished = datetime.utcnow()
+        await database.jobs_collection.update_one(
+            {"_id": job.name},
+            {
+                "$set": {
+                    "status": outcome,
+                    "last_finished_at": finished,
+                    "last_duration_seconds": round(duration, 3),
+                    "last_error": error,
+                    "last_result": result if isinstance(result, dict) else None,
+                    "next_run_at": finished + job.interval,
+                    "lease_until": None,
+                },
+                "$inc": {"runs": 1, "failures": 0 if outcome == "succeeded" else 1},
+            },
+        )
+
+    async def trigger(self, name: str) -> bool:
+        """Run a job now, regardless of its schedule. False if it is already running."""
+        job = self.jobs[name]
+        if not await self._claim(job, force=True):
+            return False
+        await self._queue.put(job)
+        return True
+
+    async def states(self) -> list:
+        jobs = []
+        async for doc in database.jobs_collection.find({"_id": {"$in": list(self.jobs)}}):
+            doc["name"] = doc.pop("_id")
+            doc["interval_seconds"] = self.jobs[doc["name"]].interval.total_seconds()
+            jobs.append(doc)
+        return jobs
+
+
+# ---------------- ✅ REGISTERED JOBS ----------------
+
+job_runner = JobRunner(workers=settings.JOB_WORKERS, tick=settings.JOB_TICK_SECONDS)
+
+job_runner.register(
+    "user_aggregates", maintenance.rebuild_user_aggregates,
+    timedelta(minutes=settings.AGGREGATES_INTERVAL_MINUTES),
+)
+job_runner.register(
+    "recurring_payments", recurring.detect_all_users,
+    timedelta(hours=settings.RECURRING_INTERVAL_HOURS),
+)
+job_runner.register(
+    "ai_budget_tips", maintenance.refresh_budget_tips,
+    timedelta(hours=settings.AI_TIPS_INTERVAL_HOURS),
+)
+job_runner.register(
+    "expire_caches", maintenance.expire_stale_caches,
+    timedelta(hours=settings.CACHE_EXPIRY_INTERVAL_HOURS),
+)
+job_runner.register(
+    "archive_transactions", archive.archive_all_users,
+    timedelta(hours=settings.ARCHIVE_INTERVAL_HOURS),
+)
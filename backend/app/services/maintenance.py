@@ -0,0 +1,173 @@
+from app import database
+from app.config import settings
+from app.services.ai_agent import generate_budget_plan
+from app.services.archive import archive_cutoff_month
+from app.services.rate_limiter import ai_admission
+from datetime import datetime, timedelta
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Periodic precomputation run by the background job runner (app/services/jobs.py).
+# Each task returns a small dict that is persisted as the job's last_result.
+
+
+# ---------------- ✅ PER-USER MONTHLY AGGREGATES ----------------
+
+async def rebuild_user_aggregates(months: int = 2) -> dict:
+    """
+    Recompute (user, month, category, type) totals for the last `months`
+    months server-side and $merge them into user_aggregates. Older months
+    don't change often, so they are left alone unless months is raised.
+    Runs one pipeline per user so each $match uses the (user_id, date) index
+    instead of scanning every user's transactions.
+    """
+    run_started = datetime.utcnow()
+    first = run_started.replace(day=1)
+    for _ in range(months - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+    # Archived months are summarised by the archive job from their buckets
+    since = max(first.strftime("%Y-%m"), archive_cutoff_month())
+
+    users, failed, stale_removed = 0, 0, 0
+    chunk = []
+
+    async def flush():
+        nonlocal users, failed, stale_removed
+        results = await asyncio.gather(
+            *(_rebuild_aggregates_for(u, since, run_started) for u in chunk), return_exceptions=True
+        )
+        for user_id, result in zip(chunk, results):
+            if isinstance(result, Exception):
+                failed += 1
+                logger.error(f"❌ Aggregate rebuild failed for {user_id}: {result}")
+            else:
+                stale_removed += result
+        users += len(chunk)
+        chunk.clear()
+
+    async for user in database.users_collection.find({}, {"_id": 1}).batch_size(settings.AGGREGATES_BATCH_CHUNK):
+        chunk.append(str(user["_id"]))
+        if len(chunk) >= settings.AGGREGATES_BATCH_CHUNK:
+            await flush()
+    if chunk:
+        await flush()
+
+    return {"since": since, "users": users, "failed": failed, "stale_removed": stale_removed}
+
+
+async def _rebuild_aggregates_for(user_id: str, since: str, run_started: datetime) -> int:
+    pipeline = [
+        {"$match": {"user_id": user_id, "date": {"$gte": since}}},
+        {"$group": {
+            "_id": {
+                "month": {"$substrBytes": ["$date", 0, 7]},
+                "category": {"$ifNull": ["$category", "Other"]},
+                "type": {"$ifNull": ["$type", "expense"]},
+            },
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": {"$concat": [user_id, "|", "$_id.month", "|", "$_id.category", "|", "$_id.type"]},
+            "user_id": {"$literal": user_id},
+            "month": "$_id.month",
+            "category": "$_id.category",
+            "type": "$_id.type",
+            "total": 1,
+            "count": 1,
+            "updated_at": {"$literal": run_started},
+        }},
+        {"$merge": {"into": "user_aggregates", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    async for _ in database.transactions_collection.aggregate(pipeline):
+        pass
+
+    # Rows not rewritten by this run belong to categories that no longer have transactions
+    stale = await database.aggregates_collection.delete_many(
+        {"user_id": user_id, "month": {"$gte": since}, "updated_at": {"$lt": run_started}}
+    )
+    return stale.deleted_count
+
+
+# ---------------- ✅ AI BUDGET TIPS ----------------
+
+async def refresh_budget_tips() -> dict:
+    """
+    Regenerate stored AI tips for users whose tips are older than the refresh
+    interval. Calls go through the same admission control as /ai/*, so a
+    refresh never starves interactive users; skipped users are retried next run.
+    """
+    cutoff = (datetime.utcnow() - timedelta(hours=settings.AI_TIPS_INTERVAL_HOURS)).isoformat()
+    refreshed = skipped = 0
+
+    async for budget in database.budget_settings_collection.find({"salary": {"$gt": 0}}):
+        user_id = budget["user_id"]
+        current = await database.ai_tips_collection.find_one({"user_id": user_id}, {"computed_at": 1})
+        if current and current.get("computed_at", "") >= cutoff:
+            continue
+        if not await ai_admission.admit(user_id, "tips"):
+            skipped += 1
+            continue
+
+        goals = [
+            {"name": g.get("name"), "amount": g.get("amount")}
+            async for g in database.goals_collection.find({"user_id": user_id})
+        ]
+        plan = await generate_budget_plan(budget.get("salary", 0), budget.get("fixed_costs", {}), goals)
+        if not plan:
+            skipped += 1
+            continue
+
+        await database.ai_tips_collection.replace_one(
+            {"user_id": user_id},
+            {
+                "user_id": user_id,
+                "summary": plan.get("summary", ""),
+                "tips": plan.get("tips", []),
+                "computed_at": datetime.utcnow().isoformat(),
+            },
+            upsert=True,
+        )
+        refreshed += 1
+
+    return {"refreshed": refreshed, "skipped": skipped}
+
+
+# ---------------- ✅ STALE CACHE EXPIRY ----------------
+
+async def expire_stale_caches() -> dict:
+    cutoff = (datetime.utcnow() - timedelta(days=settings.CACHE_MAX_AGE_DAYS)).isoformat()
+    recurring = await database.recurring_collection.delete_many({"computed_at": {"$lt": cutoff}})
+    tips = await database.ai_tips_collection.delete_many({"computed_at": {"$lt": cutoff}})
+    projections = await database.goal_projections_collection.delete_many({"computed_at": {"$lt": cutoff}})
+    return {
+        "recurring_removed": recurring.deleted_count,
+        "tips_removed": tips.deleted_count,
+        "projections_removed": projections.deleted_count,
+        "rate_buckets_pruned": ai_admission.prune_idle(),
+    }
+
+
+# ---------------- ✅ SYNC BACKFILL ----------------
+# Timestamp 0 of the change feed (EPOCH in app/routers/transactions.py)
+SYNC_EPOCH = datetime(1970, 1, 1)
+
+
+async def backfill_updated_at() -> dict:
+    """
+    Stamp updated_at = 1970-01-01 on transactions written before the change
+    feed existed. The feed already places a missing updated_at at timestamp
+    0, so no client's sync position moves; afterwards those rows are ordinary
+    rows at the start of the (updated_at, _id) order. Per user, so each
+    update uses the (user_id, updated_at, _id) index.
+    """
+    users, stamped = 0, 0
+    async for user in database.users_collection.find({}, {"_id": 1}).batch_size(100):
+        result = await database.transactions_collection.update_many(
+            {"user_id": str(user["_id"]), "updated_at": None}, {"$set": {"updated_at": SYNC_EPOCH}}
+        )
+        stamped += result.modified_count
+        users += 1
+    return {"users": users, "stamped": stamped}
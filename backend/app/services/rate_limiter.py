@@ -0,0 +1,170 @@
+from app.config import settings
+from app.metrics import AI_ADMISSIONS, AI_QUEUE_DEPTH
+from collections import OrderedDict, deque
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------- ✅ TOKEN BUCKET ----------------
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second refill, holds at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+# ---------------- ✅ ADMISSION CONTROLLER (PER-USER + GLOBAL) ----------------
+
+class AIAdmissionController:
+    """
+    Guards the shared Gemini quota. A call is admitted only when both the
+    caller's bucket and the global bucket have a token. Otherwise it waits in
+    a bounded FIFO queue until `max_wait` elapses; callers that are not
+    admitted should be served from the local fallback instead of hitting the
+    LLM. Each user may hold at most `max_queue_per_user` places in the queue.
+    """
+
+    def __init__(self, user_rate_per_min: float, user_burst: int,
+                 global_rate_per_min: float, global_burst: int,
+                 max_wait: float, max_queue: int, max_queue_per_user: int = None,
+                 max_users: int = 10_000):
+        self.user_rate = user_rate_per_min / 60
+        self.user_burst = user_burst
+        self.global_bucket = TokenBucket(global_rate_per_min / 60, global_burst)
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user or max_queue
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._waiters = deque()  # (user_id, bucket, future), oldest first
+        self._queued = {}  # user_id -> waiters in the queue
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _user_bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate, self.user_burst)
+            self._users[user_id] = bucket
+            if len(self._users) > self.max_users:
+                # Least recently seen users have (almost certainly) refilled anyway
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return bucket
+
+    def prune_idle(self) -> int:
+        """Drop per-user buckets that have fully refilled; they're identical to a fresh bucket."""
+        for bucket in self._users.values():
+            bucket._refill()
+        idle = [
+            uid for uid, bucket in self._users.items()
+            if bucket.tokens >= bucket.capacity and uid not in self._queued
+        ]
+        for uid in idle:
+            del self._users[uid]
+        return len(idle)
+
+    def _try_acquire(self, bucket: TokenBucket) -> float:
+        """Take a token from both buckets, or return how long to wait for them."""
+        wait = max(bucket.wait_time(), self.global_bucket.wait_time())
+        if wait == 0:
+            bucket.consume()
+            self.global_bucket.consume()
+        return wait
+
+    def _grant(self):
+        """Hand out available tokens to waiters in arrival order, skipping users still over their own rate."""
+        for waiter in list(self._waiters):
+            if self.global_bucket.wait_time() > 0:
+                return
+            _, bucket, future = waiter
+            if self._try_acquire(bucket) == 0:
+                future.set_result(True)
+                self._waiters.remove(waiter)
+
+    def _dequeue(self, waiter):
+        user_id = waiter[0]
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+        self._queued[user_id] -= 1
+        if not self._queued[user_id]:
+            del self._queued[user_id]
+        AI_QUEUE_DEPTH.set(self.queue_depth)
+
+    async def admit(self, user_id: str, route: str) -> bool:
+        bucket = self._user_bucket(user_id)
+        # Nobody may jump the queue: with waiters, a new call lines up behind them
+        if not self._waiters and self._try_acquire(bucket) == 0:
+            AI_ADMISSIONS.labels(route=route, outcome="admitted").inc()
+            return True
+
+        if self.queue_depth >= self.max_queue:
+            AI_ADMISSIONS.labels(route=route, outcome="rejected_queue_full").inc()
+            return False
+        if self._queued.get(user_id, 0) >= self.max_queue_per_user:
+            AI_ADMISSIONS.labels(route=route, outcome="rejected_user_queue_full").inc()
+            return False
+
+        waiter = (user_id, bucket, asyncio.get_running_loop().create_future())
+        future = waiter[2]
+        self._waiters.append(waiter)
+        self._queued[user_id] = self._queued.get(user_id, 0) + 1
+        AI_QUEUE_DEPTH.set(self.queue_depth)
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while True:
+                self._grant()
+                if future.done():
+                    AI_ADMISSIONS.labels(route=route, outcome="admitted_after_wait").inc()
+                    return True
+                # A lower bound: waiters ahead may take the next global tokens first
+                wait = max(bucket.wait_time(), self.global_bucket.wait_time())
+                remaining = deadline - time.monotonic()
+                if wait > remaining:
+                    break
+                # Woken early when another waiter's _grant() reaches us
+                await asyncio.wait([future], timeout=max(wait, 0.001))
+        finally:
+            self._dequeue(waiter)
+
+        AI_ADMISSIONS.labels(route=route, outcome="rejected_deadline").inc()
+        logger.info(f"⚠️ AI budget exhausted for user {user_id} on /ai/{route}, serving fallback")
+        return False
+
+
+ai_admission = AIAdmissionController(
+    user_rate_per_min=settings.AI_USER_RATE_PER_MIN,
+    user_burst=settings.AI_USER_BURST,
+    global_rate_per_min=settings.AI_GLOBAL_RATE_PER_MIN,
+    global_burst=settings.AI_GLOBAL_BURST,
+    max_wait=settings.AI_QUEUE_MAX_WAIT_SECONDS,
+    max_queue=settings.AI_QUEUE_MAX_DEPTH,
+    max_queue_per_user=settings.AI_QUEUE_MAX_PER_USER,
+)
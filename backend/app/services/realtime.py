@@ -0,0 +1,222 @@
+from app import database
+from app.config import settings
+from app.metrics import WS_CONNECTIONS, WS_MESSAGES
+from app.services import events
+from bson import ObjectId
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from starlette.websockets import WebSocket, WebSocketDisconnect
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------- ✅ REALTIME CHANGE PUSH ----------------
+# Every write event (app/services/events.py) becomes a small message pushed
+# to the user's open WebSocket connections on /ws:
+#
+#   {"type": "change", "kind": "transaction", "op": "update", "id": "...", "doc": {...}, "at": "..."}
+#
+# A socket opened with ?device_id=... does not get the changes its own
+# device made (writes sent with the same X-Device-Id): it already has them.
+#
+# Besides "change", clients may receive "ready" once connected, "ping" while
+# idle (answer with any message) and "resync" when they fell too far behind
+# and should refetch instead of patching.
+
+WRITE_KINDS = ("transaction", "account", "goal", "budget", "habit")
+
+
+class Connection:
+    def __init__(self, websocket: WebSocket, user_id: str, device_id: str = None):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.device_id = device_id
+        self.queue = asyncio.Queue(maxsize=settings.WS_QUEUE_SIZE)
+        self.last_seen = time.monotonic()
+
+    def offer(self, message: dict) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            # Slow consumer: drop the backlog, the client refetches once instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+            return False
+
+
+# ---------------- ✅ FAN-OUT BACKENDS ----------------
+
+class LocalFanout:
+    """Single worker: a publish is delivered straight to this process's connections."""
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def stop(self):
+        pass
+
+    async def publish(self, user_id: str, message: dict, origin: str = None):
+        self._deliver(user_id, message, origin)
+
+
+class MongoFanout:
+    """
+    Several workers: publishes go into a capped collection that every worker
+    tails, so a write handled by one worker reaches sockets held by another.
+    """
+
+    def __init__(self, name: str, size_bytes: int):
+        self.name = name
+        self.size_bytes = size_bytes
+        self._task = None
+
+    async def start(self, deliver):
+        try:
+            await database.db.create_collection(self.name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # already exists
+        except Exception as e:
+            logger.error(f"❌ Could not create realtime fan-out collection: {e}")
+        self._task = asyncio.create_task(self._tail(deliver))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _tail(self, deliver):
+        last_id = None
+        while True:
+            try:
+                collection = database.db[self.name]
+                if last_id is None:
+                    # Only messages published from now on matter
+                    newest = await collection.find_one(sort=[("$natural", -1)])
+                    last_id = newest["_id"] if newest else ObjectId.from_datetime(datetime.utcnow())
+                cursor = collection.find({"_id": {"$gt": last_id}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for doc in cursor:
+                        last_id = doc["_id"]
+                        deliver(doc["user_id"], doc["message"], doc.get("origin"))
+            except Exception as e:
+                logger.error(f"❌ Realtime fan-out tail failed: {e}")
+            # A tailable cursor on an empty (or just-rolled) capped collection dies at once
+            await asyncio.sleep(1)
+
+    async def publish(self, user_id: str, message: dict, origin: str = None):
+        await database.db[self.name].insert_one({"user_id": user_id, "origin": origin, "message": message})
+
+
+# ---------------- ✅ HUB ----------------
+
+class RealtimeHub:
+    """Per-user registry of open sockets in this process, fed through a pluggable fan-out."""
+
+    def __init__(self, fanout=None):
+        self.fanout = fanout or LocalFanout()
+        self._connections = {}
+
+    async def start(self):
+        await self.fanout.start(self.deliver)
+
+    async def stop(self):
+        await self.fanout.stop()
+        for connections in list(self._connections.values()):
+            for conn in list(connections):
+                await conn.websocket.close(code=1001)
+
+    def deliver(self, user_id: str, message: dict, origin: str = None):
+        for conn in list(self._connections.get(user_id, ())):
+            if origin and conn.device_id == origin:
+                continue  # the device that made the change
+            WS_MESSAGES.labels(outcome="queued" if conn.offer(message) else "overflow").inc()
+
+    async def publish(self, user_id: str, message: dict, origin: str = None):
+        await self.fanout.publish(user_id, message, origin)
+
+    def connection_count(self, user_id: str) -> int:
+        return len(self._connections.get(user_id, ()))
+
+    async def serve(self, websocket: WebSocket, user_id: str, device_id: str = None):
+        """Pump one accepted socket until it closes or stops answering heartbeats."""
+        conn = Connection(websocket, user_id, device_id)
+        self._connections.setdefault(user_id, set()).add(conn)
+        WS_CONNECTIONS.inc()
+        conn.offer({"type": "ready"})
+        tasks = [asyncio.create_task(self._send(conn)), asyncio.create_task(self._receive(conn))]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # No awaits in here: when serve() itself is cancelled (server
+            # shutdown) an await would be interrupted and skip the cleanup
+            connections = self._connections.get(user_id, set())
+            connections.discard(conn)
+            if not connections:
+                self._connections.pop(user_id, None)
+            WS_CONNECTIONS.dec()
+            for task in tasks:
+                task.cancel()
+        # wait() rather than gather(): if serve() is cancelled here, gather
+        # would raise the subtasks' CancelledError in place of our own
+        await asyncio.wait(tasks)
+        for task in tasks:
+            if not task.cancelled():
+                task.exception()
+
+    async def _send(self, conn: Connection):
+        while True:
+            try:
+                message = await asyncio.wait_for(conn.queue.get(), timeout=settings.WS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                message = {"type": "ping"}
+            if time.monotonic() - conn.last_seen > settings.WS_HEARTBEAT_TIMEOUT_SECONDS:
+                await conn.websocket.close(code=1001)
+                return
+            await conn.websocket.send_json(message)
+
+    async def _receive(self, conn: Connection):
+        try:
+            while True:
+                await conn.websocket.receive_text()
+                conn.last_seen = time.monotonic()
+        except WebSocketDisconnect:
+            return
+
+
+def build_fanout():
+    if settings.WS_FANOUT == "mongo":
+        return MongoFanout("realtime_events", settings.WS_FANOUT_COLLECTION_BYTES)
+    return LocalFanout()
+
+
+hub = RealtimeHub(build_fanout())
+
+
+# ---------------- ✅ WRITE EVENTS -> MESSAGES ----------------
+
+def change_message(kind: str, op: str, doc: dict = None, previous: dict = None) -> dict:
+    source = doc if doc is not None else previous or {}
+    body = None
+    if doc is not None:
+        body = {k: v for k, v in doc.items() if k not in ("_id", "user_id")}
+    return jsonable_encoder({
+        "type": "change",
+        "kind": kind,
+        "op": op,
+        "id": source.get("_id"),
+        "doc": body,
+        "at": datetime.utcnow(),
+    }, custom_encoder={ObjectId: str})
+
+
+async def _publish_write(kind, user_id, op, doc, previous):
+    await hub.publish(user_id, change_message(kind, op, doc, previous), events.write_origin.get())
+
+
+events.subscribe(WRITE_KINDS, _publish_write)
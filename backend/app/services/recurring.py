@@ -0,0 +1,207 @@
+from app import database
+from app.config import settings
+from app.services.archive import iter_archived
+from datetime import datetime
+import asyncio
+import logging
+import numpy as np
+import re
+
+logger = logging.getLogger(__name__)
+
+# ---------------- ✅ DETECTION PARAMETERS ----------------
+
+# (name, expected interval in days, tolerance in days, minimum occurrences)
+PERIODS = (
+    ("weekly", 7.0, 1.5, 4),
+    ("monthly", 30.44, 4.0, 3),
+    ("yearly", 365.25, 12.0, 2),
+)
+AMOUNT_BAND = 0.15  # sorted by amount, a step of more than 15% starts a new amount cluster
+
+TX_FIELDS = {"date": 1, "amount": 1, "note": 1, "category": 1, "account": 1, "type": 1}
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+MONTH_WORDS = {
+    "jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+    "january", "february", "march", "april", "june", "july", "august", "september",
+    "october", "november", "december",
+}
+
+
+def normalize_note(note: str) -> str:
+    """'Netflix #482 (Jan)' -> 'netflix': digits, punctuation, case and month names don't split a series."""
+    note = re.sub(r"[^a-z ]+", " ", (note or "").lower())
+    return " ".join(word for word in note.split() if word not in MONTH_WORDS)
+
+
+# ---------------- ✅ COLUMNAR LOADING ----------------
+
+async def load_user_columns(user_id: str) -> dict:
+    """Stream one user's transactions into parallel NumPy arrays."""
+    dates, amounts, notes, raw_notes, categories, accounts, types = [], [], [], [], [], [], []
+    seen = set()
+
+    async def rows():
+        async for tx in database.transactions_collection.find({"user_id": user_id}, TX_FIELDS).batch_size(1000):
+            seen.add(tx["_id"])
+            yield tx
+        # Older history lives in monthly archive buckets; yearly series need it
+        async for tx in iter_archived(user_id):
+            if tx["_id"] not in seen:
+                yield tx
+
+    async for tx in rows():
+        date = tx.get("date") or ""
+        if not DATE_RE.match(date):
+            continue
+        dates.append(date)
+        amounts.append(float(tx.get("amount") or 0))
+        raw_notes.append(tx.get("note") or "")
+        notes.append(normalize_note(tx.get("note")))
+        categories.append(tx.get("category", "Other"))
+        accounts.append(tx.get("account", "wallet"))
+        types.append(tx.get("type", "expense"))
+
+    return {
+        "date": np.array(dates, dtype="datetime64[D]"),
+        "amount": np.array(amounts, dtype=np.float64),
+        "note": np.array(notes, dtype=object),
+        "raw_note": raw_notes,
+        "category": categories,
+        "account": accounts,
+        "is_income": np.array([t == "income" for t in types], dtype=bool),
+    }
+
+
+# ---------------- ✅ VECTORIZED DETECTOR ----------------
+
+def detect_recurring(cols: dict, today=None) -> list:
+    """
+    Group by (normalized note, amount cluster, type), sort each group by date and
+    compare the mean/std of its inter-payment intervals against each period.
+    All per-group statistics are computed with prefix sums over one sorted
+    array; Python only loops over the (few) series that qualify.
+    """
+    n = len(cols["date"])
+    if n < 2:
+        return []
+
+    days = cols["date"].astype(np.int64)
+    amounts = cols["amount"]
+    _, note_code = np.unique(cols["note"].astype(str), return_inverse=True)
+    note_code = note_code.ravel()
+    is_income = cols["is_income"]
+
+    # Amount clusters by tolerance rather than fixed bands, so ₹100 and ₹101 never
+    # split at a band edge: within each (note, type), sorted by amount, a new
+    # cluster starts wherever the next amount is more than AMOUNT_BAND higher.
+    magnitude = np.maximum(np.abs(amounts), 1.0)
+    by_amount = np.lexsort((magnitude, note_code, is_income))
+    m, nc, inc = magnitude[by_amount], note_code[by_amount], is_income[by_amount]
+    new_cluster = np.r_[True, (nc[1:] != nc[:-1]) | (inc[1:] != inc[:-1]) | (m[1:] > m[:-1] * (1 + AMOUNT_BAND))]
+    group = np.empty(n, dtype=np.int64)
+    group[by_amount] = np.cumsum(new_cluster) - 1
+
+    order = np.lexsort((days, group))
+    g, d, a = group[order], days[order], amounts[order]
+
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    ends = np.r_[starts[1:], n] - 1          # index of each group's last (latest) row
+    counts = ends - starts + 1
+
+    # Interval i sits between rows i and i+1; zero it where they belong to different groups
+    gaps = np.diff(d).astype(np.float64)
+    gaps[g[1:] != g[:-1]] = 0.0
+    cum = np.r_[0.0, np.cumsum(gaps)]
+    cum_sq = np.r_[0.0, np.cumsum(gaps ** 2)]
+    n_gaps = np.maximum(counts - 1, 1)
+    mean_gap = (cum[ends] - cum[starts]) / n_gaps
+    std_gap = np.sqrt(np.maximum((cum_sq[ends] - cum_sq[starts]) / n_gaps - mean_gap ** 2, 0.0))
+
+    cum_amt = np.r_[0.0, np.cumsum(a)]
+    mean_amount = (cum_amt[ends + 1] - cum_amt[starts]) / counts
+
+    today = np.datetime64(today or datetime.now().date(), "D").astype(np.int64)
+    series = []
+    for name, period, tolerance, min_count in PERIODS:
+        hits = np.flatnonzero(
+            (counts >= min_count)
+            & (np.abs(mean_gap - period) <= tolerance)
+            & (std_gap <= tolerance)
+        )
+        for k in hits:
+            last = int(d[ends[k]])
+            row = order[ends[k]]
+            next_due = last + int(round(mean_gap[k]))
+            series.append({
+                "note": cols["raw_note"][row],
+                "category": cols["category"][row],
+                "account": cols["account"][row],
+                "type": "income" if cols["is_income"][row] else "expense",
+                "period": name,
+                "average_amount": round(float(mean_amount[k]), 2),
+                "occurrences": int(counts[k]),
+                "interval_days": round(float(mean_gap[k]), 1),
+                "regularity": round(float(max(0.0, 1 - std_gap[k] / tolerance)), 2),
+                "last_date": str(np.datetime64(last, "D")),
+                "next_expected_date": str(np.datetime64(next_due, "D")),
+                # Missed more than one full cycle -> probably cancelled
+                "active": bool(today - last <= 2 * period),
+            })
+
+    series.sort(key=lambda s: (not s["active"], -s["average_amount"]))
+    return series
+
+
+# ---------------- ✅ PERSISTENCE + BATCH ----------------
+
+async def refresh_user_recurring(user_id: str) -> dict:
+    cols = await load_user_columns(user_id)
+    series = await asyncio.to_thread(detect_recurring, cols)
+    doc = {
+        "user_id": user_id,
+        "series": series,
+        "computed_at": datetime.utcnow().isoformat(),
+    }
+    await database.recurring_collection.replace_one({"user_id": user_id}, doc, upsert=True)
+    return doc
+
+
+async def get_user_recurring(user_id: str, refresh: bool = False) -> dict:
+    if not refresh:
+        cached = await database.recurring_collection.find_one({"user_id": user_id}, {"_id": 0})
+        if cached:
+            return cached
+    return await refresh_user_recurring(user_id)
+
+
+async def detect_all_users(chunk_size: int = None) -> dict:
+    """
+    Recompute every user's series. Users are streamed from a cursor and
+    processed `chunk_size` at a time, so memory is bounded by one chunk's
+    transaction columns regardless of how many users exist.
+    """
+    chunk_size = chunk_size or settings.RECURRING_BATCH_CHUNK
+    processed = 0
+    chunk = []
+
+    async def flush():
+        nonlocal processed
+        results = await asyncio.gather(*(refresh_user_recurring(u) for u in chunk), return_exceptions=True)
+        for user_id, result in zip(chunk, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Recurring detection failed for {user_id}: {result}")
+        processed += len(chunk)
+        chunk.clear()
+
+    async for user in database.users_collection.find({}, {"_id": 1}).batch_size(chunk_size):
+        chunk.append(str(user["_id"]))
+        if len(chunk) >= chunk_size:
+            await flush()
+    if chunk:
+        await flush()
+
+    logger.info(f"✅ Recurring detection finished for {processed} users")
+    return {"users": processed}
@@ -0,0 +1,92 @@
+from app import database
+from app.config import settings
+from app.metrics import WRITE_BATCH_SIZE
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ---------------- ✅ INSERT COALESCING ----------------
+# Concurrent inserts that arrive within WRITE_COALESCE_WINDOW_MS of each other
+# are sent as one insert_many instead of one round trip each. Every caller
+# still awaits its own document: the driver assigns _id before sending, and
+# a failure of one row (ordered=False) only fails that caller, with
+# DuplicateKeyError for unique index violations as insert_one would raise.
+
+
+class InsertCoalescer:
+    def __init__(self, collection_name: str, window_ms: float, max_batch: int):
+        self.collection_name = collection_name
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending = []
+        self._flush_task = None
+        self._tasks = set()
+
+    @property
+    def collection(self):
+        return getattr(database, self.collection_name)
+
+    async def insert(self, doc: dict) -> dict:
+        """Insert `doc` (as part of a batch) and return it with its _id."""
+        if self.window <= 0:
+            await self.collection.insert_one(doc)
+            WRITE_BATCH_SIZE.observe(1)
+            return doc
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((doc, future))
+        if len(self._pending) >= self.max_batch:
+            # Full batch goes now; a timer already waiting flushes whatever arrives next
+            batch, self._pending = self._pending, []
+            self._spawn(self._flush(batch))
+        elif self._flush_task is None:
+            self._flush_task = self._spawn(self._flush_after(self.window))
+        return await future
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)  # keep a reference until done
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        batch, self._pending = self._pending, []
+        await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        if not batch:
+            return
+        docs = [doc for doc, _ in batch]
+        WRITE_BATCH_SIZE.observe(len(docs))
+        failed = {}
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err for err in e.details.get("writeErrors", [])}
+        except Exception as e:
+            # Nothing is known to be written (network, timeout, ...): every caller sees the error
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for index, (doc, future) in enumerate(batch):
+            if future.done():
+                continue  # caller went away (request cancelled)
+            if index in failed:
+                error = failed[index]
+                if error.get("code") == 11000:
+                    future.set_exception(DuplicateKeyError(error.get("errmsg"), 11000))
+                else:
+                    future.set_exception(RuntimeError(f"Insert failed: {error.get('errmsg')}"))
+            else:
+                future.set_result(doc)
+
+
+transaction_inserts = InsertCoalescer(
+    "transactions_collection", settings.WRITE_COALESCE_WINDOW_MS, settings.WRITE_COALESCE_MAX_BATCH
+)
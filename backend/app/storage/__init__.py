@@ -0,0 +1,61 @@
+"""
+Storage backends behind app/database.py.
+
+Routers and services never talk to a driver directly: they use the collection
+objects bound in app/database.py (database.transactions_collection,
+database.read_db.transactions, ...). Those come from a storage engine picked
+with STORAGE_BACKEND:
+
+    mongo   MongoDB through Motor (default, needs DATABASE_URL)
+    memory  in-process dicts with per-user indexes; for profiling, load tests
+            and local runs without a database
+
+An engine exposes `db` (writes), `read_db` (reads that may use a secondary)
+and async `connect()`, `ping()` and `close()`. Collections implement the
+Collection protocol below, a subset of Motor's API with Mongo's semantics.
+Both engines are checked against the same behaviour by
+app/storage/conformance.py (`python check_storage_conformance.py`).
+"""
+from typing import Any, AsyncIterator, Optional, Protocol
+
+from app.config import settings
+
+
+class Cursor(Protocol):
+    def sort(self, key_or_list, direction=None) -> "Cursor": ...
+    def skip(self, n: int) -> "Cursor": ...
+    def limit(self, n: int) -> "Cursor": ...
+    def batch_size(self, n: int) -> "Cursor": ...
+    def __aiter__(self) -> AsyncIterator[dict]: ...
+    async def to_list(self, length: Optional[int] = None) -> list: ...
+
+
+class Collection(Protocol):
+    name: str
+
+    def find(self, filter: dict = None, projection=None, **kwargs) -> Cursor: ...
+    async def find_one(self, filter: dict = None, projection=None, **kwargs) -> Optional[dict]: ...
+    async def count_documents(self, filter: dict, **kwargs) -> int: ...
+    async def insert_one(self, document: dict, **kwargs) -> Any: ...
+    async def insert_many(self, documents: list, ordered: bool = True, **kwargs) -> Any: ...
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> Any: ...
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> Any: ...
+    async def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> Any: ...
+    async def find_one_and_update(self, filter: dict, update: dict, **kwargs) -> Optional[dict]: ...
+    async def find_one_and_delete(self, filter: dict, **kwargs) -> Optional[dict]: ...
+    async def delete_one(self, filter: dict, **kwargs) -> Any: ...
+    async def delete_many(self, filter: dict, **kwargs) -> Any: ...
+    async def create_index(self, keys, **kwargs) -> str: ...
+    def aggregate(self, pipeline: list, **kwargs) -> Cursor: ...
+
+
+def create_engine(backend: str = None, url: str = None, db_name: str = None):
+    backend = backend or settings.STORAGE_BACKEND
+    db_name = db_name or settings.DB_NAME
+    if backend == "memory":
+        from app.storage.memory import MemoryEngine
+        return MemoryEngine(db_name)
+    if backend == "mongo":
+        from app.storage.mongo import MongoEngine
+        return MongoEngine(url if url is not None else settings.DATABASE_URL, db_name)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r} (expected 'mongo' or 'memory')")
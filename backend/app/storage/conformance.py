@@ -0,0 +1,275 @@
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, TEXT, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import traceback
+
+# ---------------- ✅ STORAGE CONFORMANCE SUITE ----------------
+# Behaviour every storage engine must share, written against the Collection
+# protocol with the query shapes the routers and services actually use.
+# Each check gets a fresh, empty collection; run_conformance() returns
+# [(check name, error or None)].
+
+CHECKS = []
+
+
+def check(func):
+    CHECKS.append(func)
+    return func
+
+
+def expect(actual, expected, what: str = ""):
+    if actual != expected:
+        raise AssertionError(f"{what or 'value'}: expected {expected!r}, got {actual!r}")
+
+
+def _tx(user: str, amount: float, date: str, **extra) -> dict:
+    return {"user_id": user, "amount": amount, "date": date, "category": "Food", "type": "expense", **extra}
+
+
+@check
+async def insert_assigns_id_and_returns_copies(c):
+    doc = _tx("u1", 10, "2025-01-01")
+    result = await c.insert_one(doc)
+    expect(isinstance(doc["_id"], ObjectId), True, "_id set on the caller's document")
+    expect(result.inserted_id, doc["_id"], "inserted_id")
+    found = await c.find_one({"_id": doc["_id"]})
+    found["amount"] = 99
+    expect((await c.find_one({"_id": doc["_id"]}))["amount"], 10, "stored document after mutating a result")
+
+
+@check
+async def filters(c):
+    await c.insert_many([
+        _tx("u1", 10, "2025-01-01", account="upi", tags=["a", "b"]),
+        _tx("u1", 20, "2025-01-15", category="Transport"),
+        _tx("u1", 30, "2025-02-01", updated_at=datetime(2025, 2, 1)),
+        _tx("u2", 40, "2025-01-10"),
+    ])
+
+    async def amounts(query):
+        return sorted([d["amount"] async for d in c.find(query)])
+
+    expect(await amounts({"user_id": "u1"}), [10, 20, 30], "per-user equality")
+    expect(await amounts({"user_id": "u1", "date": {"$gte": "2025-01-01", "$lte": "2025-01-31"}}), [10, 20], "range")
+    expect(await amounts({"category": {"$in": ["Transport", "Bills"]}}), [20], "$in")
+    expect(await amounts({"user_id": "u1", "category": {"$ne": "Food"}}), [20], "$ne")
+    expect(await amounts({"$or": [{"amount": {"$lt": 15}}, {"amount": {"$gt": 35}}]}), [10, 40], "$or")
+    expect(await amounts({"$and": [{"user_id": "u1"}, {"amount": {"$gt": 10}}]}), [20, 30], "$and")
+    expect(await amounts({"user_id": "u1", "updated_at": None}), [10, 20], "None matches a missing field")
+    expect(await amounts({"tags": "b"}), [10], "array contains")
+    expect(await amounts({"tags": {"$in": ["x", "a"]}}), [10], "$in against an array")
+    expect(await amounts({"updated_at": {"$lt": datetime(2030, 1, 1)}}), [30], "comparison skips other types")
+    expect(await amounts({"amount": {"$gt": "5"}}), [], "string bound does not match numbers")
+    expect(await c.count_documents({"user_id": "u1", "amount": {"$gte": 20}}), 2, "count_documents")
+
+
+@check
+async def sort_skip_limit_and_projection(c):
+    await c.insert_many([_tx("u1", i, f"2025-01-{i:02d}", note=f"n{i}") for i in range(1, 8)])
+    await c.insert_one(_tx("u1", 0, "2025-01-03", note="same day"))
+
+    rows = await c.find({"user_id": "u1"}).sort([("date", DESCENDING), ("amount", ASCENDING)]).skip(1).limit(3).to_list(None)
+    expect([r["amount"] for r in rows], [6, 5, 4], "sorted page")
+    rows = await c.find({"user_id": "u1"}).sort("date", ASCENDING).limit(3).to_list(None)
+    expect([r["amount"] for r in rows], [1, 2, 3], "single-key sort")
+
+    doc = await c.find_one({"amount": 7}, {"amount": 1, "_id": 0})
+    expect(doc, {"amount": 7}, "inclusion projection")
+    doc = await c.find_one({"amount": 7}, {"note": 0, "user_id": 0, "_id": 0})
+    expect(doc, {"amount": 7, "date": "2025-01-07", "category": "Food", "type": "expense"}, "exclusion projection")
+    doc = await c.find_one({"amount": 7}, {"_id": 1})
+    expect(list(doc), ["_id"], "_id-only projection")
+
+
+@check
+async def updates_and_upserts(c):
+    await c.insert_one({"_id": "u1", "tokens": {"swiggy": {"Food": 1}}})
+    result = await c.update_one({"_id": "u1"}, {"$inc": {"tokens.swiggy.Food": 2, "tokens.uber.Transport": 1}})
+    expect((result.matched_count, result.modified_count), (1, 1), "update counts")
+    expect((await c.find_one({"_id": "u1"}))["tokens"], {"swiggy": {"Food": 3}, "uber": {"Transport": 1}}, "dotted $inc")
+
+    result = await c.update_one({"_id": "u2"}, {"$set": {"a": 1}})
+    expect((result.matched_count, result.upserted_id), (0, None), "no upsert")
+    result = await c.update_one(
+        {"_id": "u2", "kind": "job"}, {"$set": {"a": 1}, "$setOnInsert": {"created": True}}, upsert=True
+    )
+    expect(result.upserted_id, "u2", "upserted_id")
+    expect(await c.find_one({"_id": "u2"}), {"_id": "u2", "kind": "job", "a": 1, "created": True}, "upserted doc")
+    await c.update_one({"_id": "u2"}, {"$set": {"a": 2}, "$setOnInsert": {"created": False}}, upsert=True)
+    expect((await c.find_one({"_id": "u2"}))["created"], True, "$setOnInsert only on insert")
+
+    result = await c.replace_one({"_id": "u3"}, {"user_id": "x", "v": 1}, upsert=True)
+    expect(result.upserted_id, "u3", "replace_one upsert keeps the filter _id")
+    await c.replace_one({"_id": "u3"}, {"user_id": "x", "v": 2})
+    expect(await c.find_one({"user_id": "x"}), {"_id": "u3", "user_id": "x", "v": 2}, "replace keeps _id")
+
+
+@check
+async def find_one_and_modify(c):
+    await c.insert_one({"_id": "job", "runs": 0})
+    before = await c.find_one_and_update({"_id": "job"}, {"$inc": {"runs": 1}})
+    expect(before["runs"], 0, "ReturnDocument.BEFORE")
+    after = await c.find_one_and_update({"_id": "job"}, {"$inc": {"runs": 1}}, return_document=ReturnDocument.AFTER)
+    expect(after["runs"], 2, "ReturnDocument.AFTER")
+    expect(await c.find_one_and_update({"_id": "nope"}, {"$set": {"x": 1}}), None, "no match")
+    created = await c.find_one_and_update(
+        {"_id": "new"}, {"$inc": {"runs": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    expect(created, {"_id": "new", "runs": 1}, "upsert AFTER")
+
+    deleted = await c.find_one_and_delete({"_id": "job"})
+    expect(deleted["runs"], 2, "deleted document")
+    expect(await c.find_one({"_id": "job"}), None, "gone after delete")
+    expect((await c.delete_one({"_id": "job"})).deleted_count, 0, "delete_one of a missing doc")
+    await c.insert_many([{"k": 1}, {"k": 1}, {"k": 2}])
+    expect((await c.delete_many({"k": 1})).deleted_count, 2, "delete_many")
+
+
+@check
+async def lease_claims(c):
+    # The claim shapes used by idempotency keys, chat summaries and the categorizer
+    now = datetime(2025, 3, 1, 12, 0)
+    await c.insert_many([
+        {"_id": "expired", "status": "pending", "until": now - timedelta(seconds=1)},
+        {"_id": "live", "status": "pending", "until": now + timedelta(seconds=30)},
+        {"_id": "never"},
+    ])
+    claimable = {"$or": [{"until": None}, {"until": {"$lt": now}}]}
+    expect(sorted([d["_id"] async for d in c.find({"until": {"$lt": now}})]), ["expired"], "$lt skips missing fields")
+    expect(sorted([d["_id"] async for d in c.find(claimable)]), ["expired", "never"], "$or with None matches missing")
+
+    claim = {"$set": {"until": now + timedelta(seconds=60)}}
+    expect((await c.find_one_and_update({"_id": "expired", **claimable}, claim))["_id"], "expired", "first claim")
+    expect(await c.find_one_and_update({"_id": "expired", **claimable}, claim), None, "second claim loses")
+    await c.update_one({"_id": "expired"}, {"$unset": {"until": ""}})
+    expect(await c.find_one({"_id": "expired"}), {"_id": "expired", "status": "pending"}, "$unset")
+
+    await c.update_one({"_id": "never"}, {"$inc": {"n.a": 2, "n.b": 1}})
+    await c.update_one({"_id": "never"}, {"$inc": {"n.a": -1, "n.c": -1}})
+    expect((await c.find_one({"_id": "never"}))["n"], {"a": 1, "b": 1, "c": -1}, "negative $inc")
+
+
+@check
+async def array_push_and_pull(c):
+    await c.insert_one({"_id": "conv", "turns": [{"seq": 1}]})
+    await c.update_one({"_id": "conv"}, {"$push": {"turns": {"$each": [{"seq": 2}, {"seq": 3}, {"seq": 4}], "$slice": -3}}})
+    expect((await c.find_one({"_id": "conv"}))["turns"], [{"seq": 2}, {"seq": 3}, {"seq": 4}], "$push $each/$slice")
+    await c.update_one({"_id": "conv"}, {"$pull": {"turns": {"seq": {"$lte": 3}}}})
+    expect((await c.find_one({"_id": "conv"}))["turns"], [{"seq": 4}], "$pull by condition")
+    await c.update_one({"_id": "other"}, {"$push": {"tags": "a"}}, upsert=True)
+    expect((await c.find_one({"_id": "other"}))["tags"], ["a"], "$push creates the array")
+
+
+@check
+async def unique_indexes(c):
+    await c.create_index("user_id", unique=True)
+    await c.insert_one({"_id": "a", "user_id": "u1"})
+    for doc in ({"_id": "b", "user_id": "u1"}, {"_id": "a", "user_id": "u2"}):
+        try:
+            await c.insert_one(doc)
+        except DuplicateKeyError:
+            continue
+        raise AssertionError(f"duplicate insert of {doc} was accepted")
+    await c.update_one({"_id": "a"}, {"$set": {"salary": 1}})  # same key, same doc: fine
+    expect(await c.count_documents({}), 1, "documents after rejected inserts")
+
+
+@check
+async def partial_unique_indexes(c):
+    await c.create_index([("user_id", ASCENDING), ("key", ASCENDING)], unique=True,
+                         partialFilterExpression={"key": {"$exists": True}})
+    await c.insert_many([{"_id": "a", "user_id": "u1"}, {"_id": "b", "user_id": "u1"}])  # outside the index
+    await c.insert_one({"_id": "c", "user_id": "u1", "key": "k"})
+    await c.insert_one({"_id": "d", "user_id": "u2", "key": "k"})
+    try:
+        await c.insert_one({"_id": "e", "user_id": "u1", "key": "k"})
+    except DuplicateKeyError:
+        pass
+    else:
+        raise AssertionError("duplicate key inside the partial index was accepted")
+    expect(await c.count_documents({}), 4, "documents after rejected insert")
+
+
+@check
+async def insert_many_unordered_reports_failed_rows(c):
+    await c.insert_one({"_id": 2})
+    try:
+        await c.insert_many([{"_id": 1}, {"_id": 2}, {"_id": 3}], ordered=False)
+    except BulkWriteError as e:
+        expect([err["index"] for err in e.details["writeErrors"]], [1], "failed indexes")
+    else:
+        raise AssertionError("duplicate _id in insert_many was accepted")
+    expect(sorted([d["_id"] async for d in c.find({})]), [1, 2, 3], "other rows still written")
+
+
+@check
+async def text_search(c):
+    await c.create_index([("user_id", ASCENDING), ("note", TEXT)], default_language="none")
+    await c.insert_many([
+        _tx("u1", 1, "2025-01-01", note="swiggy dinner"),
+        _tx("u1", 2, "2025-01-02", note="swiggy swiggy lunch"),
+        _tx("u1", 3, "2025-01-03", note="metro card"),
+        _tx("u2", 4, "2025-01-04", note="swiggy"),
+    ])
+    query = {"user_id": "u1", "$text": {"$search": "swiggy"}}
+    cursor = c.find(query, {"score": {"$meta": "textScore"}}).sort([("score", {"$meta": "textScore"}), ("date", -1)])
+    rows = await cursor.to_list(None)
+    expect([r["amount"] for r in rows], [2, 1], "matches, best score first")
+    expect(all(r["score"] > 0 for r in rows), True, "textScore projected")
+    expect(await c.count_documents(query), 2, "count of text matches")
+
+
+@check
+async def aggregate_group(c):
+    await c.insert_many([
+        _tx("u1", 10, "2025-01-05"),
+        _tx("u1", 5, "2025-01-20"),
+        {"user_id": "u1", "amount": 7, "date": "2025-02-01"},
+        _tx("u2", 100, "2025-01-05"),
+    ])
+    pipeline = [
+        {"$match": {"user_id": "u1", "date": {"$gte": "2025-01-01"}}},
+        {"$group": {
+            "_id": {"month": {"$substrBytes": ["$date", 0, 7]}, "category": {"$ifNull": ["$category", "Other"]}},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+    ]
+    rows = sorted([r async for r in c.aggregate(pipeline)], key=lambda r: r["_id"]["month"])
+    expect(rows, [
+        {"_id": {"month": "2025-01", "category": "Food"}, "total": 15, "count": 2},
+        {"_id": {"month": "2025-02", "category": "Other"}, "total": 7, "count": 1},
+    ], "grouped totals")
+
+
+@check
+async def datetimes_and_object_ids_round_trip(c):
+    when = datetime(2025, 3, 1, 12, 30)
+    oid = ObjectId()
+    await c.insert_one({"_id": oid, "at": when, "ref": oid})
+    doc = await c.find_one({"ref": oid, "at": {"$gte": when - timedelta(seconds=1)}})
+    expect((doc["_id"], doc["at"]), (oid, when), "ObjectId / datetime values")
+
+    # BSON dates keep milliseconds: values are truncated on write and in filters
+    precise = datetime(2025, 3, 1, 12, 30, 0, 123456)
+    await c.insert_one({"_id": "precise", "at": precise})
+    expect((await c.find_one({"_id": "precise"}))["at"], precise.replace(microsecond=123000), "stored precision")
+    expect((await c.find_one({"at": precise}))["_id"], "precise", "filter on the unrounded value")
+
+
+async def run_conformance(db, prefix: str = "conformance_") -> list:
+    """Run every check against `db` (an engine's database); collections are dropped afterwards."""
+    results = []
+    for func in CHECKS:
+        name = f"{prefix}{func.__name__}"
+        collection = db.get_collection(name)
+        await collection.delete_many({})
+        try:
+            await func(collection)
+            results.append((func.__name__, None))
+        except Exception as e:
+            results.append((func.__name__, f"{e}\n{traceback.format_exc(limit=-2)}"))
+        finally:
+            await db.drop_collection(name)
+    return results
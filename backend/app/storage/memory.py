@@ -0,0 +1,795 @@
+from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo import TEXT, ReturnDocument
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
+import re
+
+# ---------------- ✅ IN-MEMORY ENGINE ----------------
+# Implements the part of the Motor API the app uses (see app/storage/__init__.py)
+# on plain dicts, with the same results and errors Mongo gives for those calls.
+# Documents are kept by _id plus a per-user index (user_id -> {_id: doc}), so
+# the usual `{"user_id": ..., ...}` query only looks at that user's documents.
+#
+# Not emulated: TTL expiry, transactions, tailable cursors (a tail just polls),
+# and aggregation stages other than $match/$group/$project/$sort/$limit/$merge.
+# Every method finishes without awaiting, so each call is atomic for asyncio
+# callers the way a single-document Mongo operation is.
+
+MISSING = object()
+TOKEN = re.compile(r"\w+")
+
+
+def _clone(value):
+    """
+    Copy dicts/lists so callers never share state with the store, and bring
+    datetimes to what BSON keeps (naive UTC, millisecond precision), like a
+    round trip through the server. Applied to documents and filters alike.
+    """
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return value
+
+
+# ---------------- ✅ FIELD PATHS ----------------
+
+def _get(doc, path: str):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+
+def _set(doc: dict, path: str, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset(doc: dict, path: str):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+# ---------------- ✅ QUERY MATCHING ----------------
+# Comparisons only match within one BSON type bracket, as in Mongo:
+# {"lease_until": {"$lt": now}} does not match a document whose lease_until is None.
+
+def _bracket(value) -> int:
+    if value is None or value is MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, bytes):
+        return 6
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def _sort_key(value):
+    bracket = _bracket(value)
+    if bracket == 1:
+        return (bracket, 0)
+    if bracket in (4, 5):
+        return (bracket, repr(value))
+    return (bracket, value)
+
+
+def _equals(value, target) -> bool:
+    if target is None:
+        return value is None or value is MISSING
+    if isinstance(value, list) and not isinstance(target, list):
+        return any(_equals(v, target) for v in value)
+    return value is not MISSING and _bracket(value) == _bracket(target) and value == target
+
+
+def _compare(value, target, op) -> bool:
+    if isinstance(value, list):
+        return any(_compare(v, target, op) for v in value)
+    if value is MISSING or _bracket(value) != _bracket(target):
+        return False
+    return op(value, target)
+
+
+OPERATORS = {
+    "$eq": _equals,
+    "$ne": lambda v, t: not _equals(v, t),
+    "$in": lambda v, t: any(_equals(v, x) for x in t),
+    "$nin": lambda v, t: not any(_equals(v, x) for x in t),
+    "$gt": lambda v, t: _compare(v, t, lambda a, b: a > b),
+    "$gte": lambda v, t: _compare(v, t, lambda a, b: a >= b),
+    "$lt": lambda v, t: _compare(v, t, lambda a, b: a < b),
+    "$lte": lambda v, t: _compare(v, t, lambda a, b: a <= b),
+    "$exists": lambda v, t: (v is not MISSING) == bool(t),
+}
+
+
+def _is_operator_doc(cond) -> bool:
+    return isinstance(cond, dict) and bool(cond) and all(k.startswith("$") for k in cond)
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, cond in query.items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in cond):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, q) for q in cond):
+                return False
+        elif key == "$text":
+            continue  # scored separately by the collection
+        elif _is_operator_doc(cond):
+            value = _get(doc, key)
+            for op, arg in cond.items():
+                if op not in OPERATORS:
+                    raise NotImplementedError(f"Query operator {op} is not supported by the memory engine")
+                if not OPERATORS[op](value, arg):
+                    return False
+        elif not _equals(_get(doc, key), cond):
+            return False
+    return True
+
+
+def _equality_fields(query: dict) -> dict:
+    """Fields an upsert copies from its filter into the new document."""
+    seeded = {}
+    for key, cond in query.items():
+        if key == "$and":
+            for q in cond:
+                seeded.update(_equality_fields(q))
+        elif key.startswith("$"):
+            continue
+        elif _is_operator_doc(cond):
+            if "$eq" in cond:
+                seeded[key] = cond["$eq"]
+        else:
+            seeded[key] = cond
+    return seeded
+
+
+# ---------------- ✅ UPDATES & PROJECTIONS ----------------
+
+def _array(doc: dict, path: str) -> list:
+    current = _get(doc, path)
+    if current is MISSING:
+        return []
+    if not isinstance(current, list):
+        raise OperationFailure(f"The field '{path}' must be an array", 2)
+    return current
+
+
+def _push(doc: dict, path: str, value):
+    if isinstance(value, dict) and "$each" in value:
+        items = _array(doc, path) + _clone(value["$each"])
+        if "$slice" in value:
+            limit = value["$slice"]
+            items = items[limit:] if limit < 0 else items[:limit]
+    else:
+        items = _array(doc, path) + [_clone(value)]
+    _set(doc, path, items)
+
+
+def _pull(doc: dict, path: str, condition):
+    condition = _clone(condition)
+    current = _get(doc, path)
+    if not isinstance(current, list):
+        return
+    if isinstance(condition, dict) and not _is_operator_doc(condition):
+        keep = [v for v in current if not (isinstance(v, dict) and matches(v, condition))]
+    else:
+        keep = [v for v in current if not matches({"v": v}, {"v": condition})]
+    _set(doc, path, keep)
+
+
+def _apply_update(doc: dict, update: dict, inserting: bool):
+    for op, fields in update.items():
+        if not op.startswith("$"):
+            raise ValueError("update only works with $ operators")
+        for path, value in fields.items():
+            if op == "$set":
+                _set(doc, path, _clone(value))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set(doc, path, _clone(value))
+            elif op == "$inc":
+                current = _get(doc, path)
+                _set(doc, path, value if current is MISSING else current + value)
+            elif op == "$unset":
+                _unset(doc, path)
+            elif op == "$push":
+                _push(doc, path, value)
+            elif op == "$pull":
+                _pull(doc, path, value)
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported by the memory engine")
+
+
+def _project(doc: dict, projection, score=None) -> dict:
+    if not projection:
+        return _clone(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    meta = {k: v for k, v in projection.items() if isinstance(v, dict)}
+    spec = {k: v for k, v in projection.items() if k not in meta}
+    include_id = spec.pop("_id", 1)
+    if any(spec.values()) or (not spec and include_id and "_id" in projection):
+        result = {}
+        for path in spec:
+            value = _get(doc, path)
+            if value is not MISSING:
+                _set(result, path, _clone(value))
+        if include_id and "_id" in doc:
+            result = {"_id": doc["_id"], **result}
+    else:
+        result = _clone(doc)
+        for path in spec:
+            _unset(result, path)
+        if not include_id:
+            result.pop("_id", None)
+    for field in meta:
+        result[field] = score or 0.0
+    return result
+
+
+# ---------------- ✅ AGGREGATION EXPRESSIONS ----------------
+
+def _evaluate(expr, doc):
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = _get(doc, expr[1:])
+        return None if value is MISSING else value
+    if isinstance(expr, dict):
+        if len(expr) == 1 and next(iter(expr)).startswith("$"):
+            op, args = next(iter(expr.items()))
+            if op == "$literal":
+                return args
+            if op == "$ifNull":
+                value = _evaluate(args[0], doc)
+                return _evaluate(args[1], doc) if value is None else value
+            if op == "$substrBytes":
+                value = _evaluate(args[0], doc)
+                start, length = args[1], args[2]
+                return (value or "").encode()[start:start + length].decode(errors="ignore")
+            if op == "$concat":
+                parts = [_evaluate(a, doc) for a in args]
+                return None if any(p is None for p in parts) else "".join(parts)
+            raise NotImplementedError(f"Expression {op} is not supported by the memory engine")
+        return {k: _evaluate(v, doc) for k, v in expr.items()}
+    return expr
+
+
+def _group(docs: list, spec: dict) -> list:
+    groups = {}
+    for doc in docs:
+        key = _evaluate(spec["_id"], doc)
+        marker = repr(key)
+        if marker not in groups:
+            groups[marker] = {"_id": key, **{field: 0 for field in spec if field != "_id"}}
+        row = groups[marker]
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, arg), = accumulator.items()
+            if op != "$sum":
+                raise NotImplementedError(f"Accumulator {op} is not supported by the memory engine")
+            value = _evaluate(arg, doc)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                row[field] += value
+    return list(groups.values())
+
+
+def _project_stage(docs: list, spec: dict) -> list:
+    rows = []
+    for doc in docs:
+        row = {}
+        if spec.get("_id", 1) and "_id" not in spec:
+            row["_id"] = doc.get("_id")
+        for field, expr in spec.items():
+            if expr in (1, True):
+                value = _get(doc, field)
+                if value is not MISSING:
+                    row[field] = value
+            elif expr not in (0, False):
+                row[field] = _evaluate(expr, doc)
+        rows.append(row)
+    return rows
+
+
+# ---------------- ✅ RESULTS & CURSOR ----------------
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+        self.acknowledged = True
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+
+def _normalize_sort(key_or_list, direction=None) -> list:
+    if key_or_list is None:
+        return []
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+class MemoryCursor:
+    """Results are computed on first iteration, like a Motor cursor's first batch."""
+
+    def __init__(self, collection, query: dict, projection=None):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+        self.alive = True
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, n: int):
+        self._skip = n
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def batch_size(self, n: int):
+        return self
+
+    def _materialize(self) -> list:
+        if self._results is None:
+            rows = self._collection._select(self._query, self._sort)
+            rows = rows[self._skip:]
+            if self._limit:
+                rows = rows[:self._limit]
+            self._results = [_project(doc, self._projection, score) for doc, score in rows]
+        return self._results
+
+    def __aiter__(self):
+        self._iter = iter(self._materialize())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            self.alive = False
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        results = self._materialize()
+        self.alive = False
+        return list(results if length is None else results[:length])
+
+
+class _AggregateCursor:
+    def __init__(self, rows: list):
+        self._rows = rows
+
+    def __aiter__(self):
+        self._iter = iter(self._rows)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        return list(self._rows if length is None else self._rows[:length])
+
+
+# ---------------- ✅ COLLECTION ----------------
+
+class MemoryCollection:
+    def __init__(self, database, name: str):
+        self.database = database
+        self.name = name
+        self._docs = {}        # _id -> doc, in insertion order ($natural)
+        self._by_user = {}     # user_id -> {_id: doc}
+        self._unique = {}      # index name -> (fields, partial filter or None, {values: _id})
+        self._text_fields = []
+
+    # ---- indexes ----
+
+    def _user_bucket(self, doc: dict):
+        user_id = doc.get("user_id")
+        return user_id if isinstance(user_id, str) else None
+
+    def _unique_values(self, doc: dict, fields: tuple) -> tuple:
+        values = []
+        for field in fields:
+            value = _get(doc, field)
+            values.append(None if value is MISSING else repr(value))
+        return tuple(values)
+
+    def _check_unique(self, doc: dict, replacing=None):
+        _id = doc["_id"]
+        if _id in self._docs and _id != replacing:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_ dup key: {{ _id: {_id!r} }}", 11000)
+        for name, (fields, partial, seen) in self._unique.items():
+            if partial is not None and not matches(doc, partial):
+                continue
+            owner = seen.get(self._unique_values(doc, fields))
+            if owner is not None and owner != replacing:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", 11000)
+
+    def _index(self, doc: dict):
+        self._docs[doc["_id"]] = doc
+        bucket = self._user_bucket(doc)
+        if bucket is not None:
+            self._by_user.setdefault(bucket, {})[doc["_id"]] = doc
+        for fields, partial, seen in self._unique.values():
+            if partial is None or matches(doc, partial):
+                seen[self._unique_values(doc, fields)] = doc["_id"]
+
+    def _unindex(self, doc: dict, keep_slot: bool = False):
+        if not keep_slot:
+            self._docs.pop(doc["_id"], None)
+        bucket = self._user_bucket(doc)
+        if bucket is not None:
+            users = self._by_user.get(bucket, {})
+            users.pop(doc["_id"], None)
+            if not users:
+                self._by_user.pop(bucket, None)
+        for fields, _, seen in self._unique.values():
+            key = self._unique_values(doc, fields)
+            if seen.get(key) == doc["_id"]:
+                del seen[key]
+
+    def _store(self, doc: dict, previous: dict = None):
+        """Write `doc`, replacing `previous` (same _id, same $natural slot) if given."""
+        if previous is None:
+            self._check_unique(doc)
+            self._index(doc)
+            return
+        self._unindex(previous, keep_slot=True)
+        try:
+            self._check_unique(doc, replacing=previous["_id"])
+        except DuplicateKeyError:
+            self._index(previous)
+            raise
+        self._index(doc)
+
+    async def create_index(self, keys, unique: bool = False, name: str = None,
+                           partialFilterExpression: dict = None, **kwargs) -> str:
+        keys = _normalize_sort(keys, 1)
+        name = name or "_".join(f"{field}_{direction}" for field, direction in keys)
+        text = [field for field, direction in keys if direction == TEXT]
+        if text:
+            self._text_fields = text
+        if unique and name not in self._unique:
+            fields = tuple(field for field, _ in keys)
+            seen = {}
+            for doc in self._docs.values():
+                if partialFilterExpression is not None and not matches(doc, partialFilterExpression):
+                    continue
+                key = self._unique_values(doc, fields)
+                if key in seen:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", 11000)
+                seen[key] = doc["_id"]
+            self._unique[name] = (fields, partialFilterExpression, seen)
+        return name
+
+    # ---- reads ----
+
+    def _candidates(self, query: dict):
+        # Equalities at the top level or inside $and (where query builders put them) narrow the scan
+        equalities = _equality_fields(query)
+        _id = equalities.get("_id", MISSING)
+        if _id is not MISSING and not isinstance(_id, (dict, list)):
+            doc = self._docs.get(_id)
+            return [doc] if doc is not None else []
+        user_id = equalities.get("user_id")
+        if isinstance(user_id, str):
+            return list(self._by_user.get(user_id, {}).values())
+        return list(self._docs.values())
+
+    def _text_score(self, doc: dict, search: str) -> float:
+        terms = set(TOKEN.findall(search.lower()))
+        words = []
+        for field in self._text_fields:
+            value = _get(doc, field)
+            if isinstance(value, str):
+                words.extend(TOKEN.findall(value.lower()))
+        if not words:
+            return 0.0
+        hits = sum(1 for word in words if word in terms)
+        # Mongo weighs matches by how much of the field they cover
+        return hits / len(words) + hits
+
+    def _select(self, query: dict, sort: list = None) -> list:
+        """(doc, text score) pairs matching `query`, ordered by `sort`."""
+        query = _clone(query)
+        search = query.get("$text")
+        if search is not None and not self._text_fields:
+            raise OperationFailure("text index required for $text query", 27)
+        rows = []
+        for doc in self._candidates(query):
+            if not matches(doc, query):
+                continue
+            score = None
+            if search is not None:
+                score = self._text_score(doc, search["$search"])
+                if not score:
+                    continue
+            rows.append((doc, score))
+        if sort:
+            natural = None
+            for field, direction in reversed(sort):
+                if isinstance(direction, dict):
+                    rows.sort(key=lambda r: r[1] or 0.0, reverse=True)
+                elif field == "$natural":
+                    natural = natural or {key: i for i, key in enumerate(self._docs)}
+                    rows.sort(key=lambda r: natural[r[0]["_id"]], reverse=direction < 0)
+                else:
+                    rows.sort(key=lambda r: _sort_key(_get(r[0], field)), reverse=direction < 0)
+        return rows
+
+    def find(self, filter: dict = None, projection=None, **kwargs) -> MemoryCursor:
+        cursor = MemoryCursor(self, filter, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    def _first(self, filter: dict, sort=None):
+        rows = self._select(filter or {}, _normalize_sort(sort))
+        return rows[0] if rows else (None, None)
+
+    async def find_one(self, filter: dict = None, projection=None, sort=None, **kwargs):
+        doc, score = self._first(filter, sort)
+        return None if doc is None else _project(doc, projection, score)
+
+    async def count_documents(self, filter: dict, **kwargs) -> int:
+        return len(self._select(filter))
+
+    # ---- writes ----
+
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        document.setdefault("_id", ObjectId())
+        self._store(_clone(document))
+        return InsertOneResult(document["_id"])
+
+    async def insert_many(self, documents: list, ordered: bool = True, **kwargs) -> InsertManyResult:
+        inserted, errors = [], []
+        for index, document in enumerate(documents):
+            document.setdefault("_id", ObjectId())
+            try:
+                self._store(_clone(document))
+                inserted.append(document["_id"])
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "writeConcernErrors": [], "nInserted": len(inserted),
+                "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+            })
+        return InsertManyResult(inserted)
+
+    def _upsert(self, filter: dict, update: dict = None, replacement: dict = None) -> dict:
+        doc = _clone(replacement) if replacement is not None else {}
+        if replacement is None:
+            for path, value in _equality_fields(filter).items():
+                _set(doc, path, _clone(value))
+            _apply_update(doc, update, inserting=True)
+        if "_id" not in doc:
+            seeded = _equality_fields(filter).get("_id", MISSING)
+            doc["_id"] = seeded if seeded is not MISSING else ObjectId()
+        self._store(doc)
+        return doc
+
+    def _modify(self, current: dict, update: dict) -> dict:
+        doc = _clone(current)
+        _apply_update(doc, update, inserting=False)
+        if doc.get("_id") != current["_id"]:
+            raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'", 66)
+        self._store(doc, previous=current)
+        return doc
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        current, _ = self._first(filter)
+        if current is None:
+            if not upsert:
+                return UpdateResult(0, 0)
+            return UpdateResult(0, 0, self._upsert(filter, update)["_id"])
+        doc = self._modify(current, update)
+        return UpdateResult(1, int(doc != current))
+
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        rows = self._select(filter)
+        if not rows and upsert:
+            return UpdateResult(0, 0, self._upsert(filter, update)["_id"])
+        modified = 0
+        for current, _ in rows:
+            modified += int(self._modify(current, update) != current)
+        return UpdateResult(len(rows), modified)
+
+    async def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        current, _ = self._first(filter)
+        if current is None:
+            if not upsert:
+                return UpdateResult(0, 0)
+            return UpdateResult(0, 0, self._upsert(filter, replacement=replacement)["_id"])
+        doc = _clone(replacement)
+        doc["_id"] = current["_id"]
+        self._store(doc, previous=current)
+        return UpdateResult(1, int(doc != current))
+
+    async def find_one_and_update(self, filter: dict, update: dict, projection=None, sort=None,
+                                  upsert: bool = False, return_document=ReturnDocument.BEFORE, **kwargs):
+        current, _ = self._first(filter, sort)
+        if current is None:
+            if not upsert:
+                return None
+            doc = self._upsert(filter, update)
+            return _project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        doc = self._modify(current, update)
+        return _project(doc if return_document == ReturnDocument.AFTER else current, projection)
+
+    async def find_one_and_delete(self, filter: dict, projection=None, sort=None, **kwargs):
+        current, _ = self._first(filter, sort)
+        if current is None:
+            return None
+        self._unindex(current)
+        return _project(current, projection)
+
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        current, _ = self._first(filter)
+        if current is None:
+            return DeleteResult(0)
+        self._unindex(current)
+        return DeleteResult(1)
+
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        rows = self._select(filter)
+        for doc, _ in rows:
+            self._unindex(doc)
+        return DeleteResult(len(rows))
+
+    async def drop(self):
+        self.database._collections.pop(self.name, None)
+
+    # ---- aggregation ----
+
+    def aggregate(self, pipeline: list, **kwargs) -> _AggregateCursor:
+        docs = None
+        for stage in pipeline:
+            (op, spec), = stage.items()
+            if op == "$match":
+                source = self._select(spec) if docs is None else [(d, None) for d in docs if matches(d, _clone(spec))]
+                docs = [_clone(doc) for doc, _ in source]
+                continue
+            if docs is None:
+                docs = [_clone(doc) for doc in self._docs.values()]
+            if op == "$group":
+                docs = _group(docs, spec)
+            elif op == "$project":
+                docs = _project_stage(docs, spec)
+            elif op == "$sort":
+                for field, direction in reversed(list(spec.items())):
+                    docs.sort(key=lambda d: _sort_key(_get(d, field)), reverse=direction < 0)
+            elif op == "$limit":
+                docs = docs[:spec]
+            elif op == "$merge":
+                self._merge(docs, spec)
+                docs = []
+            else:
+                raise NotImplementedError(f"Aggregation stage {op} is not supported by the memory engine")
+        return _AggregateCursor(docs if docs is not None else [_clone(d) for d in self._docs.values()])
+
+    def _merge(self, docs: list, spec: dict):
+        if spec.get("whenMatched", "merge") != "replace" or spec.get("whenNotMatched", "insert") != "insert":
+            raise NotImplementedError("Only $merge with whenMatched=replace, whenNotMatched=insert is supported")
+        target = self.database.get_collection(spec["into"])
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+            target._store(doc, previous=target._docs.get(doc["_id"]))
+
+
+# ---------------- ✅ DATABASE & ENGINE ----------------
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections = {}
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        return self.get_collection(name)
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+    async def create_collection(self, name: str, **kwargs) -> MemoryCollection:
+        if name in self._collections:
+            raise CollectionInvalid(f"collection {name} already exists")
+        return self.get_collection(name)
+
+    async def list_collection_names(self) -> list:
+        return list(self._collections)
+
+    async def drop_collection(self, name: str):
+        self._collections.pop(name, None)
+
+
+class MemoryEngine:
+    """Process-local storage; everything is lost on restart."""
+
+    name = "memory"
+
+    def __init__(self, db_name: str):
+        self.client = None
+        self.db = MemoryDatabase(db_name)
+        self.read_db = self.db
+
+    async def connect(self):
+        pass
+
+    async def ping(self):
+        pass
+
+    async def close(self):
+        pass
@@ -0,0 +1,64 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference
+from app.config import settings
+from app.metrics import mongo_listener
+import asyncio
+import certifi
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+class MongoEngine:
+    """MongoDB through Motor: collections are the driver's own objects."""
+
+    name = "mongo"
+
+    def __init__(self, url: str, db_name: str):
+        if not url:
+            raise RuntimeError("DATABASE_URL is missing (set STORAGE_BACKEND=memory to run without MongoDB)")
+        self.url = url
+        self.db_name = db_name
+        self.client = None
+        self.db = None
+        self.read_db = None
+
+    def _build_client(self):
+        return AsyncIOMotorClient(
+            self.url,
+            tlsCAFile=certifi.where(),
+            tlsAllowInvalidCertificates=True,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+            serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+            waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            compressors=settings.MONGO_COMPRESSORS,
+            event_listeners=[mongo_listener],
+        )
+
+    async def connect(self):
+        # Motor connects lazily, so this never blocks
+        self.client = self._build_client()
+        read_preference = READ_PREFERENCES.get(settings.MONGO_READ_PREFERENCE, ReadPreference.PRIMARY)
+        self.db = self.client[self.db_name]
+        self.read_db = self.client.get_database(self.db_name, read_preference=read_preference)
+
+    async def ping(self):
+        """Round trip to the server, then warm the pool so the first requests find open sockets."""
+        await self.client.admin.command("ping")
+        connections = settings.MONGO_WARMUP_CONNECTIONS
+        if connections > 0:
+            await asyncio.gather(*(self.client.admin.command("ping") for _ in range(connections)))
+
+    async def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
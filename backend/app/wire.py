@@ -0,0 +1,137 @@
+from app.config import settings
+from app.metrics import WIRE_ENCODE_SECONDS, WIRE_PAYLOAD_BYTES
+from starlette.requests import Request
+from starlette.responses import Response
+import gzip
+import msgpack
+import orjson
+import time
+
+try:
+    import brotli
+except ImportError:  # optional: without it clients simply get gzip
+    brotli = None
+
+# ---------------- ✅ WIRE FORMATS FOR TRANSACTION LISTS ----------------
+# Clients pick the body format with `Accept`:
+#
+#   application/json (default)           [{id, user_id, amount, ...}, ...] as before
+#   application/vnd.rupeeriser.columnar+json
+#   application/msgpack                  the columnar shape, MessagePack-encoded
+#
+# Columnar shape: user_id once, parallel arrays per field, and the
+# low-cardinality fields dictionary-encoded:
+#
+#   {"format": "columnar/v1", "count": n, "user_id": "...",
+#    "id": [...], "amount": [...], "note": [...], "date": [...],
+#    "category": {"values": ["Food", ...], "codes": [0, 0, 1, ...]}, "account": {...}, "type": {...}}
+#
+# Bodies of at least WIRE_COMPRESS_MIN_BYTES are brotli- or gzip-compressed
+# per `Accept-Encoding`.
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.rupeeriser.columnar+json"
+MSGPACK = "application/msgpack"
+MEDIA_TYPES = {JSON: "json", COLUMNAR_JSON: "columnar", MSGPACK: "msgpack", "application/x-msgpack": "msgpack"}
+
+ROW_FIELDS = ("id", "user_id", "amount", "category", "note", "date", "type", "account")
+DICT_FIELDS = ("category", "account", "type")
+# Defaults TransactionResponse would fill in for older documents
+ROW_DEFAULTS = {"category": "Other", "account": "wallet"}
+
+
+def _preferences(header: str) -> list:
+    """Tokens of an Accept / Accept-Encoding header, highest q first; q=0 entries dropped."""
+    prefs = []
+    for position, part in enumerate((header or "").split(",")):
+        token, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if token and q > 0:
+            prefs.append((-q, position, token.lower()))
+    return [token for _, _, token in sorted(prefs)]
+
+
+def negotiate_format(accept: str) -> str:
+    for media_type in _preferences(accept):
+        if media_type in MEDIA_TYPES:
+            return MEDIA_TYPES[media_type]
+    return "json"
+
+
+def negotiate_encoding(accept_encoding: str, size: int):
+    if size < settings.WIRE_COMPRESS_MIN_BYTES:
+        return None
+    for coding in _preferences(accept_encoding):
+        if coding == "br" and brotli is not None:
+            return "br"
+        if coding == "gzip":
+            return "gzip"
+    return None
+
+
+def _dict_encode(values: list) -> dict:
+    index = {}
+    codes = [index.setdefault(v, len(index)) for v in values]
+    return {"values": list(index), "codes": codes}
+
+
+def _column(transactions: list, field: str) -> list:
+    default = ROW_DEFAULTS.get(field)
+    return [tx.get(field, default) for tx in transactions]
+
+
+def to_rows(transactions: list) -> list:
+    """Same fields TransactionResponse exposes."""
+    return [{field: tx.get(field, ROW_DEFAULTS.get(field)) for field in ROW_FIELDS} for tx in transactions]
+
+
+def to_columnar(transactions: list) -> dict:
+    return {
+        "format": "columnar/v1",
+        "count": len(transactions),
+        "user_id": transactions[0].get("user_id") if transactions else None,
+        **{field: _column(transactions, field) for field in ("id", "amount", "note", "date")},
+        **{field: _dict_encode(_column(transactions, field)) for field in DICT_FIELDS},
+    }
+
+
+def encode(fmt: str, payload) -> bytes:
+    if fmt == "msgpack":
+        return msgpack.packb(payload, use_bin_type=True)
+    return orjson.dumps(payload)
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=settings.WIRE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.WIRE_GZIP_LEVEL)
+
+
+def transaction_list_response(request: Request, transactions: list, envelope: dict = None, key: str = None) -> Response:
+    """
+    Encode a list of transaction documents (already carrying `id`) in the
+    format the client asked for. With `envelope`, the list goes under
+    `key` next to the envelope's other fields (e.g. search paging).
+    """
+    started = time.perf_counter()
+    fmt = negotiate_format(request.headers.get("accept"))
+    items = to_columnar(transactions) if fmt != "json" else to_rows(transactions)
+    payload = {**envelope, key: items} if envelope is not None else items
+
+    body = encode(fmt, payload)
+    coding = negotiate_encoding(request.headers.get("accept-encoding"), len(body))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if coding:
+        body = compress(body, coding)
+        headers["Content-Encoding"] = coding
+
+    WIRE_ENCODE_SECONDS.labels(format=fmt).observe(time.perf_counter() - started)
+    WIRE_PAYLOAD_BYTES.labels(format=fmt, encoding=coding or "identity").observe(len(body))
+    media_type = {"json": JSON, "columnar": COLUMNAR_JSON, "msgpack": MSGPACK}[fmt]
+    return Response(body, media_type=media_type, headers=headers)
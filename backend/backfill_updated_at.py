@@ -0,0 +1,15 @@
+import asyncio
+from app import database
+from app.services.maintenance import backfill_updated_at
+
+async def main():
+    await database.connect_to_mongo()
+    try:
+        print("🕰️  Stamping updated_at on transactions that predate the change feed...")
+        result = await backfill_updated_at()
+        print(f"\n✨ Done! {result['stamped']} transactions stamped across {result['users']} users.")
+    finally:
+        await database.close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""
+Import-time budget check for the API process.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and fails if
+  - the cumulative import time of app.main exceeds the budget, or
+  - a lazily-loaded heavy module (the LangChain/Gemini stack) is imported eagerly.
+
+Usage:
+    python check_import_time.py                 # default budget
+    python check_import_time.py --budget-ms 800
+    python check_import_time.py --top 20        # show the 20 slowest imports
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = 1500
+
+# Must only be imported on first AI use (see app/services/ai_agent.py:get_llm)
+LAZY_MODULES = ("langchain_google_genai", "langchain_core", "google.genai")
+
+
+def measure(module: str = "app.main"):
+    """Return [(cumulative_us, self_us, name)] for every module imported by `module`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr)
+        raise SystemExit(f"❌ `import {module}` failed")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when app.main imports too slowly.")
+    parser.add_argument("--budget-ms", type=int, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = measure()
+    total_ms = next(cum for cum, _, name in rows if name == "app.main") / 1000
+
+    print(f"⏱️  import app.main: {total_ms:.0f} ms (budget {args.budget_ms} ms)")
+    print(f"\n🐢 Slowest {args.top} modules (self time):")
+    for cum, self_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"   {self_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager = sorted({name for _, _, name in rows if name.startswith(LAZY_MODULES)})
+    if eager:
+        failed = True
+        print(f"\n❌ Lazy modules imported eagerly: {', '.join(eager[:5])}")
+    if total_ms > args.budget_ms:
+        failed = True
+        print(f"\n❌ Import time {total_ms:.0f} ms exceeds budget of {args.budget_ms} ms")
+
+    if failed:
+        sys.exit(1)
+    print("\n✅ Import-time budget OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Run the storage conformance suite (app/storage/conformance.py).
+
+Always checks the in-memory engine; with DATABASE_URL set (or --mongo URL)
+it also checks MongoDB, in a scratch database <DB_NAME>_conformance that is
+left empty afterwards. Exits non-zero if any engine fails a check.
+
+Usage:
+    python check_storage_conformance.py
+    python check_storage_conformance.py --mongo mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from app.config import settings
+from app.storage import create_engine
+from app.storage.conformance import run_conformance
+
+
+async def check_engine(backend: str, url: str = None) -> bool:
+    engine = create_engine(backend, url=url, db_name=f"{settings.DB_NAME}_conformance")
+    await engine.connect()
+    try:
+        await engine.ping()
+        results = await run_conformance(engine.db)
+    except Exception as e:
+        print(f"\n{backend}: ❌ could not run the suite: {e}")
+        return False
+    finally:
+        await engine.close()
+
+    failed = [(name, error) for name, error in results if error]
+    print(f"\n{backend}: {len(results) - len(failed)}/{len(results)} checks passed")
+    for name, error in results:
+        print(f"  {'✅' if not error else '❌'} {name}")
+    for name, error in failed:
+        print(f"\n--- {name} ---\n{error}")
+    return not failed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo", metavar="URL", default=os.getenv("DATABASE_URL") or settings.DATABASE_URL)
+    args = parser.parse_args()
+
+    ok = await check_engine("memory")
+    if args.mongo:
+        ok = await check_engine("mongo", args.mongo) and ok
+    else:
+        print("\nmongo: skipped (no DATABASE_URL / --mongo)")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
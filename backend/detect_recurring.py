@@ -0,0 +1,15 @@
+import asyncio
+from app import database
+from app.services.recurring import detect_all_users
+
+async def main():
+    await database.connect_to_mongo()
+    try:
+        print("🔁 Detecting recurring payments for all users...")
+        result = await detect_all_users()
+        print(f"\n✨ Done! Processed {result['users']} users.")
+    finally:
+        await database.close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
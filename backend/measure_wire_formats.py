@@ -0,0 +1,102 @@
+"""
+Payload size and encode time of the transaction-list wire formats.
+
+Builds a synthetic transaction list and encodes it the way GET /transactions/
+does today (response_model validation + JSONResponse) and with each format
+from app/wire.py, uncompressed and compressed.
+
+Usage:
+    python measure_wire_formats.py                # 500 and 5000 rows
+    python measure_wire_formats.py --rows 2000 --repeat 20
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app import wire
+from app.models import TransactionResponse
+
+CATEGORIES = ["Food", "Transport", "Shopping", "Health", "Entertainment", "Bills", "Other", "Salary"]
+ACCOUNTS = ["wallet", "upi", "card", "bank"]
+NOTES = ["Swiggy order", "Rapido to office", "Ration", "Anna's mess", "Amazon", "Metro card",
+         "Electricity bill", "Coffee", "Netflix", "Medicine", "Petrol", "Groceries dmart"]
+
+
+def synthetic(rows: int) -> list:
+    rng = random.Random(7)
+    user_id = "65f1c2a9e4b0a1b2c3d4e5f6"
+    start = date(2025, 1, 1)
+    return [
+        {
+            "id": f"{0x65f1c2a9e4b0a1b2c3d40000 + i:024x}",
+            "user_id": user_id,
+            "amount": round(rng.uniform(20, 5000), 2),
+            "category": rng.choice(CATEGORIES),
+            "note": rng.choice(NOTES),
+            "date": (start + timedelta(days=rng.randrange(600))).isoformat(),
+            "type": "income" if rng.random() < 0.05 else "expense",
+            "account": rng.choice(ACCOUNTS),
+        }
+        for i in range(rows)
+    ]
+
+
+def current_json(transactions: list) -> bytes:
+    # What FastAPI does with response_model=List[TransactionResponse]
+    adapter = TypeAdapter(List[TransactionResponse])
+    return JSONResponse(adapter.dump_python(adapter.validate_python(transactions), mode="json")).body
+
+
+def timed(func, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+
+def report(rows: int, repeat: int):
+    transactions = synthetic(rows)
+    variants = {
+        "current json": lambda: current_json(transactions),
+        "json": lambda: wire.encode("json", wire.to_rows(transactions)),
+        "columnar json": lambda: wire.encode("columnar", wire.to_columnar(transactions)),
+        "msgpack": lambda: wire.encode("msgpack", wire.to_columnar(transactions)),
+    }
+    codings = [None, "gzip"] + (["br"] if wire.brotli is not None else [])
+
+    print(f"\n{rows} rows (best of {repeat})")
+    print(f"{'format':<15}{'encoding':<10}{'bytes':>10}{'vs current':>12}{'ms':>9}")
+    baseline = None
+    for name, func in variants.items():
+        body, encode_ms = timed(func, repeat)
+        for coding in codings:
+            if coding:
+                payload, compress_ms = timed(lambda: wire.compress(body, coding), repeat)
+            else:
+                payload, compress_ms = body, 0.0
+            baseline = baseline or len(payload)
+            print(
+                f"{name:<15}{coding or 'identity':<10}{len(payload):>10}"
+                f"{len(payload) / baseline:>11.0%} {encode_ms + compress_ms:>8.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, action="append", help="list sizes to measure")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    for rows in args.rows or [500, 5000]:
+        report(rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+
+# Settings are read at import time: run against the in-memory storage engine,
+# without background jobs or the Gemini pre-warm, whatever .env says.
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["JOBS_ENABLED"] = "false"
+os.environ["AI_PREWARM"] = "false"
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client():
+    """The app with a fresh in-memory database (the lifespan builds a new engine per client)."""
+    from app.main import app
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def run(client):
+    """Await a coroutine function on the app's event loop: run(collection.insert_one, doc)."""
+    return client.portal.call
+
+
+@pytest.fixture
+def user(client):
+    r = client.post("/auth/signup", json={"name": "Test", "email": "test@example.com", "password": "secret123"})
+    assert r.status_code == 200, r.text
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    me = client.get("/auth/me", headers=headers).json()
+    return {"id": me["id"], "headers": headers}
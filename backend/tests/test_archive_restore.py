@@ -0,0 +1,49 @@
+from bson import ObjectId
+
+from app import database
+from app.services import archive
+
+
+def archive_rows(run, user_id: str, rows: list) -> list:
+    """rows: (amount, category); all dated 2020-03 and archived."""
+    docs = [
+        {"user_id": user_id, "amount": amount, "category": category, "note": "old", "date": f"2020-03-{i + 1:02d}",
+         "type": "expense", "account": "wallet"}
+        for i, (amount, category) in enumerate(rows)
+    ]
+    run(database.transactions_collection.insert_many, docs)
+    run(archive.archive_user, user_id, "2023-01")
+    return [str(d["_id"]) for d in docs]
+
+
+def month_totals(run, user_id: str) -> dict:
+    rows = run(lambda: database.aggregates_collection.find({"user_id": user_id, "month": "2020-03"}).to_list(None))
+    return {r["category"]: (r["total"], r["count"]) for r in rows}
+
+
+def test_edits_and_deletes_of_archived_rows_keep_month_totals(client, run, user):
+    ids = archive_rows(run, user["id"], [(100, "Food"), (50, "Food"), (30, "Bills")])
+    assert month_totals(run, user["id"]) == {"Food": (150, 2), "Bills": (30, 1)}
+
+    r = client.delete(f"/transactions/{ids[1]}", headers=user["headers"])
+    assert r.status_code == 200, r.text
+    assert month_totals(run, user["id"]) == {"Food": (100, 1), "Bills": (30, 1)}
+
+    body = {"amount": 120, "category": "Transport", "note": "old", "date": "2020-03-01", "type": "expense"}
+    r = client.put(f"/transactions/{ids[0]}", json=body, headers=user["headers"])
+    assert r.status_code == 200, r.text
+    assert month_totals(run, user["id"]) == {"Transport": (120, 1), "Bills": (30, 1)}
+
+    # The next archive run re-buckets the edited row and agrees
+    run(archive.archive_user, user["id"], "2023-01")
+    assert month_totals(run, user["id"]) == {"Transport": (120, 1), "Bills": (30, 1)}
+
+
+def test_bucket_listing_a_missing_row_is_not_found(client, run, user):
+    archive_rows(run, user["id"], [(10, "Food")])
+    ghost = ObjectId()
+    run(database.archive_collection.update_one, {"user_id": user["id"]}, {"$push": {"ids": ghost}})
+
+    assert run(archive.restore_transaction, user["id"], ghost) is None
+    r = client.delete(f"/transactions/{ghost}", headers=user["headers"])
+    assert r.status_code == 404
@@ -0,0 +1,75 @@
+from app import database
+from app.services import archive
+
+
+def archive_months(run, user_id: str, months: dict):
+    """months: {"YYYY-MM": [note, ...]}, archived into one bucket per month."""
+    docs = [
+        {"user_id": user_id, "amount": 100 + i, "category": "Food", "note": note,
+         "date": f"{month}-{10 + i:02d}", "type": "expense", "account": "wallet"}
+        for month, notes in months.items()
+        for i, note in enumerate(notes)
+    ]
+    run(database.transactions_collection.insert_many, docs)
+    run(archive.archive_user, user_id, "2100-01")
+
+
+def opened_buckets(monkeypatch) -> list:
+    opened = []
+    find_one = database.archive_collection.find_one
+
+    async def counting_find_one(filter=None, *args, **kwargs):
+        opened.append(filter["_id"])
+        return await find_one(filter, *args, **kwargs)
+
+    monkeypatch.setattr(database.archive_collection, "find_one", counting_find_one)
+    return opened
+
+
+def test_limited_search_is_a_prefix_of_the_full_ranking(client, run, user):
+    archive_months(run, user["id"], {
+        "2022-01": ["uber ride home", "coffee"],
+        "2022-02": ["uber eats dinner", "uber ride office"],
+        "2022-03": ["groceries", "ride share"],
+        "2022-04": ["uber ride airport"],
+    })
+    terms = archive.note_terms("uber ride")
+    full = run(archive.search_archived, user["id"], terms, {})
+    assert [tx["note"] for tx in full] == [
+        "uber ride airport", "uber ride office", "uber ride home", "ride share", "uber eats dinner",
+    ]
+    for limit in range(1, len(full) + 1):
+        page = run(archive.search_archived, user["id"], terms, {}, limit)
+        assert [tx["_id"] for tx in page] == [tx["_id"] for tx in full[:limit]]
+
+
+def test_search_only_opens_buckets_it_needs(client, run, user, monkeypatch):
+    archive_months(run, user["id"], {f"2021-{m:02d}": ["rent payment", "misc"] for m in range(1, 13)})
+    opened = opened_buckets(monkeypatch)
+
+    page = run(archive.search_archived, user["id"], archive.note_terms("rent"), {}, 3)
+    assert [tx["date"][:7] for tx in page] == ["2021-12", "2021-11", "2021-10"]
+    assert len(opened) == 3
+
+    opened.clear()
+    run(archive.search_archived, user["id"], archive.note_terms("salary"), {}, 3)
+    assert opened == []  # no bucket has the term
+
+    opened.clear()
+    filters = {"start_date": "2021-03-01", "end_date": "2021-04-30"}
+    page = run(archive.search_archived, user["id"], set(), filters, 10)
+    assert {tx["date"][:7] for tx in page} == {"2021-03", "2021-04"}
+    assert len(opened) == 2
+
+
+def test_search_endpoint_pages_into_the_archive(client, run, user):
+    archive_months(run, user["id"], {"2020-05": [f"taxi {i}" for i in range(5)]})
+    seen = []
+    for page in (1, 2, 3):
+        r = client.get("/transactions/search", params={"q": "taxi", "page": page, "page_size": 2},
+                       headers=user["headers"])
+        assert r.status_code == 200, r.text
+        body = r.json()
+        seen += [tx["note"] for tx in body["items"]]
+        assert body["has_more"] == (page < 3)
+    assert seen == [f"taxi {i}" for i in range(4, -1, -1)]
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from app import database
+
+BUDGET = {"salary": 50000, "fixed_costs": {"rent": 15000}, "config": "{}"}
+
+
+class LaggingCollection:
+    """A secondary that has not replicated the latest write yet."""
+
+    async def find_one(self, *args, **kwargs):
+        return {**BUDGET, "fixed_costs": {"rent": 15000}, "revision": 1}
+
+
+def test_get_returns_the_primary_revision(client, user, monkeypatch):
+    for revision in (0, 1):
+        r = client.put("/budget/", json={**BUDGET, "revision": revision}, headers=user["headers"])
+        assert r.status_code == 200, r.text
+
+    monkeypatch.setattr(database, "read_db", SimpleNamespace(budget_settings=LaggingCollection()))
+    current = client.get("/budget/", headers=user["headers"]).json()
+    assert current["revision"] == 2
+
+    patch = {"base_revision": current["revision"], "ops": [{"op": "add", "path": "/theme", "value": "dark"}]}
+    r = client.patch("/budget/config", json=patch, headers=user["headers"])
+    assert r.status_code == 200, r.text
@@ -0,0 +1,75 @@
+from bson import ObjectId
+
+from app import database
+from app.services import categorizer, events
+
+
+def add(client, user, note: str, category: str) -> str:
+    body = {"amount": 120, "category": category, "note": note, "date": "2024-03-01", "type": "expense"}
+    r = client.post("/transactions/", json=body, headers=user["headers"])
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def test_corrected_category_replaces_the_old_one(client, run, user):
+    ids = [add(client, user, "rapido ride", "Food") for _ in range(3)]
+    learned, outcome = run(categorizer.predict, user["id"], "rapido ride")  # builds the model
+    assert outcome == "hit" and learned["category"] == "Food"
+
+    for tx_id in ids:
+        body = {"amount": 120, "category": "Transport", "note": "rapido ride", "date": "2024-03-01", "type": "expense"}
+        r = client.put(f"/transactions/{tx_id}", json=body, headers=user["headers"])
+        assert r.status_code == 200, r.text
+
+    learned, outcome = run(categorizer.predict, user["id"], "rapido ride")
+    assert outcome == "hit"
+    assert learned["category"] == "Transport"
+    assert learned["confidence"] == 1.0
+
+
+def test_unchanged_edit_keeps_counts(client, run, user):
+    tx_id = add(client, user, "annas idli", "Food")
+    run(categorizer.predict, user["id"], "annas")
+    body = {"amount": 90, "category": "Food", "note": "annas idli", "date": "2024-03-02", "type": "expense"}
+    client.put(f"/transactions/{tx_id}", json=body, headers=user["headers"])
+
+    model = run(database.categorizer_collection.find_one, {"_id": user["id"]})
+    assert model["tokens"]["annas"]["c"] == {"Food": 1}
+
+
+def test_deleted_transaction_is_unlearned(client, run, user):
+    ids = [add(client, user, "annas", "Food") for _ in range(2)]
+    assert run(categorizer.predict, user["id"], "annas")[1] == "hit"
+
+    r = client.delete(f"/transactions/{ids[0]}", headers=user["headers"])
+    assert r.status_code == 200, r.text
+    # One row left is below CATEGORIZER_MIN_SUPPORT
+    assert run(categorizer.predict, user["id"], "annas") == (None, "low_confidence")
+
+    client.delete(f"/transactions/{ids[1]}", headers=user["headers"])
+    assert run(categorizer.predict, user["id"], "annas") == (None, "unfamiliar")
+
+
+def test_rebuild_does_not_overwrite_a_concurrent_correction(client, run, user, monkeypatch):
+    ids = [add(client, user, "rapido", "Food") for _ in range(3)]
+    run(categorizer.predict, user["id"], "rapido")  # builds the model
+    count_history = categorizer._count_history
+    corrected = []
+
+    async def racing_count(user_id):
+        tokens = await count_history(user_id)
+        if not corrected:
+            # Corrections land after the rebuild read history but before it wrote the model
+            for tx_id in ids:
+                previous = await database.transactions_collection.find_one_and_update(
+                    {"_id": ObjectId(tx_id)}, {"$set": {"category": "Transport"}}
+                )
+                await events.emit("transaction", user_id, "update", {**previous, "category": "Transport"}, previous)
+            corrected.append(True)
+        return tokens
+
+    monkeypatch.setattr(categorizer, "_count_history", racing_count)
+    run(categorizer.build_model, user["id"])
+
+    learned, outcome = run(categorizer.predict, user["id"], "rapido")
+    assert outcome == "hit" and learned["category"] == "Transport"
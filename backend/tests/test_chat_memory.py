@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import database
+from app.config import settings
+from app.services import chat_memory
+from app.services.rate_limiter import ai_admission
+
+TURNS = settings.CHAT_RECENT_TURNS + settings.CHAT_SUMMARIZE_AFTER_TURNS
+
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    calls = []
+
+    async def fake_summarize(summary, turns, max_tokens):
+        calls.append(len(turns))
+        await asyncio.sleep(0.05)  # long enough for a concurrent fold to try its claim
+        return f"folded {len(turns)} turns"
+
+    async def admit(user_id, route):
+        return True
+
+    monkeypatch.setattr(chat_memory, "summarize_conversation", fake_summarize)
+    monkeypatch.setattr(ai_admission, "admit", admit)
+    return calls
+
+
+def seed(run, user_id: str, **fields) -> str:
+    now = datetime.utcnow()
+    turns = [{"id": str(i), "role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}", "at": now}
+             for i in range(TURNS)]
+    run(database.conversations_collection.insert_one, {
+        "_id": f"{user_id}|c1", "user_id": user_id, "conversation_id": "c1",
+        "summary": "", "summary_version": 0, "turns": turns, **fields,
+    })
+    return f"{user_id}|c1"
+
+
+def test_concurrent_folds_call_the_model_once(client, run, user, model_calls):
+    key = seed(run, user["id"])
+
+    async def two_workers():
+        await asyncio.gather(chat_memory.summarize(user["id"], "c1"), chat_memory.summarize(user["id"], "c1"))
+
+    run(two_workers)
+    assert model_calls == [settings.CHAT_SUMMARIZE_AFTER_TURNS]
+    doc = run(database.conversations_collection.find_one, {"_id": key})
+    assert doc["summary"] == f"folded {settings.CHAT_SUMMARIZE_AFTER_TURNS} turns"
+    assert len(doc["turns"]) == settings.CHAT_RECENT_TURNS
+    assert "summarizing_until" not in doc  # claim released
+
+
+def test_fold_claimed_elsewhere_is_skipped(client, run, user, model_calls):
+    until = datetime.utcnow() + timedelta(seconds=60)
+    key = seed(run, user["id"], summarizing_until=until)
+    run(chat_memory.summarize, user["id"], "c1")
+    assert model_calls == []
+    doc = run(database.conversations_collection.find_one, {"_id": key})
+    assert len(doc["turns"]) == TURNS and doc["summarizing_until"] is not None
+
+
+def test_expired_claim_is_taken_over(client, run, user, model_calls):
+    key = seed(run, user["id"], summarizing_until=datetime.utcnow() - timedelta(seconds=1))
+    run(chat_memory.summarize, user["id"], "c1")
+    assert len(model_calls) == 1
+    doc = run(database.conversations_collection.find_one, {"_id": key})
+    assert doc["summary_version"] == 1 and "summarizing_until" not in doc
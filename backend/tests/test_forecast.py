@@ -0,0 +1,57 @@
+from datetime import date
+
+from app import database
+from app.services import events, forecast
+
+
+def add_expense(client, user, amount: float, category: str = "Food"):
+    body = {"amount": amount, "category": category, "note": "x", "date": date.today().isoformat(), "type": "expense"}
+    r = client.post("/transactions/", json=body, headers=user["headers"])
+    assert r.status_code == 200, r.text
+
+
+def test_increments_keep_the_forecast_current(client, run, user):
+    add_expense(client, user, 100)
+    run(forecast.get_forecast, user["id"])  # builds the state
+    add_expense(client, user, 50)
+    state = run(database.forecasts_collection.find_one, {"user_id": user["id"]})
+    assert state["mtd"]["Food"] == 150
+
+
+def test_rebuild_does_not_overwrite_a_concurrent_increment(client, run, user, monkeypatch):
+    add_expense(client, user, 100)
+    run(forecast.get_forecast, user["id"])
+    read_spend = forecast._read_spend
+    raced = []
+
+    async def racing_read(user_id, history_start, current):
+        result = await read_spend(user_id, history_start, current)
+        if not raced:
+            # An expense is written after the rebuild read spending but before it stored the state
+            tx = {"user_id": user_id, "amount": 40, "category": "Food", "note": "x",
+                  "date": date.today().isoformat(), "type": "expense"}
+            await database.transactions_collection.insert_one(tx)
+            await events.emit("transaction", user_id, "create", tx)
+            raced.append(True)
+        return result
+
+    monkeypatch.setattr(forecast, "_read_spend", racing_read)
+    run(forecast.rebuild_state, user["id"])
+    state = run(database.forecasts_collection.find_one, {"user_id": user["id"]})
+    assert state["mtd"]["Food"] == 140
+
+
+def test_budget_write_during_first_build_is_not_lost(client, run, user, monkeypatch):
+    read_spend = forecast._read_spend
+
+    async def racing_read(user_id, history_start, current):
+        result = await read_spend(user_id, history_start, current)
+        monkeypatch.setattr(forecast, "_read_spend", read_spend)
+        await events.emit("budget", user_id, "update", {})
+        return result
+
+    monkeypatch.setattr(forecast, "_read_spend", racing_read)
+    run(forecast.rebuild_state, user["id"])
+    # The first attempt lost to the budget write's version bump; the retry read after it
+    state = run(database.forecasts_collection.find_one, {"user_id": user["id"]})
+    assert state["built_on"] == date.today().isoformat() and state["version"] == 1
@@ -0,0 +1,52 @@
+from app import database
+from app.services import goal_projection
+
+
+def test_goal_target_date_is_validated(client, user):
+    for bad in ("next year", "2030-13", "2030-6", "31/12/2030"):
+        r = client.post("/goals/", json={"name": "Bike", "amount": 90000, "target_date": bad}, headers=user["headers"])
+        assert r.status_code == 422, bad
+
+    r = client.post("/goals/", json={"name": "Bike", "amount": 90000, "target_date": "2030-06"}, headers=user["headers"])
+    assert r.status_code == 200, r.text
+    r = client.get(f"/goals/{r.json()['id']}/projection", headers=user["headers"])
+    assert r.status_code == 200, r.text
+    assert r.json()["target_date"] == "2030-06"
+    assert r.json()["monthly_savings_needed"] > 0
+
+
+def test_stored_free_text_target_date_is_ignored(client, run, user):
+    run(database.goals_collection.insert_one,
+        {"user_id": user["id"], "name": "Trip", "amount": 50000, "saved": 0, "target_date": "someday"})
+
+    r = client.get("/goals/", headers=user["headers"])
+    assert r.status_code == 200, r.text
+    r = client.get("/goals/projections", headers=user["headers"])
+    assert r.status_code == 200, r.text
+    assert r.json()[0]["target_date"] is None
+    assert r.json()[0]["monthly_savings_needed"] is None
+
+
+def test_projection_racing_a_write_is_not_cached(client, run, user, monkeypatch):
+    history = goal_projection.monthly_history
+    writes_during_simulation = [1]  # the first simulation races one transaction write
+
+    async def racing_history(user_id, months):
+        rows = await history(user_id, months)
+        if writes_during_simulation:
+            writes_during_simulation.pop()
+            await goal_projection.invalidate("transaction", user_id, "create", {}, None)
+        return rows
+
+    monkeypatch.setattr(goal_projection, "monthly_history", racing_history)
+    client.post("/goals/", json={"name": "Bike", "amount": 90000}, headers=user["headers"])
+
+    r = client.get("/goals/projections", headers=user["headers"])
+    assert r.status_code == 200, r.text
+    cached = run(database.goal_projections_collection.find_one, {"user_id": user["id"]})
+    # Goal create + the racing write; stored by the retry that started from generation 2
+    assert cached["generation"] == 2 and not cached.get("stale")
+
+    run(goal_projection.invalidate, "budget", user["id"], "update", {}, None)
+    cached = run(database.goal_projections_collection.find_one, {"user_id": user["id"]})
+    assert cached["stale"] and cached["generation"] == 3
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from app import database
+from app.models import TransactionCreate
+from app.services import idempotency
+
+BODY = {"amount": 250, "category": "Food", "note": "lunch", "date": "2024-03-01", "type": "expense"}
+ROUTE = "POST /transactions/"
+
+
+def post(client, user, key: str, body: dict = BODY):
+    return client.post("/transactions/", json=body, headers={**user["headers"], "Idempotency-Key": key})
+
+
+def leave_pending(run, user_id: str, key: str, lease_left: timedelta, body: dict = BODY):
+    """A claim left behind by a request that never reached complete() or abandon()."""
+    now = datetime.utcnow()
+    run(database.idempotency_collection.insert_one, {
+        "_id": f"{user_id}|{key}", "user_id": user_id, "route": ROUTE,
+        "fingerprint": idempotency.request_fingerprint(TransactionCreate(**body).dict()), "status": "pending",
+        "pending_until": now + lease_left, "created_at": now - timedelta(minutes=5),
+    })
+
+
+def test_retry_replays_the_first_response(client, user):
+    first = post(client, user, "k1")
+    again = post(client, user, "k1")
+    assert first.status_code == again.status_code == 200
+    assert again.json()["id"] == first.json()["id"]
+
+
+def test_live_pending_key_is_409(client, run, user):
+    leave_pending(run, user["id"], "k2", timedelta(seconds=30))
+    assert post(client, user, "k2").status_code == 409
+
+
+def test_expired_pending_key_is_taken_over(client, run, user):
+    leave_pending(run, user["id"], "k3", timedelta(seconds=-1))
+    first = post(client, user, "k3")
+    assert first.status_code == 200, first.text
+    # The takeover completed the key, so further retries replay it
+    assert post(client, user, "k3").json()["id"] == first.json()["id"]
+
+
+def test_expired_lease_goes_to_one_retry_only(client, run, user):
+    leave_pending(run, user["id"], "k4", timedelta(seconds=-1))
+    payload = TransactionCreate(**BODY).dict()
+    assert run(idempotency.begin, user["id"], "k4", ROUTE, payload) is None
+    with pytest.raises(HTTPException) as exc:
+        run(idempotency.begin, user["id"], "k4", ROUTE, payload)
+    assert exc.value.status_code == 409
+
+
+def test_expired_lease_is_not_taken_over_by_a_different_body(client, run, user):
+    leave_pending(run, user["id"], "k5", timedelta(seconds=-1))
+    assert post(client, user, "k5", {**BODY, "amount": 999}).status_code == 422
+
+
+def test_takeover_returns_the_row_the_dead_request_wrote(client, run, user):
+    leave_pending(run, user["id"], "k6", timedelta(seconds=-1))
+    written = {**TransactionCreate(**BODY).dict(), "user_id": user["id"], "idempotency_key": "k6"}
+    run(database.transactions_collection.insert_one, written)
+
+    retry = post(client, user, "k6")
+    assert retry.status_code == 200, retry.text
+    assert retry.json()["id"] == str(written["_id"])
+    assert run(database.transactions_collection.count_documents, {"user_id": user["id"]}) == 1
+    # And the key is done now
+    assert post(client, user, "k6").json()["id"] == str(written["_id"])
+
+
+def test_one_row_per_key(run, user):
+    row = {**TransactionCreate(**BODY).dict(), "user_id": user["id"], "idempotency_key": "k7"}
+    run(database.transactions_collection.insert_one, dict(row))
+    with pytest.raises(DuplicateKeyError):
+        run(database.transactions_collection.insert_one, dict(row))
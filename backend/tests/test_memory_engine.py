@@ -0,0 +1,30 @@
+import asyncio
+
+from app.storage import create_engine
+
+
+def candidates(query: dict) -> list:
+    async def scan():
+        engine = create_engine("memory")
+        await engine.connect()
+        try:
+            c = engine.db.get_collection("scans")
+            await c.insert_many([{"_id": i, "user_id": f"u{i % 3}", "n": i} for i in range(9)])
+            return sorted(doc["_id"] for doc in c._candidates(query))
+        finally:
+            await engine.close()
+    return asyncio.run(scan())
+
+
+def test_user_id_inside_and_uses_the_user_index():
+    assert candidates({"$and": [{"user_id": "u1"}, {"n": {"$gt": 2}}]}) == [1, 4, 7]
+    assert candidates({"$and": [{"n": {"$gt": 2}}, {"user_id": {"$eq": "u1"}}]}) == [1, 4, 7]
+
+
+def test_id_inside_and_is_a_point_lookup():
+    assert candidates({"$and": [{"_id": 4}, {"user_id": "u1"}]}) == [4]
+
+
+def test_other_queries_scan_everything():
+    assert len(candidates({"$or": [{"user_id": "u1"}, {"user_id": "u2"}]})) == 9
+    assert len(candidates({"user_id": {"$in": ["u1"]}})) == 9
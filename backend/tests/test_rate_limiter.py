@@ -0,0 +1,61 @@
+import asyncio
+
+from app.services.rate_limiter import AIAdmissionController
+
+
+def controller(**overrides) -> AIAdmissionController:
+    options = dict(
+        user_rate_per_min=6000, user_burst=10,
+        global_rate_per_min=1200, global_burst=1,  # one token every 50ms
+        max_wait=1.0, max_queue=10, max_queue_per_user=2,
+    )
+    return AIAdmissionController(**{**options, **overrides})
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    async def scenario():
+        limiter = controller()
+        assert await limiter.admit("warmup", "chat")  # drain the only token
+        order = []
+
+        async def call(user_id):
+            if await limiter.admit(user_id, "chat"):
+                order.append(user_id)
+
+        tasks = []
+        for user_id in ("a", "b", "c", "d"):
+            tasks.append(asyncio.create_task(call(user_id)))
+            await asyncio.sleep(0)  # arrive one after the other
+        await asyncio.gather(*tasks)
+        return order, limiter.queue_depth
+
+    order, depth = asyncio.run(scenario())
+    assert order == ["a", "b", "c", "d"]
+    assert depth == 0
+
+
+def test_one_users_burst_cannot_fill_the_queue():
+    async def scenario():
+        limiter = controller(max_queue=3)
+        assert await limiter.admit("warmup", "chat")
+        burst = [asyncio.create_task(limiter.admit("greedy", "chat")) for _ in range(5)]
+        await asyncio.sleep(0)
+        other = asyncio.create_task(limiter.admit("other", "chat"))
+        return await asyncio.gather(*burst), await other
+
+    burst, other = asyncio.run(scenario())
+    assert burst == [True, True, False, False, False]  # capped at 2 queued per user
+    assert other is True
+
+
+def test_hopeless_wait_is_rejected_without_sleeping():
+    async def scenario():
+        limiter = controller(global_rate_per_min=1, max_wait=0.2)
+        assert await limiter.admit("u", "chat")
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        admitted = await limiter.admit("u", "chat")
+        return admitted, loop.time() - started
+
+    admitted, took = asyncio.run(scenario())
+    assert admitted is False and took < 0.1
@@ -0,0 +1,32 @@
+from datetime import date
+
+BODY = {"amount": 75, "category": "Food", "note": "chai", "date": date.today().isoformat(), "type": "expense"}
+
+
+def post(client, user, device: str) -> str:
+    r = client.post("/transactions/", json=BODY, headers={**user["headers"], "X-Device-Id": device})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def test_changes_are_pushed_to_the_other_devices_only(client, user):
+    token = user["headers"]["Authorization"][7:]
+    with client.websocket_connect(f"/ws?token={token}&device_id=phone") as phone, \
+            client.websocket_connect(f"/ws?token={token}&device_id=laptop") as laptop:
+        assert phone.receive_json()["type"] == "ready"
+        assert laptop.receive_json()["type"] == "ready"
+
+        from_phone = post(client, user, "phone")
+        from_laptop = post(client, user, "laptop")
+
+        # Each device only hears about the other's write
+        assert laptop.receive_json()["id"] == from_phone
+        assert phone.receive_json()["id"] == from_laptop
+
+
+def test_sockets_without_a_device_id_get_every_change(client, user):
+    token = user["headers"]["Authorization"][7:]
+    with client.websocket_connect(f"/ws?token={token}") as ws:
+        assert ws.receive_json()["type"] == "ready"
+        tx_id = post(client, user, "phone")
+        assert ws.receive_json()["id"] == tx_id
@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.services.recurring import detect_recurring, normalize_note
+
+
+def columns(rows: list) -> dict:
+    """rows: (date, amount, note)"""
+    return {
+        "date": np.array([d.isoformat() for d, _, _ in rows], dtype="datetime64[D]"),
+        "amount": np.array([a for _, a, _ in rows], dtype=np.float64),
+        "note": np.array([n.lower() for _, _, n in rows], dtype=object),
+        "raw_note": [n for _, _, n in rows],
+        "category": ["Bills"] * len(rows),
+        "account": ["card"] * len(rows),
+        "is_income": np.zeros(len(rows), dtype=bool),
+    }
+
+
+def monthly(note: str, amounts: list, start=date(2025, 1, 5)) -> list:
+    return [(start + timedelta(days=30 * i), amount, note) for i, amount in enumerate(amounts)]
+
+
+def test_amounts_straddling_a_band_edge_stay_one_series():
+    # ₹100 and ₹101 sat in different fixed log bands; the series must not split
+    series = detect_recurring(columns(monthly("Netflix", [100, 101, 100, 101, 99, 101])), today=date(2025, 6, 20))
+    assert len(series) == 1
+    assert series[0]["occurrences"] == 6
+    assert series[0]["period"] == "monthly"
+
+
+def test_clearly_different_amounts_are_separate_series():
+    rows = monthly("Gym", [500, 500, 500, 500]) + monthly("Gym", [1500, 1500, 1500, 1500], start=date(2025, 1, 10))
+    series = detect_recurring(columns(rows), today=date(2025, 4, 20))
+    assert sorted(s["average_amount"] for s in series) == [500, 1500]
+
+
+def test_month_names_do_not_split_a_series():
+    notes = ["Netflix #482 (Jan)", "Netflix #483 (Feb)", "NETFLIX #484 - March", "netflix sept"]
+    assert {normalize_note(n) for n in notes} == {"netflix"}
@@ -0,0 +1,30 @@
+import asyncio
+import os
+
+import pytest
+
+from app.config import settings
+from app.storage import create_engine
+from app.storage.conformance import CHECKS
+
+# The memory engine always; MongoDB too when TEST_MONGO_URL points at a server
+ENGINES = ["memory"] + (["mongo"] if os.getenv("TEST_MONGO_URL") else [])
+
+
+async def run_check(backend: str, check):
+    engine = create_engine(backend, url=os.getenv("TEST_MONGO_URL"), db_name=f"{settings.DB_NAME}_conformance")
+    await engine.connect()
+    name = f"conformance_{check.__name__}"
+    try:
+        collection = engine.db.get_collection(name)
+        await collection.delete_many({})
+        await check(collection)
+    finally:
+        await engine.db.drop_collection(name)
+        await engine.close()
+
+
+@pytest.mark.parametrize("backend", ENGINES)
+@pytest.mark.parametrize("check", CHECKS, ids=[c.__name__ for c in CHECKS])
+def test_engine_conformance(backend, check):
+    asyncio.run(run_check(backend, check))
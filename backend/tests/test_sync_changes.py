@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app import database
+from app.config import settings
+from app.routers.transactions import EPOCH, encode_sync_token
+from app.services import archive
+from app.services.maintenance import backfill_updated_at
+
+
+def insert_rows(run, user_id: str, count: int, **fields):
+    docs = [
+        {"user_id": user_id, "amount": 10 + i, "category": "Food", "note": f"row {i}",
+         "date": "2024-01-01", "type": "expense", "account": "wallet", **fields}
+        for i in range(count)
+    ]
+    run(database.transactions_collection.insert_many, docs)
+    return {str(d["_id"]) for d in docs}
+
+
+def full_sync(client, headers, limit: int, max_pages: int = 50) -> tuple:
+    """(ids served, caught-up token)"""
+    ids, token = [], None
+    for _ in range(max_pages):
+        params = {"limit": limit, **({"since": token} if token else {})}
+        r = client.get("/transactions/changes", params=params, headers=headers)
+        assert r.status_code == 200, r.text
+        body = r.json()
+        ids += [u["id"] for u in body["upserts"]]
+        token = body["next_token"]
+        if not body["has_more"]:
+            return ids, token
+    raise AssertionError("sync never finished")
+
+
+def test_full_sync_pages_through_rows_without_updated_at(client, run, user):
+    expected = insert_rows(run, user["id"], 7)
+    ids, _ = full_sync(client, user["headers"], limit=2)
+    assert sorted(ids) == sorted(expected)
+
+
+def test_full_sync_pages_through_rows_older_than_tombstone_retention(client, run, user):
+    old = datetime.utcnow() - timedelta(days=settings.SYNC_TOMBSTONE_TTL_DAYS + 30)
+    expected = insert_rows(run, user["id"], 5, updated_at=old)
+    ids, _ = full_sync(client, user["headers"], limit=2)
+    assert sorted(ids) == sorted(expected)
+
+
+def test_caught_up_token_older_than_retention_is_410(client, user):
+    old = datetime.utcnow() - timedelta(days=settings.SYNC_TOMBSTONE_TTL_DAYS + 1)
+    token = encode_sync_token(old, ObjectId("f" * 24), old)
+    r = client.get("/transactions/changes", params={"since": token}, headers=user["headers"])
+    assert r.status_code == 410
+
+
+def test_legacy_two_part_epoch_token_is_accepted(client, run, user):
+    expected = insert_rows(run, user["id"], 3)
+    first = sorted(expected)[0]
+    r = client.get("/transactions/changes", params={"since": f"0_{first}"}, headers=user["headers"])
+    assert r.status_code == 200, r.text
+    assert {u["id"] for u in r.json()["upserts"]} == expected - {first}
+
+
+def test_backfill_keeps_sync_positions(client, run, user):
+    expected = insert_rows(run, user["id"], 4)
+    first = sorted(expected)[0]
+    token = encode_sync_token(None, ObjectId(first), datetime.utcnow())
+
+    result = run(backfill_updated_at)
+    assert result["stamped"] == 4
+    assert run(database.transactions_collection.count_documents, {"updated_at": EPOCH}) == 4
+
+    r = client.get("/transactions/changes", params={"since": token}, headers=user["headers"])
+    assert {u["id"] for u in r.json()["upserts"]} == expected - {first}
+
+
+def test_full_sync_includes_archived_months(client, run, user):
+    expected = insert_rows(run, user["id"], 3)
+    expected |= insert_rows(run, user["id"], 4, date="2020-03-15")
+    expected |= insert_rows(run, user["id"], 2, date="2020-07-01")
+    assert run(archive.archive_user, user["id"], "2023-01") == 6
+
+    for limit in (1, 2, 3, 9, 50):
+        ids, token = full_sync(client, user["headers"], limit=limit)
+        assert sorted(ids) == sorted(expected), limit
+
+    # The caught-up token continues incrementally from the hot tier only
+    r = client.get("/transactions/changes", params={"since": token}, headers=user["headers"])
+    assert r.status_code == 200, r.text
+    assert r.json()["upserts"] == [] and not r.json()["has_more"]